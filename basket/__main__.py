@@ -10,33 +10,82 @@ offers are are loaded (by default) from the json file `promotions.json`.
 """
 
 
-import argparse
-import json
 import sys
-import time
+import types
+
+# Only the modules needed to price a single basket are imported up front, so
+# that short runs start quickly; the other modes import what they need.
+from basket import catalogue
+from basket import instrument
+from basket import money
+from basket import receipt
+# The loaders live in basket.loader so that worker processes can use them;
+# they are part of this module's interface too.
+from basket.loader import (SimpleLogger, logger, load_json, load_products,
+                           load_promotions)
+
+# Arguments as parsed by `parse_args` when no options are given.
+DEFAULTS = {
+    'products': 'products.json',
+    'promotions': 'promotions.json',
+    'items': [],
+    'verbose': False,
+    'bulk': None,
+    'format': 'lines',
+    'workers': None,
+    'stream': None,
+    'serve': False,
+    'host': '127.0.0.1',
+    'port': 8080,
+    'socket': None,
+    'reload': None,
+    'cache': 0,
+    'cache_ttl': None,
+    'profile': False,
+    'explain': False,
+    'explain_file': None,
+    'catalogue': None,
+    'optimal': False,
+    'rounding': money.UNIT_FLOOR,
+    'stores': None,
+    'store': None,
+    'log_file': None,
+    'log_json': False,
+    'log_limit': None,
+}
+
+# Options understood by `parse_fast`, taking a value and flags respectively.
+_FAST_OPTIONS = {'--products': 'products', '--promotions': 'promotions'}
+_FAST_FLAGS = {'--verbose': 'verbose', '--best-price': 'optimal'}
+
+
+def parse_fast(argv):
+    """Parse the command line arguments of a simple run without argparse.
+
+    Only items and the ``--products``, ``--promotions``, ``--verbose`` and
+    ``--best-price`` options are understood, which is enough to price a
+    single basket; building the full parser would take longer than that.
 
-from basket import product
-from basket import promotion
-from basket import basket
-
-
-class SimpleLogger:
-    enabled = False
-    info = 'INFO'
-    error = 'ERROR'
-
-    def log(self, message, level=info):
-        """Simple logger.
-
-        :param str message: Log message
-        :param str level: Log level name
-        """
-        if self.enabled:
-            now = time.strftime('%Y-%m-%d %H:%M:%S')
-            print('{} {}: {}'.format(now, level, message))
-
-
-logger = SimpleLogger()
+    :param list argv: Args to parse.
+    :return: The arguments, as `parse_args` would parse them, or None if
+      they need the full parser.
+    """
+    args = types.SimpleNamespace(**DEFAULTS)
+    args.items = []
+    values = iter(argv)
+    for arg in values:
+        if not arg.startswith('-'):
+            args.items.append(arg)
+        elif arg in _FAST_FLAGS:
+            setattr(args, _FAST_FLAGS[arg], True)
+        elif arg in _FAST_OPTIONS:
+            value = next(values, None)
+            if value is None or value.startswith('-'):
+                return None
+            setattr(args, _FAST_OPTIONS[arg], value)
+        else:
+            return None
+    return args if args.items else None
 
 
 def parse_args(argv=None):
@@ -44,6 +93,10 @@ def parse_args(argv=None):
 
     :param list argv: Args to parse.
     """
+    import argparse
+
+    from basket import bulk
+
     parser = argparse.ArgumentParser(prog='basket')
     parser.add_argument(
         '-v',
@@ -67,7 +120,7 @@ def parse_args(argv=None):
         'items',
         metavar='item',
         type=str,
-        nargs='+',
+        nargs='*',
         help='One or more items for the basket.  Only items listed in '
              'goods.json are accepted.')
     parser.add_argument(
@@ -77,109 +130,541 @@ def parse_args(argv=None):
         action='store_true',
         dest='verbose',
     )
-    return parser.parse_args(argv)
-
-
-def load_json(json_file_path):
-    """Load json data.
-
-    :param str json_file_path: Path to json file to load.
+    parser.add_argument(
+        '--bulk',
+        metavar='FILE',
+        help='Price many baskets, one per line, read from FILE (or stdin '
+             'if FILE is -) instead of the items given',
+        default=None,
+        dest='bulk',
+    )
+    parser.add_argument(
+        '--format',
+        help='Format of the baskets read in bulk mode',
+        choices=bulk.FORMATS,
+        default=bulk.LINES,
+        dest='format',
+    )
+    parser.add_argument(
+        '--workers',
+        help='Number of worker processes in bulk mode, default is the '
+             'number of CPUs',
+        type=int,
+        default=None,
+        dest='workers',
+    )
+    parser.add_argument(
+        '--stream',
+        metavar='FILE',
+        nargs='?',
+        const='-',
+        help='Price a stream of json basket events read from FILE (or '
+             'stdin if FILE is - or omitted), writing one json record per '
+             'basket',
+        default=None,
+        dest='stream',
+    )
+    parser.add_argument(
+        '--serve',
+        help='Run a pricing server that keeps the products and promotions '
+             'in memory and prices baskets on request',
+        default=False,
+        action='store_true',
+        dest='serve',
+    )
+    parser.add_argument(
+        '--host',
+        help='Address the pricing server listens on, default is 127.0.0.1',
+        default='127.0.0.1',
+        dest='host',
+    )
+    parser.add_argument(
+        '--port',
+        help='Port the pricing server listens on, default is 8080',
+        type=int,
+        default=8080,
+        dest='port',
+    )
+    parser.add_argument(
+        '--socket',
+        metavar='PATH',
+        help='Unix socket the pricing server listens on instead of a port',
+        default=None,
+        dest='socket',
+    )
+    parser.add_argument(
+        '--reload',
+        metavar='SECONDS',
+        help='Have the pricing server check the products and promotions '
+             'files for changes every SECONDS and reload them in the '
+             'background',
+        type=float,
+        default=None,
+        dest='reload',
+    )
+    parser.add_argument(
+        '--cache',
+        metavar='SIZE',
+        help='Have the pricing server cache the pricing of up to SIZE '
+             'distinct basket contents',
+        type=int,
+        default=0,
+        dest='cache',
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        metavar='SECONDS',
+        help='Expire cached pricings after SECONDS',
+        type=float,
+        default=None,
+        dest='cache_ttl',
+    )
+    parser.add_argument(
+        '--profile',
+        help='Print a breakdown of the time spent in each stage of pricing, '
+             'and the promotions that took the most, to stderr',
+        default=False,
+        action='store_true',
+        dest='profile',
+    )
+    parser.add_argument(
+        '--explain',
+        help='Print how the promotions discounting each product were '
+             'evaluated to stderr',
+        default=False,
+        action='store_true',
+        dest='explain',
+    )
+    parser.add_argument(
+        '--explain-file',
+        metavar='FILE',
+        help='Write how the promotions discounting each product were '
+             'evaluated to FILE, as a json line per basket',
+        default=None,
+        dest='explain_file',
+    )
+    parser.add_argument(
+        '--catalogue',
+        metavar='FILE',
+        help='Path of a compiled catalogue (see "basket compile") to use '
+             'instead of the products and promotions json files',
+        default=None,
+        dest='catalogue',
+    )
+    parser.add_argument(
+        '--best-price',
+        help='Allocate promotions that compete for the same items to give '
+             'the lowest price, rather than in the order they are listed',
+        default=False,
+        action='store_true',
+        dest='optimal',
+    )
+    parser.add_argument(
+        '--rounding',
+        help='How discounts are rounded to the penny: on each unit or on '
+             'all the units of a line, down or half to even, default is '
+             f'{money.UNIT_FLOOR}',
+        choices=money.ROUNDINGS,
+        default=money.UNIT_FLOOR,
+        dest='rounding',
+    )
+    parser.add_argument(
+        '--stores',
+        metavar='FILE',
+        help='Json file of the prices and promotions of each store that '
+             'differ from the products and promotions files',
+        default=None,
+        dest='stores',
+    )
+    parser.add_argument(
+        '--store',
+        metavar='ID',
+        help='Price the baskets for the store ID in --stores',
+        default=None,
+        dest='store',
+    )
+    parser.add_argument(
+        '--log-file',
+        metavar='FILE',
+        help='Log to FILE (or stderr if FILE is -) from a background thread '
+             'rather than printing log messages; implies --verbose',
+        default=None,
+        dest='log_file',
+    )
+    parser.add_argument(
+        '--log-json',
+        help='Log json lines, with the fields of each message, to the log '
+             'file (stderr by default); implies --verbose',
+        default=False,
+        action='store_true',
+        dest='log_json',
+    )
+    parser.add_argument(
+        '--log-limit',
+        metavar='N',
+        help='Log the same message at most N times a minute, summarising '
+             'the rest; implies --verbose',
+        type=int,
+        default=None,
+        dest='log_limit',
+    )
+    args = parser.parse_args(argv)
+    if args.catalogue is not None and args.reload is not None:
+        parser.error('--reload cannot be used with --catalogue')
+    if args.stores is not None and args.reload is not None:
+        parser.error('--reload cannot be used with --stores')
+    if args.store is not None and args.stores is None:
+        parser.error('--store needs --stores')
+    if args.explain and args.explain_file is not None:
+        parser.error('--explain cannot be used with --explain-file')
+    if (not args.items and args.bulk is None and args.stream is None
+            and not args.serve):
+        parser.error('the following arguments are required: item')
+    return args
+
+
+def load_catalogue(args):
+    """Load the catalogue named by the command line arguments.
+
+    :param args: Parsed command line arguments.
+    :return: compiled.MappedCatalogue of ``args.catalogue`` if given,
+      otherwise catalogue.Catalogue of ``args.products`` and
+      ``args.promotions``, allocating promotions for the best price if
+      ``args.optimal`` and rounding discounts by ``args.rounding``.
+    :raises: ValueError if ``args.catalogue`` is not a compiled catalogue.
     """
-    data = None
-    try:
-        with open(json_file_path) as f:
-            data = json.load(f)
-    except EnvironmentError:
-        logger.log(f'No such file or directory: {json_file_path}',
-                   SimpleLogger.error)
-    except json.JSONDecodeError as e:
-        logger.log(f'Failed to parse data file {json_file_path}: {e}',
-                   SimpleLogger.error)
-    return data
+    if args.catalogue is not None:
+        from basket import compiled
+        return compiled.MappedCatalogue(args.catalogue, args.optimal,
+                                        args.rounding)
+    return catalogue.Catalogue(load_products(args.products),
+                               load_promotions(args.promotions),
+                               args.optimal, args.rounding)
+
+
+def load_stores(args, cat):
+    """Load the stores named by the command line arguments.
+
+    :param args: Parsed command line arguments.
+    :param cat: The catalogue the stores share.
+    :return: stores.Stores of ``args.stores``.
+    :raises: ValueError if the stores cannot be loaded.
+    """
+    from basket import stores
 
+    multi = stores.Stores(cat)
+    multi.load(args.stores)
+    return multi
 
-def load_products(products_file_path):
-    """Load product definitions.
 
-    Load product definition data describing the products this program will
-    accept including product names, units and price.
+def load_store_catalogue(args):
+    """Load the catalogue to price baskets against.
 
-    :param str products_file_path: Path to goods file.
-    :return dict: Dictionary of product.Product instances.
+    :param args: Parsed command line arguments.
+    :return: The catalogue of the store ``args.store`` in ``args.stores``
+      if given, otherwise that of `load_catalogue`.
+    :raises: ValueError if the catalogue or the stores cannot be loaded,
+      KeyError if there is no such store.
     """
-    products = {}
-    data = load_json(products_file_path)
-    if data is None:
-        logger.log('No stock found in product data')
-    else:
-        # Build products list
-        for prod in data:
-            try:
-                p = product.Product(prod['name'], prod['price'], prod['unit'])
-                products[p.name] = p
-            except ValueError as e:
-                logger.log(f'Failed to load a product with data: {prod} ({e})',
-                           SimpleLogger.error)
-    return products
-
-
-def load_promotions(promotions_file_path):
-    """Load promotions.
-
-    Load promotions data that specifies discounts that can be applied
-    to goods purchased.
-
-    :param str promotions_file_path: Path to promotions file.
-    :return list: List of promotion.Promotion instances.
-    """
-    promotions = []
-    data = load_json(promotions_file_path)
-    if data:
-        for prod_promo in data:
-            try:
-                promotions.append(promotion.Promotion(prod_promo))
-            except (ValueError, KeyError) as e:
-                logger.log('Failed to load offer with data: '
-                           f'{prod_promo} ({e})', SimpleLogger.error)
-    return promotions
+    cat = load_catalogue(args)
+    if args.store is not None:
+        cat = load_stores(args, cat).catalogue(args.store)
+    return cat
 
 
 def main(argv=None):
     """Program entry point.
 
     Parses any arguments, invokes `load_products` and `load_promotions` (to
-    load the available goods and offers) and constructs a `basket` instance,
-    giving it the available products in stock (`products`) and any prevailing
-    offers (`promotions`).  For each product item specified on the command line,
-    we add it to the basket. When all items have been added we query `basket`
-    for a sub-total, discounts that could be applied and total price, which is
-    output.
+    load the available goods and offers) into a `catalogue.Catalogue`, which
+    indexes the offers and precomputes their discounts, and constructs a
+    `basket` instance, giving it the available products in stock
+    (`products`) and any prevailing offers (`promotions`).  For each product
+    item specified on the command line, we add it to the basket. When all
+    items have been added we query `basket` for a sub-total, discounts that
+    could be applied and total price, which is output.
+
+    Run as ``basket compile ...`` it compiles the catalogue instead, see
+    `main_compile`.
 
     :param list argv: Command line arguments.
     """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == 'compile':
+        return main_compile(argv[1:])
+
     # Parse arguments
-    args = parse_args(argv)
+    args = parse_fast(argv)
+    if args is None:
+        args = parse_args(argv)
     logger.enabled = args.verbose
+    if (args.log_file is not None or args.log_json
+            or args.log_limit is not None):
+        logger.enabled = args.verbose = True
+        logger.configure(args.log_file, args.log_json, args.log_limit)
+
+    try:
+        if args.explain or args.explain_file is not None:
+            return main_explain(args)
+        if args.profile:
+            return main_profile(args)
+        return run(args)
+    finally:
+        logger.close()
+
+
+def run(args):
+    """Run the mode chosen by the command line arguments.
+
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    """
+    if args.bulk is not None:
+        return main_bulk(args)
+    if args.stream is not None:
+        return main_stream(args)
+    if args.serve:
+        return main_serve(args)
 
     # Load available goods and offers
-    products = load_products(args.products)
-    promotions = load_promotions(args.promotions)
+    try:
+        cat = load_store_catalogue(args)
+    except ValueError as e:
+        logger.log(str(e), SimpleLogger.error)
+        return 1
+    except KeyError as e:
+        logger.log(e.args[0], SimpleLogger.error)
+        return 1
 
     # Make a basket and fill
-    shopping_basket = basket.Basket(products, promotions)
+    shopping_basket = cat.basket()
     for item in args.items:
         if not shopping_basket.add(item):
-            logger.log(f'Item \'{item}\' not in stock')
+            logger.log("Item '{item}' not in stock", item=item)
 
     # Print the results
-    print(f'Subtotal: £{shopping_basket.subtotal/100:.2f}')
-    shopping_basket.calculate_discounts()
-    if shopping_basket.discounted_items:
-        for item in shopping_basket.discounted_items:
-            print(item.discount_message)
-    else:
-        print('(No offers available)')
-    print(f'Total: £{shopping_basket.total/100:.2f}')
+    print('\n'.join(receipt.render(shopping_basket)))
+
+
+def main_profile(args):
+    """Profiling entry point.
+
+    Runs as usual with instrumentation on and then prints the time spent in
+    each stage, and the promotions evaluated most and taking the most time,
+    to stderr.  In bulk mode only baskets priced in this process are
+    profiled, see ``--workers``.
+
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    """
+    recorder = instrument.enable()
+    try:
+        return instrument.timed('total')(run)(args)
+    finally:
+        instrument.disable()
+        print('\n'.join(recorder.report()), file=sys.stderr)
+
+
+def main_explain(args):
+    """Explain mode entry point.
+
+    Runs as usual, profiled if asked, with tracing on and then prints how
+    the promotions were evaluated to stderr, or writes the trace to
+    ``args.explain_file``.  In bulk mode each basket is traced under its
+    number in the input, counting from 1.
+
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    """
+    from basket import explain
+
+    stream = None
+    if args.explain_file is not None:
+        stream = open(args.explain_file, 'w')
+    trace = explain.enable(explain.Trace(stream))
+    try:
+        return main_profile(args) if args.profile else run(args)
+    finally:
+        explain.disable()
+        if stream is not None:
+            stream.close()
+        else:
+            print('\n'.join(trace.report()), file=sys.stderr)
+
+
+def main_bulk(args):
+    """Bulk mode entry point.
+
+    Reads baskets from the file (or stdin) given by ``args.bulk`` and
+    prices them on a pool of ``args.workers`` processes, each of which
+    loads the products and promotions once.  Receipts are printed in input
+    order, separated by a blank line, as soon as they are priced.
+
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    """
+    from basket import bulk
+
+    if args.store is not None:
+        # Check the store before the workers load it.
+        try:
+            load_store_catalogue(args)
+        except ValueError as e:
+            logger.log(str(e), SimpleLogger.error)
+            return 1
+        except KeyError as e:
+            logger.log(e.args[0], SimpleLogger.error)
+            return 1
+
+    stream = sys.stdin if args.bulk == '-' else open(args.bulk, newline='')
+    try:
+        baskets = bulk.read_baskets(stream, args.format)
+        for lines in bulk.price_all(baskets, args.products, args.promotions,
+                                    workers=args.workers,
+                                    verbose=args.verbose,
+                                    catalogue_file_path=args.catalogue,
+                                    optimal=args.optimal,
+                                    rounding=args.rounding,
+                                    stores_file_path=args.stores,
+                                    store=args.store):
+            print('\n'.join(lines), end='\n\n', flush=True)
+    except ValueError as e:
+        logger.log(str(e), SimpleLogger.error)
+        return 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return 0
+
+
+def main_stream(args):
+    """Streaming mode entry point.
+
+    Reads basket events line by line from the file (or stdin) given by
+    ``args.stream``, prices each basket as soon as its events are complete
+    and writes one json record per basket to stdout.  Nothing is loaded up
+    front other than the products and promotions.
+
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    """
+    from basket import pipeline
+
+    try:
+        cat = load_store_catalogue(args)
+    except ValueError as e:
+        logger.log(str(e), SimpleLogger.error)
+        return 1
+    except KeyError as e:
+        logger.log(e.args[0], SimpleLogger.error)
+        return 1
+    stream = sys.stdin if args.stream == '-' else open(args.stream)
+    try:
+        records = pipeline.price_events(pipeline.read_events(stream), cat)
+        pipeline.write_records(records, sys.stdout)
+    except ValueError as e:
+        logger.log(str(e), SimpleLogger.error)
+        return 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return 0
+
+
+def main_serve(args):
+    """Server mode entry point.
+
+    Loads the products and promotions once and serves pricing requests
+    until interrupted.  With ``args.reload`` the files are watched and
+    reloaded in the background when they change.  With ``args.stores``
+    requests can name the store to price for.
+
+    :param args: Parsed command line arguments.
+    :return: Exit status.
+    """
+    from basket import cache
+    from basket import server
+    from basket import watcher
+
+    catalogue_watcher = None
+    multi = None
+    try:
+        if args.reload is not None:
+            catalogue_watcher = watcher.CatalogueWatcher(
+                args.products, args.promotions, interval=args.reload,
+                optimal=args.optimal, rounding=args.rounding)
+            cat = catalogue_watcher.catalogue
+        else:
+            cat = load_catalogue(args)
+        if args.stores is not None:
+            multi = load_stores(args, cat)
+    except ValueError as e:
+        logger.log(str(e), SimpleLogger.error)
+        return 1
+    pricing_cache = None
+    if args.cache > 0:
+        pricing_cache = cache.PricingCache(args.cache, args.cache_ttl)
+    server.serve(cat, args.host, args.port, args.socket, catalogue_watcher,
+                 pricing_cache, multi)
+    return 0
+
+
+def main_compile(argv=None):
+    """Compile command entry point.
+
+    Loads the products and promotions json files and writes them out as a
+    compiled catalogue that can be memory-mapped with ``--catalogue``.
+
+    :param list argv: Command line arguments, after ``compile``.
+    :return: Exit status.
+    """
+    import argparse
+
+    from basket import compiled
+
+    parser = argparse.ArgumentParser(
+        prog='basket compile',
+        description='Compile the products and promotions into a binary '
+                    'catalogue')
+    parser.add_argument(
+        '--products',
+        help='Path of the products json file',
+        default='products.json',
+        dest='products',
+    )
+    parser.add_argument(
+        '--promotions',
+        help='Path of the promotions json file',
+        default='promotions.json',
+        dest='promotions',
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        help='Path of the compiled catalogue, default is catalogue.bin',
+        default='catalogue.bin',
+        dest='output',
+    )
+    parser.add_argument(
+        '--verbose',
+        help='Verbose output',
+        default=False,
+        action='store_true',
+        dest='verbose',
+    )
+    args = parser.parse_args(argv)
+    logger.enabled = args.verbose
+    cat = catalogue.Catalogue.load(args.products, args.promotions)
+    try:
+        compiled.compile_catalogue(cat, args.output)
+    except ValueError as e:
+        logger.log(str(e), SimpleLogger.error)
+        return 1
+    logger.log('Compiled {products} products and {promotions} promotions '
+               'to {path}', products=len(cat.products),
+               promotions=len(cat.promotions), path=args.output)
+    return 0
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -0,0 +1,110 @@
+"""Asyncio pricing module.
+
+`price_basket_async` prices a basket from a coroutine without holding up
+the event loop for long: small baskets are priced there and then, larger
+ones on a thread of an executor shared by every call.  Threads, rather than
+processes, are used so that the catalogue (the products, the promotions
+and their precomputed discounts) is shared with the event loop rather than
+copied for every call.
+
+A basket priced on the executor can be cancelled, or given a timeout, like
+any other awaitable.  The thread pricing it notices soon afterwards and
+gives up, rather than finishing a pricing nobody is waiting for.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+from basket import pipeline
+
+# Baskets of at most this many items are priced on the event loop.
+INLINE_LIMIT = 256
+
+# Items added to a basket between checks for cancellation.
+CHECK_INTERVAL = 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def price_items(cat, items, basket_id=None, cancelled=None):
+    """Price a basket.
+
+    :param cat: catalogue.Catalogue to price against.
+    :param list items: Names of the items in the basket.
+    :param basket_id: Identifier of the basket, echoed in the record.
+    :param cancelled: Optional threading.Event; pricing stops soon after it
+      is set.
+    :return dict: The basket's record, see `pipeline.basket_record`.
+    :raises: concurrent.futures.CancelledError if ``cancelled`` is set.
+    """
+    shopping_basket = cat.basket(compact=True)
+    out_of_stock = 0
+    for start in range(0, len(items), CHECK_INTERVAL):
+        if cancelled is not None and cancelled.is_set():
+            raise concurrent.futures.CancelledError()
+        for item in items[start:start + CHECK_INTERVAL]:
+            if not shopping_basket.add(item):
+                out_of_stock += 1
+    return pipeline.basket_record(basket_id, shopping_basket, out_of_stock)
+
+
+def get_executor():
+    """The executor shared by `price_basket_async` calls.
+
+    :return: concurrent.futures.ThreadPoolExecutor, started on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                thread_name_prefix='basket-pricing')
+        return _executor
+
+
+def shutdown(wait=True):
+    """Shut the shared executor down.
+
+    A new one is started if another basket needs it.
+
+    :param bool wait: Wait for the baskets being priced to finish.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait)
+
+
+async def price_basket_async(cat, items, basket_id=None, timeout=None,
+                             inline_limit=INLINE_LIMIT, executor=None):
+    """Price a basket from a coroutine.
+
+    :param cat: catalogue.Catalogue to price against.
+    :param items: Iterable of the names of the items in the basket.
+    :param basket_id: Identifier of the basket, echoed in the record.
+    :param float timeout: Seconds to wait for a basket priced on the
+      executor, or None to wait as long as it takes.  Baskets priced inline
+      are always priced.
+    :param int inline_limit: Price baskets of at most this many items on
+      the event loop.
+    :param executor: concurrent.futures.Executor to price larger baskets
+      on, by default the shared one (see `get_executor`).
+    :return dict: The basket's record, see `pipeline.basket_record`.
+    :raises: asyncio.TimeoutError if the basket is not priced within
+      ``timeout`` seconds.
+    """
+    items = list(items)
+    if len(items) <= inline_limit:
+        return price_items(cat, items, basket_id)
+    if executor is None:
+        executor = get_executor()
+    cancelled = threading.Event()
+    future = asyncio.get_running_loop().run_in_executor(
+        executor, price_items, cat, items, basket_id, cancelled)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    finally:
+        # Stop the pricing if this was cancelled or timed out.
+        cancelled.set()
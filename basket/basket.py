@@ -1,60 +1,114 @@
 """Basket module."""
 
 import copy
+import itertools
 
+from basket import engine
+from basket import instrument
+from basket import line_item
 
-class Basket:
-    """Class that encapsulates a basket of products to be purchased."""
-    def __init__(self, products, promotions):
+
+class _BaseBasket:
+    """Behaviour shared by every kind of basket."""
+    def __init__(self, products, promotions, promotion_index=None,
+                 program=None):
         """
         :param dict products: The products available.
         :param list promotions: The promotions available.
+        :param promotion_index: Optional engine.PromotionIndex of
+          ``promotions`` to share rather than build one for this basket.
+        :param program: Optional rules.RuleProgram of the rule promotions
+          available.
         :return: None
         """
         self.products = products
         self.promotions = promotions
+        self._promotion_index = promotion_index
+        self.program = program
+        self._rule_discounts = []
+
+    @property
+    def promotion_index(self):
+        """Index of ``self.promotions`` by the products they involve.
+
+        Built on first use and rebuilt if ``self.promotions`` is replaced.
+
+        :return: engine.PromotionIndex instance.
+        """
+        if (self._promotion_index is None
+                or self._promotion_index.promotions is not self.promotions):
+            self._promotion_index = engine.PromotionIndex(self.promotions)
+        return self._promotion_index
+
+    @property
+    def rule_discounts(self):
+        """The discount earned from each rule promotion that applies.
+
+        :return list: ``(rules.Rule, amount)`` pairs, amount in pence, as of
+          the last time the discounts were calculated.
+        """
+        return self._rule_discounts
+
+    @property
+    def rule_discount(self):
+        """The total discount earned from rule promotions, in pence."""
+        return sum(amount for _, amount in self.rule_discounts)
+
+
+class Basket(_BaseBasket):
+    """Class that encapsulates a basket of products to be purchased."""
+    def __init__(self, products, promotions, promotion_index=None,
+                 program=None):
+        """
+        :param dict products: The products available.
+        :param list promotions: The promotions available.
+        :param promotion_index: Optional engine.PromotionIndex of
+          ``promotions`` to share rather than build one for this basket.
+        :param program: Optional rules.RuleProgram of the rule promotions
+          available.
+        :return: None
+        """
+        super().__init__(products, promotions, promotion_index, program)
         self.items = []
         self.discounts = []
 
+    @instrument.hot('calculate_discounts')
     def calculate_discounts(self):
         """Calculate discounts.
 
         Determine what the discounts are based on the current list if items.
-        First we reset any previously calculated discounts on products in
-        ``self.items``.  The for each promotion we ascertain the number of
-        qualifying items and how that translates into discounts to apply.
-        Finally we assemble a list of products to apply the discounts to
-        and apply as many discounts as we have qualified for in this
-        particular promotion.
-        """
-        # Clear any previously applied promotions
+        In a single pass over ``self.items`` we reset any previously
+        calculated discounts and bucket the items by product name.  Then for
+        each product in the basket we ask the promotion index how the
+        promotions discounting it are allocated, given the quantities of
+        their qualifying products, and apply them to the items in the bucket.
+        Only promotions whose discounted product is in the basket are looked
+        at.  Any rule promotions are evaluated on the same quantities, then
+        capped at what the promotions leave to pay.
+        """
+        buckets = {}
         for p in self.items:
             p.clear_promotion()
+            buckets.setdefault(p.name, []).append(p)
+        quantities = {name: len(bucket) for name, bucket in buckets.items()}
 
-        for promotion in self.promotions:
-            # Do we have enough qualifying products for this promotion?
-            qualifying = [p for p in self.items
-                          if p.name == promotion.qualifying_product]
-            qty_qualifying = len(qualifying)
-
-            # And how many times can we apply the discount?
-            num_discounts = qty_qualifying // promotion.qualifying_qty
-
-            if not num_discounts:
-                continue
-
-            # Apply discounts to each product discounted in the offer,
-            # up to the number of discounts earned (note the discounted
-            # product might not be the qualifying product).
-            prods_nominated_discount = [
-                p for p in self.items if p.name == promotion.discounted_product]
-
-            for prod in prods_nominated_discount:
-                prod.apply_promotion(promotion)
-                num_discounts -= 1
-                if not num_discounts:
-                    break
+        index = self.promotion_index
+        discounted = {}
+        for name, bucket in buckets.items():
+            units = iter(bucket)
+            segments = index.allocate(name, quantities)
+            for promotion, count in segments:
+                for prod in itertools.islice(units, count):
+                    prod.apply_promotion(promotion)
+            if segments:
+                price = bucket[0].price
+                discounted[name] = sum(promotion.discount(price, count)
+                                       for promotion, count in segments)
+        if self.program is not None:
+            self._rule_discounts = self.program.evaluate(
+                quantities, self.products, discounted=discounted)
 
+    @instrument.hot('basket.add')
     def add(self, item):
         """Add an item to the basket.
 
@@ -71,6 +125,30 @@ class Basket:
             return False
         return True
 
+    def remove(self, item):
+        """Remove an item from the basket.
+
+        Removes the most recently added unit of the product.
+
+        :param str item: The name of an item to be removed from the basket.
+        :return: True if the item is removed and False if there is none in
+          the basket.
+        """
+        return self._pop(item.lower()) is not None
+
+    def _pop(self, name, unit=None):
+        """Remove and return the last unit of a product in ``self.items``.
+
+        :param str name: Name of the product.
+        :param unit: The unit to remove if already known.
+        :return: The removed product, or None if there is none.
+        """
+        for i in range(len(self.items) - 1, -1, -1):
+            p = self.items[i]
+            if p is unit or (unit is None and p.name == name):
+                return self.items.pop(i)
+        return None
+
     @property
     def discounted_items(self):
         """Returns a list of discounted items.
@@ -84,9 +162,20 @@ class Basket:
     def total(self):
         """The total price of the basket with discounts applied.
 
+        The discount is worked out for the units of each product discounted
+        by each promotion together, so that it is rounded as the
+        promotion's rounding policy says.
+
         :return: Price in pence.
         """
-        return sum(product.discounted_price for product in self.items)
+        counts = {}
+        for p in self.items:
+            if p.has_promotion:
+                key = (p.promotion, p.price)
+                counts[key] = counts.get(key, 0) + 1
+        return (self.subtotal - self.rule_discount
+                - sum(promotion.discount(price, count)
+                      for (promotion, price), count in counts.items()))
 
     @property
     def subtotal(self):
@@ -95,3 +184,376 @@ class Basket:
         :return: Price in pence.
         """
         return sum(product.price for product in self.items)
+
+
+class IncrementalBasket(Basket):
+    """Basket that keeps its discounts up to date as items are scanned.
+
+    Adding or removing an item only re-evaluates the promotions discounting
+    that product or discounting a product it qualifies for, and only the
+    units whose promotion changes are touched; the rule promotions that
+    could apply are evaluated again.  The subtotal and total are
+    kept as running figures, so reading them is O(1).  Items must be added
+    and removed through `add` and `remove`; `calculate_discounts`
+    recalculates everything from scratch, e.g. after ``promotions`` has been
+    replaced.
+    """
+    def __init__(self, products, promotions, promotion_index=None,
+                 program=None):
+        """
+        :param dict products: The products available.
+        :param list promotions: The promotions available.
+        :param promotion_index: Optional engine.PromotionIndex of
+          ``promotions`` to share rather than build one for this basket.
+        :param program: Optional rules.RuleProgram of the rule promotions
+          available.
+        :return: None
+        """
+        super().__init__(products, promotions, promotion_index, program)
+        self._buckets = {}
+        self._quantities = {}
+        self._segments = {}
+        self._discounts = {}
+        self._subtotal = 0
+        self._discount = 0
+        self._rule_amounts = {}
+        self._rule_discount = 0
+
+    @instrument.hot('calculate_discounts')
+    def calculate_discounts(self):
+        """Recalculate every discount from scratch."""
+        self._buckets = {}
+        self._quantities = {}
+        self._segments = {}
+        self._discounts = {}
+        self._subtotal = 0
+        self._discount = 0
+        self._rule_amounts = {}
+        self._rule_discount = 0
+        for p in self.items:
+            p.clear_promotion()
+            self._buckets.setdefault(p.name, []).append(p)
+            self._quantities[p.name] = self._quantities.get(p.name, 0) + 1
+            self._subtotal += p.price
+        self._update(list(self._buckets))
+        self._update_rules()
+
+    def add(self, item):
+        """Add an item to the basket and update the discounts.
+
+        :param str item: The name of an item to be added to the basket.
+        :return: True if the item is added and False otherwise.
+        """
+        if not super().add(item):
+            return False
+        unit = self.items[-1]
+        self._buckets.setdefault(unit.name, []).append(unit)
+        self._quantities[unit.name] = self._quantities.get(unit.name, 0) + 1
+        self._subtotal += unit.price
+        self._update(self.promotion_index.affected_products(unit.name))
+        self._update_rules()
+        return True
+
+    def remove(self, item):
+        """Remove an item from the basket and update the discounts.
+
+        Removes the most recently added unit of the product.
+
+        :param str item: The name of an item to be removed from the basket.
+        :return: True if the item is removed and False if there is none in
+          the basket.
+        """
+        name = item.lower()
+        bucket = self._buckets.get(name)
+        if not bucket:
+            return False
+        unit = self._pop(name, bucket.pop())
+        if bucket:
+            self._quantities[name] -= 1
+        else:
+            del self._buckets[name]
+            del self._quantities[name]
+        self._subtotal -= unit.price
+        unit.clear_promotion()
+        self._update(self.promotion_index.affected_products(name))
+        self._update_rules()
+        return True
+
+    def _update(self, names):
+        """Re-evaluate the promotions discounting some products.
+
+        :param names: Names of the products to re-evaluate.
+        """
+        index = self.promotion_index
+        for name in names:
+            bucket = self._buckets.get(name, [])
+            old = self._segments.pop(name, [])
+            new = index.allocate(name, self._quantities)
+            if new:
+                self._segments[name] = new
+            _reassign(bucket, old, new)
+
+            discount = 0
+            if new:
+                price = bucket[0].price
+                discount = sum(promotion.discount(price, count)
+                               for promotion, count in new)
+            self._discount += discount - self._discounts.pop(name, 0)
+            if discount:
+                self._discounts[name] = discount
+
+    def _update_rules(self):
+        """Re-evaluate the rule promotions after the basket has changed.
+
+        The units each rule uses and what is left to pay depend on the
+        rules before it and on the per unit promotions, so every rule that
+        could apply to the basket is evaluated again.
+        """
+        if self.program is None:
+            return
+        self._rule_amounts = dict(self.program.evaluate(
+            self._quantities, self.products, self._subtotal, self._discounts))
+        self._rule_discount = sum(self._rule_amounts.values())
+
+    @property
+    def rule_discounts(self):
+        """The discount earned from each rule promotion that applies.
+
+        :return list: ``(rules.Rule, amount)`` pairs, amount in pence.
+        """
+        if not self._rule_amounts:
+            return []
+        positions = self.program.positions
+        return sorted(self._rule_amounts.items(),
+                      key=lambda entry: positions[entry[0]])
+
+    @property
+    def rule_discount(self):
+        """The total discount earned from rule promotions, in pence."""
+        return self._rule_discount
+
+    @property
+    def total(self):
+        """The total price of the basket with discounts applied.
+
+        :return: Price in pence.
+        """
+        return self._subtotal - self._discount - self._rule_discount
+
+    @property
+    def subtotal(self):
+        """The total price of the basket without discounts applied.
+
+        :return: Price in pence.
+        """
+        return self._subtotal
+
+
+def _ranges(segments, size):
+    """Expand an allocation into ranges of units.
+
+    :param list segments: ``(promotion, count)`` pairs in unit order.
+    :param int size: Number of units; ranges are clipped to it.
+    :return: Iterator of ``(end, promotion)`` pairs covering every unit in
+      order, with a promotion of None for units without one.
+    """
+    end = 0
+    for promotion, count in segments:
+        if end >= size:
+            return
+        end = min(end + count, size)
+        yield end, promotion
+    if end < size:
+        yield size, None
+
+
+def _reassign(units, old, new):
+    """Apply a new allocation of promotions to units.
+
+    Only units whose promotion differs between the two allocations are
+    touched.
+
+    :param list units: The units of one product, in the order added.
+    :param list old: The allocation currently applied to ``units``.
+    :param list new: The allocation to apply.
+    """
+    old_ranges = _ranges(old, len(units))
+    new_ranges = _ranges(new, len(units))
+    old_end, old_promotion = next(old_ranges, (0, None))
+    new_end, new_promotion = next(new_ranges, (0, None))
+    start = 0
+    while start < len(units):
+        end = min(old_end, new_end)
+        if old_promotion is not new_promotion:
+            for unit in units[start:end]:
+                if new_promotion is None:
+                    unit.clear_promotion()
+                else:
+                    unit.apply_promotion(new_promotion)
+        start = end
+        if old_end == end:
+            old_end, old_promotion = next(old_ranges, (end, None))
+        if new_end == end:
+            new_end, new_promotion = next(new_ranges, (end, None))
+
+
+class CompactBasket(_BaseBasket):
+    """Basket that holds one line item per distinct product.
+
+    Scanning a product increments the quantity on its line rather than
+    copying the product, so totals, discounts and messages scale with the
+    number of distinct products instead of the number of units.  For callers
+    that iterate ``items`` the per-unit view is built on demand, grouped by
+    product in the order each product was first added.
+    """
+    def __init__(self, products, promotions, promotion_index=None,
+                 program=None):
+        """
+        :param dict products: The products available.
+        :param list promotions: The promotions available.
+        :param promotion_index: Optional engine.PromotionIndex of
+          ``promotions`` to share rather than build one for this basket.
+        :param program: Optional rules.RuleProgram of the rule promotions
+          available.
+        :return: None
+        """
+        super().__init__(products, promotions, promotion_index, program)
+        self.lines = {}
+        self._items = None
+
+    @instrument.hot('calculate_discounts')
+    def calculate_discounts(self):
+        """Calculate discounts.
+
+        Ask the promotion index for the allocation of promotions to each
+        line, given the quantities of every line, and apply them.  Any rule
+        promotions are evaluated on the same quantities, then capped at what
+        the promotions leave to pay.
+        """
+        quantities = self.quantities
+        index = self.promotion_index
+        for name, line in self.lines.items():
+            line.apply_promotions(index.allocate(name, quantities))
+        if self.program is not None:
+            self._rule_discounts = self.program.evaluate(
+                quantities, self.products,
+                discounted={name: line.discount_amount
+                            for name, line in self.lines.items()
+                            if line.segments})
+        self._items = None
+
+    @instrument.hot('basket.add')
+    def add(self, item, quantity=1):
+        """Add units of an item to the basket.
+
+        :param str item: The name of an item to be added to the basket.
+        :param int quantity: The number of units to add.
+        :return: True if the item is added and False otherwise.
+        :raises: ValueError if the quantity is not positive.
+        """
+        if quantity < 1:
+            raise ValueError('quantity must be positive')
+        try:
+            prod = self.products[item.lower()]
+        except KeyError:
+            return False
+        line = self.lines.get(prod.name)
+        if line is None:
+            line = self.lines[prod.name] = line_item.LineItem(prod)
+        line.quantity += quantity
+        self._items = None
+        return True
+
+    def remove(self, item, quantity=1):
+        """Remove units of an item from the basket.
+
+        :param str item: The name of an item to be removed from the basket.
+        :param int quantity: The number of units to remove.
+        :return: True if the item is removed and False if there are not
+          that many in the basket.
+        :raises: ValueError if the quantity is not positive.
+        """
+        if quantity < 1:
+            raise ValueError('quantity must be positive')
+        name = item.lower()
+        line = self.lines.get(name)
+        if line is None or line.quantity < quantity:
+            return False
+        line.quantity -= quantity
+        if not line.quantity:
+            del self.lines[name]
+        else:
+            line.trim_promotions()
+        self._items = None
+        return True
+
+    @property
+    def quantities(self):
+        """Quantity of each product in the basket.
+
+        :return dict: Quantities keyed by product name.
+        """
+        return {name: line.quantity for name, line in self.lines.items()}
+
+    @property
+    def items(self):
+        """Per-unit view of the basket.
+
+        The list is cached until the basket next changes.
+
+        :return: List of products, one per unit in the basket.
+        """
+        if self._items is None:
+            self._items = [unit for line in self.lines.values()
+                           for unit in line.units()]
+        return self._items
+
+    @property
+    def discounted_lines(self):
+        """Returns a list of lines with discounts applied.
+
+        :return: List of line_item.LineItem instances.
+        """
+        return [line for line in self.lines.values() if line.segments]
+
+    @property
+    def discounted_items(self):
+        """Returns a list of discounted items.
+
+        :return: List of items in the basket with discounts applied
+          (if any).
+        """
+        return [p for p in self.items if p.has_promotion]
+
+    @property
+    def promotion_discounts(self):
+        """The discount earned from each promotion applied.
+
+        :return list: ``(promotion, amount)`` pairs, amount in pence, in the
+          order the promotions were first applied to the lines, followed
+          by the `rule_discounts`.
+        """
+        discounts = {}
+        for line in self.lines.values():
+            price = line.product.price
+            for promotion, count in line.applied_segments:
+                discounts[promotion] = (discounts.get(promotion, 0)
+                                        + promotion.discount(price, count))
+        return list(discounts.items()) + self.rule_discounts
+
+    @property
+    def total(self):
+        """The total price of the basket with discounts applied.
+
+        :return: Price in pence.
+        """
+        return (sum(line.total for line in self.lines.values())
+                - self.rule_discount)
+
+    @property
+    def subtotal(self):
+        """The total price of the basket without discounts applied.
+
+        :return: Price in pence.
+        """
+        return sum(line.subtotal for line in self.lines.values())
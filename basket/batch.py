@@ -0,0 +1,157 @@
+"""Batch pricing module.
+
+Prices many baskets in one call, sharing the product catalogue and the
+promotion index across the whole batch.  Baskets are never materialised as
+`basket.Basket` instances: each one is reduced to the quantity of every
+product it holds and priced from those quantities.  Rule promotions (see
+the rules module) are evaluated on the same quantities, capped at what the
+per unit promotions leave to pay on each product, and their discounts
+added to those of the per unit promotions, as a basket's are.
+"""
+
+import itertools
+
+from basket import engine
+from basket import rules
+from basket import vectorised
+
+PYTHON = 'python'
+NUMPY = 'numpy'
+
+
+class BatchResult:
+    """Columnar pricing results for a batch of baskets.
+
+    Row ``i`` of every column holds the result for the ``i``-th basket
+    priced.
+    """
+
+    def __init__(self):
+        """
+        :return: None
+        """
+        self.subtotals = []
+        self.discounts = []
+        self.totals = []
+
+    def __len__(self):
+        """Number of baskets priced."""
+        return len(self.totals)
+
+    def rows(self):
+        """Iterate over the results a basket at a time.
+
+        :return: Iterator of ``(subtotal, discount, total)`` tuples.
+        """
+        return zip(self.subtotals, self.discounts, self.totals)
+
+
+def basket_quantities(items, products, lookup=None):
+    """Reduce a basket to the quantity of each product it holds.
+
+    :param items: Iterable of item names; names not in ``products`` are
+      ignored, as `basket.Basket.add` does.
+    :param dict products: The products available.
+    :param dict lookup: Optional cache of item name to product name (or
+      None if out of stock), shared between calls to save normalising the
+      same item names again.
+    :return dict: Quantities keyed by product name.
+    """
+    if lookup is None:
+        lookup = {}
+    quantities = {}
+    for item in items:
+        try:
+            name = lookup[item]
+        except KeyError:
+            prod = products.get(item.lower())
+            name = lookup[item] = prod.name if prod is not None else None
+        if name is not None:
+            quantities[name] = quantities.get(name, 0) + 1
+    return quantities
+
+
+def price_baskets(baskets, products, promotions, backend=PYTHON,
+                  chunk_size=4096, program=None):
+    """Price a batch of baskets.
+
+    :param baskets: Iterable of baskets, each an iterable of item names.
+    :param dict products: The products available.
+    :param promotions: List of promotion.Promotion and rules.Rule instances,
+      as loaded from a promotions file, or an already built
+      engine.PromotionIndex.
+    :param str backend: `PYTHON` or `NUMPY`.  The NumPy backend prices
+      ``chunk_size`` baskets at a time with array operations; pure Python
+      is used instead if NumPy is not installed.
+    :param int chunk_size: Baskets per chunk for the NumPy backend.
+    :param program: rules.RuleProgram of the rule promotions, e.g. a
+      catalogue.Catalogue's ``program`` to go with its ``index``.  By
+      default it is made from the rules.Rule instances in ``promotions``.
+    :return: BatchResult instance.
+    :raises: ValueError if the backend is unknown.
+    """
+    if backend not in (PYTHON, NUMPY):
+        raise ValueError(f'Unknown pricing backend: {backend}')
+    if isinstance(promotions, engine.PromotionIndex):
+        index = promotions
+    else:
+        rule_promotions = [p for p in promotions if isinstance(p, rules.Rule)]
+        if rule_promotions:
+            promotions = [p for p in promotions
+                          if not isinstance(p, rules.Rule)]
+            if program is None:
+                program = rules.RuleProgram(rule_promotions)
+        index = engine.PromotionIndex(promotions)
+    if backend == NUMPY and vectorised.available():
+        return _price_baskets_vectorised(baskets, products, index, program,
+                                         chunk_size)
+    return _price_baskets_python(baskets, products, index, program)
+
+
+def _price_baskets_vectorised(baskets, products, index, program,
+                              chunk_size):
+    pricer = vectorised.VectorisedPricer(products, index, program)
+    lookup = {}
+    result = BatchResult()
+    baskets = iter(baskets)
+    while True:
+        quantities = [basket_quantities(items, products, lookup)
+                      for items in itertools.islice(baskets, chunk_size)]
+        if not quantities:
+            break
+        subtotals, discounts = pricer.price(quantities)
+        result.subtotals.extend(subtotals.tolist())
+        result.discounts.extend(discounts.tolist())
+        result.totals.extend((subtotals - discounts).tolist())
+    return result
+
+
+def _price_baskets_python(baskets, products, index, program):
+    prices = {prod.name: prod.price for prod in products.values()}
+    by_discounted = index.by_discounted
+    lookup = {}
+    result = BatchResult()
+    for items in baskets:
+        quantities = basket_quantities(items, products, lookup)
+        subtotal = 0
+        discount = 0
+        discounted = {}
+        for name, qty in quantities.items():
+            price = prices[name]
+            subtotal += price * qty
+            if name not in by_discounted:
+                continue
+            line_discount = 0
+            for promotion, count in index.allocate(name, quantities):
+                line_discount += promotion.discount(price, count)
+            if line_discount:
+                discount += line_discount
+                discounted[name] = line_discount
+        if program is not None:
+            for _, amount in program.evaluate(quantities, products,
+                                              subtotal, discounted):
+                discount += amount
+        result.subtotals.append(subtotal)
+        result.discounts.append(discount)
+        result.totals.append(subtotal - discount)
+    return result
@@ -0,0 +1,194 @@
+"""Bulk pricing module.
+
+Prices many baskets read from a file or stdin, spreading them across a pool
+of worker processes.  Each worker loads the catalogue once, when it starts,
+and receipts are yielded in input order as they become available.
+
+While tracing is on (see the explain module) each basket is traced under
+its number in the input, counting from 1, and the workers send their
+traces back with the receipts.
+"""
+
+import csv
+import json
+import multiprocessing
+import multiprocessing.util
+
+from basket import catalogue
+from basket import compiled
+from basket import explain
+from basket import loader
+from basket import money
+from basket import receipt
+from basket import stores
+
+LINES = 'lines'
+JSONL = 'jsonl'
+CSV = 'csv'
+FORMATS = (LINES, JSONL, CSV)
+
+# The catalogue loaded by `init_worker` in this process.
+_catalogue = None
+
+
+def read_baskets(stream, fmt=LINES):
+    """Read baskets from a stream, one basket per line.
+
+    Blank lines are skipped.
+
+    :param stream: File like object to read from.
+    :param str fmt: `LINES` for whitespace separated item names, `JSONL`
+      for a json list of item names (or an object with an ``items`` list)
+      or `CSV` for comma separated item names.
+    :return: Iterator of lists of item names.
+    :raises: ValueError if a json line cannot be parsed or is not a list
+      of item names.
+    """
+    if fmt == CSV:
+        for row in csv.reader(stream):
+            items = [cell.strip() for cell in row if cell.strip()]
+            if items:
+                yield items
+    elif fmt == JSONL:
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f'Invalid basket on line {line_no}: {e}')
+            if isinstance(record, dict):
+                record = record.get('items', [])
+            if (not isinstance(record, list)
+                    or not all(isinstance(item, str) for item in record)):
+                raise ValueError(f'Invalid basket on line {line_no}: '
+                                 'expecting a list of item names')
+            yield record
+    else:
+        for line in stream:
+            items = line.split()
+            if items:
+                yield items
+
+
+def init_worker(products_file_path, promotions_file_path, verbose=False,
+                catalogue_file_path=None, optimal=False,
+                rounding=money.UNIT_FLOOR, stores_file_path=None,
+                store=None, trace=False):
+    """Load the catalogue used by `price_items` in this process.
+
+    :param str products_file_path: Path to products file.
+    :param str promotions_file_path: Path to promotions file.
+    :param bool verbose: Enable logging in this process.
+    :param str catalogue_file_path: Path to a compiled catalogue to
+      memory-map instead of loading the products and promotions files.
+    :param bool optimal: Allocate promotions for the lowest price, see
+      catalogue.Catalogue.
+    :param str rounding: Rounding policy of the discounts, see
+      catalogue.Catalogue.
+    :param str stores_file_path: Path to the stores file, see
+      stores.Stores.load.
+    :param store: Identifier of the store in the stores file to price for,
+      or None to price against the catalogue itself.
+    :param bool trace: Trace the baskets priced in a worker process, for
+      `trace_items`.
+    """
+    global _catalogue
+    loader.logger.enabled = verbose
+    if multiprocessing.parent_process() is not None:
+        # Write out messages queued by a background log writer inherited
+        # from the parent before the worker exits.
+        multiprocessing.util.Finalize(loader.logger, loader.logger.close,
+                                      exitpriority=10)
+        # Never write to a trace inherited from the parent.
+        explain.disable()
+        if trace:
+            explain.enable()
+    if catalogue_file_path is not None:
+        _catalogue = compiled.MappedCatalogue(catalogue_file_path, optimal,
+                                              rounding)
+    else:
+        _catalogue = catalogue.Catalogue.load(products_file_path,
+                                              promotions_file_path, optimal,
+                                              rounding)
+    if store is not None:
+        multi = stores.Stores(_catalogue)
+        multi.load(stores_file_path)
+        _catalogue = multi.catalogue(store)
+
+
+def price_items(items):
+    """Price one basket against the catalogue loaded by `init_worker`.
+
+    :param list items: Names of the items in the basket.
+    :return list: Lines of the basket's receipt.
+    """
+    shopping_basket = _catalogue.basket()
+    for item in items:
+        if not shopping_basket.add(item):
+            loader.logger.log("Item '{item}' not in stock", item=item)
+    return receipt.render(shopping_basket)
+
+
+def trace_items(numbered):
+    """Price and trace one basket in a worker process.
+
+    :param tuple numbered: The basket's number and the names of its items.
+    :return tuple: The basket's receipt, see `price_items`, and its trace
+      record, see explain.Trace.basket_record.
+    """
+    basket_id, items = numbered
+    explain.begin(basket_id)
+    lines = price_items(items)
+    explain.tracer.finish()
+    return lines, explain.tracer.baskets.pop()
+
+
+def price_all(baskets, products_file_path, promotions_file_path,
+              workers=None, chunksize=64, verbose=False,
+              catalogue_file_path=None, optimal=False,
+              rounding=money.UNIT_FLOOR, stores_file_path=None, store=None):
+    """Price baskets on a pool of worker processes.
+
+    :param baskets: Iterable of baskets, each a list of item names.
+    :param str products_file_path: Path to products file.
+    :param str promotions_file_path: Path to promotions file.
+    :param int workers: Number of worker processes, defaults to the number
+      of CPUs.  With a single worker baskets are priced in this process.
+    :param int chunksize: Number of baskets sent to a worker at a time.
+    :param bool verbose: Enable logging in the workers.
+    :param str catalogue_file_path: Path to a compiled catalogue for the
+      workers to memory-map instead of loading the products and promotions
+      files; the mapping is shared through the page cache.
+    :param bool optimal: Allocate promotions for the lowest price, see
+      catalogue.Catalogue.
+    :param str rounding: Rounding policy of the discounts, see
+      catalogue.Catalogue.
+    :param str stores_file_path: Path to the stores file, see
+      stores.Stores.load.
+    :param store: Identifier of the store in the stores file to price for,
+      or None to price against the catalogue itself.
+    :return: Iterator of receipts (see `price_items`) in input order.
+    """
+    trace = explain.tracer
+    initargs = (products_file_path, promotions_file_path, verbose,
+                catalogue_file_path, optimal, rounding, stores_file_path,
+                store, trace is not None)
+    if workers == 1:
+        init_worker(*initargs)
+        for basket_id, items in enumerate(baskets, 1):
+            explain.begin(basket_id)
+            yield price_items(items)
+        return
+    with multiprocessing.Pool(workers, init_worker, initargs) as pool:
+        if trace is None:
+            yield from pool.imap(price_items, baskets, chunksize)
+        else:
+            for lines, record in pool.imap(
+                    trace_items, enumerate(baskets, 1), chunksize):
+                trace.add(record)
+                yield lines
+        # Let the workers exit by themselves, rather than be terminated, so
+        # that they finish logging.
+        pool.close()
+        pool.join()
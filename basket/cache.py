@@ -0,0 +1,165 @@
+"""Pricing cache module.
+
+Many baskets hold exactly the same products as one priced before (meal
+deals, subscription boxes, ...).  `PricingCache` remembers the pricing of
+recently seen basket contents so that they are not added and discounted
+again.
+
+Entries are keyed by the version of the catalogue they were priced against
+and a fingerprint of the basket's contents, the quantity of each product
+regardless of the order they were scanned in.  The cache empties itself as
+soon as it is asked to price against a newer version, e.g. after
+`watcher.CatalogueWatcher` has reloaded changed promotions, and a pricing
+against an older version still in flight then is not cached.
+"""
+
+import collections
+import threading
+import time
+
+from basket import pipeline
+
+
+def fingerprint(quantities):
+    """Canonical fingerprint of a basket's contents.
+
+    :param dict quantities: Quantity in the basket keyed by product name.
+    :return tuple: ``(name, quantity)`` pairs sorted by name.
+    """
+    return tuple(sorted(item for item in quantities.items() if item[1]))
+
+
+def price_contents(cat, contents):
+    """Price basket contents.
+
+    :param cat: catalogue.Catalogue to price against.
+    :param contents: ``(name, quantity)`` pairs, e.g. a `fingerprint`.
+    :return dict: The subtotal, the discount earned from each promotion and
+      the total, as in a `pipeline.basket_record`.
+    """
+    shopping_basket = cat.basket(compact=True)
+    for name, quantity in contents:
+        shopping_basket.add(name, quantity)
+    shopping_basket.calculate_discounts()
+    return {
+        'subtotal': shopping_basket.subtotal,
+        'discounts': pipeline.discount_records(
+            shopping_basket.promotion_discounts),
+        'total': shopping_basket.total,
+    }
+
+
+class PricingCache:
+    """Least recently used cache of basket pricings.
+
+    Safe to share between threads.  Cached pricings are shared by every
+    caller that looks them up and must not be modified.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        """
+        :param int maxsize: Most pricings to keep; the least recently used
+          is evicted to make room for another.
+        :param float ttl: Seconds a pricing is kept for, or None to keep it
+          until it is evicted.
+        :param clock: Function returning the current time in seconds.
+        :return: None
+        """
+        if maxsize < 1:
+            raise ValueError('Cache size must be at least 1')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Look up a cached value.
+
+        :param key: The key it was cached under.
+        :return: The value, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or self.clock() < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value, version=None):
+        """Cache a value, evicting the least recently used if full.
+
+        :param key: Key to cache it under.
+        :param value: The value.
+        :param version: Catalogue version the value was worked out for; it
+          is not cached unless that is still the cache's ``version``.
+        """
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every cached value."""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+
+    def price(self, cat, quantities):
+        """Price basket contents, from the cache if they have been before.
+
+        :param cat: catalogue.Catalogue to price against.
+        :param dict quantities: Quantity in the basket keyed by product name,
+          for products in the catalogue.
+        :return dict: See `price_contents`.
+        """
+        version = cat.version
+        with self._lock:
+            if self.version is None or version > self.version:
+                self._clear()
+                self.version = version
+        contents = fingerprint(quantities)
+        key = (version, contents)
+        pricing = self.get(key)
+        if pricing is None:
+            pricing = price_contents(cat, contents)
+            self.put(key, pricing, version)
+        return pricing
+
+    def stats(self):
+        """The cache's size and counters.
+
+        :return dict: Current and maximum size, hits, misses, hit rate,
+          evictions, expirations and invalidations.
+        """
+        lookups = self.hits + self.misses
+        return {'size': len(self._entries), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations}
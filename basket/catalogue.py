@@ -0,0 +1,105 @@
+"""Catalogue module."""
+
+import itertools
+
+from basket import basket
+from basket import engine
+from basket import loader
+from basket import money
+from basket import rules
+
+_versions = itertools.count(1)
+
+
+class Catalogue:
+    """Class that encapsulates the products and promotions on offer.
+
+    Bundles the product catalogue with the promotions and their index so
+    that they are loaded, indexed and their discounts precomputed once and
+    then shared by every basket priced against them.  Promotions of the
+    types in the rules module are compiled into a rules.RuleProgram, or
+    ``program`` is None if there are none.
+    """
+
+    program = None
+
+    def __init__(self, products, promotions, optimal=False,
+                 rounding=money.UNIT_FLOOR):
+        """
+        :param dict products: The products available.
+        :param list promotions: The promotions available,
+          promotion.Promotion and rules.Rule instances.
+        :param bool optimal: Allocate promotions for the lowest price (see
+          engine.OptimalPromotionIndex) rather than in file order.
+        :param str rounding: Rounding policy of the promotions' discounts,
+          see the money module.
+        :raises: ValueError if the rounding policy is unknown.
+        :return: None
+        """
+        if rounding not in money.ROUNDINGS:
+            raise ValueError(f'Unknown rounding policy: {rounding}')
+        rule_promotions = [p for p in promotions if isinstance(p, rules.Rule)]
+        if rule_promotions:
+            promotions = [p for p in promotions
+                          if not isinstance(p, rules.Rule)]
+            self.program = rules.RuleProgram(rule_promotions)
+        self.products = products
+        self.promotions = promotions
+        self.rounding = rounding
+        for promotion in promotions:
+            promotion.rounding = rounding
+        if optimal:
+            self.index = engine.OptimalPromotionIndex(promotions, products)
+        else:
+            self.index = engine.PromotionIndex(promotions)
+        self.prime()
+        self.touch()
+
+    def touch(self):
+        """Give the catalogue a new version.
+
+        Every catalogue gets its own ``version`` when it is made, so prices
+        cached against another catalogue are not reused (see
+        cache.PricingCache).  Call this after changing the products or
+        promotions in place for the same reason.
+        """
+        self.version = next(_versions)
+
+    def prime(self):
+        """Precompute the discount and message each promotion gives.
+
+        Fills each promotion's lookup table for the current price of the
+        product it discounts, so pricing and rendering receipts are just
+        lookups.  Tables follow later price changes by themselves (they are
+        keyed by price) but this can be called again to precompute them.
+        """
+        for promotion in self.promotions:
+            prod = self.products.get(promotion.discounted_product)
+            if prod is not None:
+                promotion.prime(prod.price)
+
+    @classmethod
+    def load(cls, products_file_path, promotions_file_path, optimal=False,
+             rounding=money.UNIT_FLOOR):
+        """Load a catalogue from its json data files.
+
+        :param str products_file_path: Path to products file.
+        :param str promotions_file_path: Path to promotions file.
+        :param bool optimal: See `Catalogue`.
+        :param str rounding: See `Catalogue`.
+        :return: Catalogue instance.
+        """
+        return cls(loader.load_products(products_file_path),
+                   loader.load_promotions(promotions_file_path), optimal,
+                   rounding)
+
+    def basket(self, compact=False):
+        """Make an empty basket priced against this catalogue.
+
+        :param bool compact: Make a basket.CompactBasket rather than a
+          basket.Basket.
+        :return: The new basket, sharing this catalogue's promotion index
+          and rule program.
+        """
+        cls = basket.CompactBasket if compact else basket.Basket
+        return cls(self.products, self.promotions, self.index, self.program)
@@ -0,0 +1,346 @@
+"""Compiled catalogue module.
+
+Compiles a catalogue into a compact binary file that can be memory-mapped,
+and so shared between processes through the page cache, instead of parsing
+json and building every product and promotion in each process.  Products
+and promotions are only materialised when looked up.
+
+Layout (little-endian)::
+
+    header      magic, format version, table sizes and section offsets
+    products    fixed-width records sorted by name:
+                name offset/length, unit offset/length, price
+    promotions  fixed-width records in file order:
+                id, title, qualifying product and discounted product
+                offset/length, qualifying qty, discount in basis points
+    groups      the promotion index: per product name (sorted), the range
+                of `members` listing the promotions discounting it, then
+                the same for the promotions it qualifies for
+    members     promotion numbers, in file order within each group
+    strings     utf-8 string table referenced by offset/length
+"""
+
+import bisect
+import collections.abc
+import json
+import mmap
+import struct
+
+from basket import catalogue
+from basket import engine
+from basket import money
+from basket import product
+from basket import promotion
+
+MAGIC = b'BSKT'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHH4I5Q')
+PRODUCT = struct.Struct('<4Iq')
+PROMOTION = struct.Struct('<8Iii')
+GROUP = struct.Struct('<4I')
+MEMBER = struct.Struct('<I')
+
+
+class _StringTable:
+    """Builds a string table, storing each distinct string once."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = {}
+
+    def add(self, string):
+        """Add a string to the table.
+
+        :param str string: The string.
+        :return: ``(offset, length)`` of its utf-8 encoding in the table.
+        """
+        encoded = string.encode()
+        offset = self.offsets.get(encoded)
+        if offset is None:
+            offset = self.offsets[encoded] = len(self.data)
+            self.data += encoded
+        return offset, len(encoded)
+
+
+def compile_catalogue(cat, output_file_path):
+    """Write a catalogue out in the compiled format.
+
+    :param cat: catalogue.Catalogue to compile.
+    :param str output_file_path: Path of the file to write.
+    :raises: ValueError if the catalogue has rule promotions, which the
+      format cannot hold.
+    """
+    if cat.program is not None:
+        raise ValueError('Compiled catalogues cannot hold promotions of '
+                         'types other than percent')
+    strings = _StringTable()
+
+    products = bytearray()
+    for name in sorted(cat.products, key=str.encode):
+        prod = cat.products[name]
+        products += PRODUCT.pack(*strings.add(prod.name),
+                                 *strings.add(prod.unit), prod.price)
+
+    promotions = bytearray()
+    for promo in cat.promotions:
+        promotions += PROMOTION.pack(
+            *strings.add(json.dumps(promo.promo_id)),
+            *strings.add(promo.title),
+            *strings.add(promo.qualifying_product),
+            *strings.add(promo.discounted_product),
+            promo.qualifying_qty, promo.discount_bp)
+
+    number = {id(promo): i for i, promo in enumerate(cat.promotions)}
+    groups = bytearray()
+    members = bytearray()
+    group_counts = []
+    for by_name in (cat.index.by_discounted, cat.index.by_qualifying):
+        group_counts.append(len(by_name))
+        for name in sorted(by_name, key=str.encode):
+            start = len(members) // MEMBER.size
+            for promo in by_name[name]:
+                members += MEMBER.pack(number[id(promo)])
+            groups += GROUP.pack(*strings.add(name), start,
+                                 len(by_name[name]))
+
+    offsets = [HEADER.size]
+    for section in (products, promotions, groups, members):
+        offsets.append(offsets[-1] + len(section))
+    header = HEADER.pack(MAGIC, VERSION, 0, len(cat.products),
+                         len(cat.promotions), *group_counts, *offsets)
+    with open(output_file_path, 'wb') as f:
+        for section in (header, products, promotions, groups, members,
+                        strings.data):
+            f.write(section)
+
+
+class _MappedFile:
+    """The sections of a memory-mapped compiled catalogue."""
+
+    def __init__(self, buffer):
+        try:
+            header = HEADER.unpack_from(buffer)
+        except struct.error:
+            header = (None, None) + (0,) * 9
+        (magic, version, _, self.num_products, self.num_promotions,
+         self.num_discounted, self.num_qualifying, self.products_offset,
+         self.promotions_offset, self.groups_offset, self.members_offset,
+         self.strings_offset) = header
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a compiled catalogue (or the wrong '
+                             'version of one)')
+        self.buffer = buffer
+
+    def string(self, offset, length):
+        start = self.strings_offset + offset
+        return bytes(self.buffer[start:start + length]).decode()
+
+    def string_bytes(self, offset, length):
+        start = self.strings_offset + offset
+        return bytes(self.buffer[start:start + length])
+
+
+class _SortedNames(collections.abc.Sequence):
+    """Names of fixed-width records sorted by name, for binary search."""
+
+    def __init__(self, mapped, offset, count, record, name_field=0):
+        self.mapped = mapped
+        self.offset = offset
+        self.count = count
+        self.record = record
+        self.name_field = name_field
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+    def __getitem__(self, i):
+        fields = self.record.unpack_from(
+            self.mapped.buffer, self.offset + i * self.record.size)
+        return self.mapped.string_bytes(
+            fields[self.name_field], fields[self.name_field + 1])
+
+    def find(self, name):
+        """Position of the record for a name, or None."""
+        key = name.encode()
+        i = bisect.bisect_left(self, key)
+        if i < self.count and self[i] == key:
+            return i
+        return None
+
+
+class ProductTable(collections.abc.Mapping):
+    """Read-only mapping of product name to product.Product.
+
+    Products are materialised from the file the first time they are looked
+    up and then cached.
+    """
+
+    def __init__(self, mapped):
+        self.mapped = mapped
+        self.names = _SortedNames(mapped, mapped.products_offset,
+                                  mapped.num_products, PRODUCT)
+        self._cache = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        i = self.names.find(name)
+        if i is None:
+            raise KeyError(name)
+        name_off, name_len, unit_off, unit_len, price = PRODUCT.unpack_from(
+            self.mapped.buffer, self.mapped.products_offset + i * PRODUCT.size)
+        prod = self._cache[name] = product.Product(
+            self.mapped.string(name_off, name_len), price,
+            self.mapped.string(unit_off, unit_len))
+        return prod
+
+    def __contains__(self, name):
+        return name in self._cache or self.names.find(name) is not None
+
+    def __iter__(self):
+        return (name.decode() for name in self.names)
+
+    def __len__(self):
+        return self.mapped.num_products
+
+
+class PromotionTable(collections.abc.Sequence):
+    """Read-only sequence of promotion.Promotion in file order.
+
+    Promotions are materialised the first time they are accessed and then
+    cached.
+    """
+
+    def __init__(self, mapped, rounding=money.UNIT_FLOOR):
+        self.mapped = mapped
+        self.rounding = rounding
+        self._cache = {}
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('promotion index out of range')
+        try:
+            return self._cache[i]
+        except KeyError:
+            pass
+        fields = PROMOTION.unpack_from(
+            self.mapped.buffer, self.mapped.promotions_offset
+            + i * PROMOTION.size)
+        string = self.mapped.string
+        promo = promotion.Promotion({
+            'id': json.loads(string(*fields[0:2])),
+            'title': string(*fields[2:4]),
+            'qualifying_product': string(*fields[4:6]),
+            'qualifying_qty': fields[8],
+            'discounted_product': string(*fields[6:8]),
+            'discount_percent': 0})
+        promo.discount_bp = fields[9]
+        promo.rounding = self.rounding
+        self._cache[i] = promo
+        return promo
+
+    def __len__(self):
+        return self.mapped.num_promotions
+
+
+class PromotionGroups(collections.abc.Mapping):
+    """Read-only mapping of product name to the promotions involving it."""
+
+    def __init__(self, mapped, promotions, offset, count):
+        self.mapped = mapped
+        self.promotions = promotions
+        self.offset = offset
+        self.names = _SortedNames(mapped, offset, count, GROUP)
+        self._cache = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        i = self.names.find(name)
+        if i is None:
+            raise KeyError(name)
+        _, _, start, count = GROUP.unpack_from(
+            self.mapped.buffer, self.offset + i * GROUP.size)
+        members = self.mapped.members_offset + start * MEMBER.size
+        group = self._cache[name] = [
+            self.promotions[MEMBER.unpack_from(self.mapped.buffer,
+                                               members + j * MEMBER.size)[0]]
+            for j in range(count)]
+        return group
+
+    def __contains__(self, name):
+        return name in self._cache or self.names.find(name) is not None
+
+    def __iter__(self):
+        return (name.decode() for name in self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class MappedPromotionIndex(engine.PromotionIndex):
+    """Promotion index read from a compiled catalogue."""
+
+    def __init__(self, mapped, promotions):
+        """
+        :param mapped: The compiled catalogue's sections.
+        :param promotions: PromotionTable of the catalogue.
+        :return: None
+        """
+        self.promotions = promotions
+        self.by_discounted = PromotionGroups(
+            mapped, promotions, mapped.groups_offset, mapped.num_discounted)
+        self.by_qualifying = PromotionGroups(
+            mapped, promotions,
+            mapped.groups_offset + mapped.num_discounted * GROUP.size,
+            mapped.num_qualifying)
+
+
+class MappedCatalogue(catalogue.Catalogue):
+    """Catalogue backed by a memory-mapped compiled catalogue file.
+
+    Nothing is parsed up front: products, promotions and index entries are
+    materialised as they are looked up.  The discount tables of promotions
+    are filled on first use rather than primed.
+    """
+
+    def __init__(self, compiled_file_path, optimal=False,
+                 rounding=money.UNIT_FLOOR):
+        """
+        :param str compiled_file_path: Path to a file written by
+          `compile_catalogue`.
+        :param bool optimal: Allocate promotions for the lowest price, see
+          catalogue.Catalogue.  The index is then built from every
+          promotion up front.
+        :param str rounding: Rounding policy of the discounts, see
+          catalogue.Catalogue.
+        :raises: ValueError if the file is not a compiled catalogue or the
+          rounding policy is unknown.
+        :return: None
+        """
+        if rounding not in money.ROUNDINGS:
+            raise ValueError(f'Unknown rounding policy: {rounding}')
+        with open(compiled_file_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mapped = _MappedFile(memoryview(self._mmap))
+        self.products = ProductTable(mapped)
+        self.promotions = PromotionTable(mapped, rounding)
+        self.rounding = rounding
+        if optimal:
+            self.index = engine.OptimalPromotionIndex(self.promotions,
+                                                      self.products)
+        else:
+            self.index = MappedPromotionIndex(mapped, self.promotions)
+        self.touch()
@@ -0,0 +1,217 @@
+"""Discount engine module.
+
+`PromotionIndex` applies promotions in the order they are listed, a later
+promotion overriding an earlier one on the units they share, and
+`OptimalPromotionIndex` allocates them for the lowest price instead.
+"""
+
+from basket import instrument
+
+
+class PromotionIndex:
+    """Index of promotions keyed by the products they involve.
+
+    Promotions only ever link a qualifying product to a discounted product,
+    so indexing them by both names lets the basket look at just the
+    promotions touching the products it holds instead of rescanning every
+    item for every promotion.
+    """
+
+    def __init__(self, promotions):
+        """
+        :param list promotions: promotion.Promotion instances, in the order
+          they are to be applied.
+        :return: None
+        """
+        self.promotions = promotions
+        self.by_qualifying = {}
+        self.by_discounted = {}
+        for promotion in promotions:
+            self.by_qualifying.setdefault(
+                promotion.qualifying_product, []).append(promotion)
+            self.by_discounted.setdefault(
+                promotion.discounted_product, []).append(promotion)
+
+    def affected_products(self, name):
+        """Names of the products whose discounts depend on a product.
+
+        :param str name: Name of a product whose quantity has changed.
+        :return set: The product itself plus every product discounted by a
+          promotion that ``name`` qualifies for.
+        """
+        affected = {name}
+        affected.update(p.discounted_product
+                        for p in self.by_qualifying.get(name, ()))
+        return affected
+
+    def product_groups(self, names):
+        """Split products into groups that no promotion links.
+
+        The discounts of the products in one group do not depend on the
+        quantities of the products in any other, so groups can be priced
+        independently.
+
+        :param names: Iterable of the names of the products in a basket.
+        :return list: Lists of names, each in the order of ``names``, with
+          the groups in the order of their first name.
+        """
+        parents = dict.fromkeys(names)
+
+        def find(name):
+            root = name
+            while parents[root] is not None:
+                root = parents[root]
+            while name != root:
+                parent = parents[name]
+                parents[name] = root
+                name = parent
+            return root
+
+        for name in parents:
+            for promotion in self.by_qualifying.get(name, ()):
+                other = promotion.discounted_product
+                if other in parents:
+                    root, other_root = find(name), find(other)
+                    if root != other_root:
+                        parents[other_root] = root
+        groups = {}
+        for name in parents:
+            groups.setdefault(find(name), []).append(name)
+        return list(groups.values())
+
+    def allocate(self, name, quantities):
+        """Allocate promotions to the units of one discounted product.
+
+        The evaluation is recorded if instrumentation is on.
+
+        :param str name: Name of the discounted product.
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :return list: ``(promotion, count)`` pairs, see `_allocate`.
+        """
+        recorder = instrument.recorder
+        if recorder is None:
+            return self._allocate(name, quantities)
+        start = instrument.clock()
+        segments = self._allocate(name, quantities)
+        recorder.record_promotions(self.by_discounted.get(name),
+                                   instrument.clock() - start)
+        return segments
+
+    def _allocate(self, name, quantities):
+        """Allocate promotions to the units of one discounted product.
+
+        Promotions are applied in order, each discounting the leading units
+        of the product up to the number of discounts it has earned, so a
+        later promotion overrides an earlier one on the units they share.
+        Walking the promotions backwards gives the final allocation directly.
+
+        :param str name: Name of the discounted product.
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :return list: ``(promotion, count)`` pairs in unit order, i.e. the
+          first ``count`` units get the first promotion and so on.
+        """
+        qty = quantities.get(name, 0)
+        promotions = self.by_discounted.get(name)
+        if not qty or not promotions:
+            return []
+
+        segments = []
+        covered = 0
+        for promotion in reversed(promotions):
+            earned = (quantities.get(promotion.qualifying_product, 0)
+                      // promotion.qualifying_qty)
+            earned = min(earned, qty)
+            if earned > covered:
+                segments.append((promotion, earned - covered))
+                covered = earned
+                if covered == qty:
+                    break
+        return segments
+
+    def allocate_all(self, quantities):
+        """Allocate promotions to every product in a basket.
+
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :return dict: Non-empty allocations (see `allocate`) keyed by product
+          name.
+        """
+        allocations = {}
+        for name in quantities:
+            segments = self.allocate(name, quantities)
+            if segments:
+                allocations[name] = segments
+        return allocations
+
+
+class OptimalPromotionIndex(PromotionIndex):
+    """Promotion index that allocates promotions for the best price.
+
+    Rather than applying promotions in order, each unit of a discounted
+    product gets whichever earned promotion gives the customer the biggest
+    discount, so the result no longer depends on the order of the
+    promotions file.
+
+    A promotion earned ``n`` times can discount any ``n`` units of its
+    product and every unit of a product is priced the same, so filling the
+    units from the promotions in order of discount per unit is optimal.
+    Products are allocated independently (qualifying items are not used up)
+    and the ranking of each product's promotions is worked out once per
+    price and remembered, so allocating a product takes time linear in the
+    number of promotions discounting it, however large the basket.
+    """
+
+    def __init__(self, promotions, products):
+        """
+        :param list promotions: promotion.Promotion instances.
+        :param products: Mapping of product name to product.Product, for
+          the prices the promotions are ranked by.
+        :return: None
+        """
+        super().__init__(promotions)
+        self.products = products
+        self._rankings = {}
+
+    def ranking(self, name):
+        """The promotions discounting a product, best first.
+
+        Promotions giving no discount are left out.  Ties go to the later
+        promotion, as they would when applying promotions in order.
+
+        :param str name: Name of the discounted product.
+        :return list: ``(promotion, unit discount)`` pairs.
+        """
+        price = self.products[name].price
+        try:
+            return self._rankings[name, price]
+        except KeyError:
+            pass
+        ranked = [(promotion, promotion.discount_for(price))
+                  for promotion in reversed(self.by_discounted.get(name, ()))]
+        ranked = [entry for entry in ranked if entry[1] > 0]
+        ranked.sort(key=lambda entry: entry[1], reverse=True)
+        self._rankings[name, price] = ranked
+        return ranked
+
+    def _allocate(self, name, quantities):
+        """Allocate promotions to the units of one discounted product.
+
+        :param str name: Name of the discounted product.
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :return list: ``(promotion, count)`` pairs, best discount first.
+        """
+        qty = quantities.get(name, 0)
+        if not qty or name not in self.by_discounted:
+            return []
+
+        segments = []
+        remaining = qty
+        for promotion, _ in self.ranking(name):
+            earned = (quantities.get(promotion.qualifying_product, 0)
+                      // promotion.qualifying_qty)
+            if earned > 0:
+                count = min(earned, remaining)
+                segments.append((promotion, count))
+                remaining -= count
+                if not remaining:
+                    break
+        return segments
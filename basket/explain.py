@@ -0,0 +1,259 @@
+"""Explain module.
+
+Traces how the promotions discounting each product of a basket were
+evaluated, to explain a total after the fact.  For every promotion looked
+at the trace holds a compact entry of:
+
+* ``promotion``, the promotion's id,
+* ``product``, the discounted product and ``quantity``, how many of it the
+  basket holds,
+* ``qualifying_count``, how many of the qualifying product were counted,
+* ``earned``, the discounts that earns, i.e. ``qualifying_count`` divided
+  by the promotion's qualifying quantity, and
+* ``applied``, the units the promotion discounted in the end, fewer than
+  earned when the basket ran out of the product or another promotion took
+  the units.
+
+Rule promotions (see the rules module) are listed separately, under
+``rules``, with an entry for every rule evaluated of:
+
+* ``promotion``, the promotion's id,
+* ``quantities``, the quantity of each product the rule reads,
+* ``subtotal``, the basket's subtotal for a rule on the whole basket, or
+  None, and
+* ``amount``, the discount it gave, 0 if it did not apply.
+
+Tracing is off unless a `Trace` is installed with `enable`.  While it is
+off it costs nothing: the tracing versions of
+engine.PromotionIndex.allocate and rules.RuleProgram.evaluate are only put
+in place by `enable`, and taken out again by `disable`.
+
+Traces are exported as json, a record per basket, either kept in memory or
+written to a stream a line at a time as each basket is finished, so the
+baskets of a high volume run can be looked into offline without pricing
+them again.
+"""
+
+import functools
+import json
+
+from basket import engine
+from basket import money
+from basket import rules
+
+# The installed trace, or None while tracing is off.
+tracer = None
+
+# Names of the fields of a trace entry, in order.
+FIELDS = ('promotion', 'product', 'quantity', 'qualifying_count', 'earned',
+          'applied')
+
+# Names of the fields of a rule promotion's trace entry, in order.
+RULE_FIELDS = ('promotion', 'quantities', 'subtotal', 'amount')
+
+_allocate = engine.PromotionIndex.allocate
+_evaluate = rules.RuleProgram.evaluate
+
+
+def enable(new_tracer=None):
+    """Turn tracing on.
+
+    :param new_tracer: Trace to install, by default a new `Trace`.
+    :return: The installed trace.
+    """
+    global tracer
+    tracer = new_tracer if new_tracer is not None else Trace()
+    engine.PromotionIndex.allocate = _traced_allocate
+    rules.RuleProgram.evaluate = _traced_evaluate
+    return tracer
+
+
+def disable():
+    """Turn tracing off.
+
+    The basket being traced, if any, is finished.
+
+    :return: The trace that was installed, if any.
+    """
+    global tracer
+    previous, tracer = tracer, None
+    engine.PromotionIndex.allocate = _allocate
+    rules.RuleProgram.evaluate = _evaluate
+    if previous is not None:
+        previous.finish()
+    return previous
+
+
+def begin(basket_id):
+    """Start tracing a new basket, if tracing is on.
+
+    :param basket_id: Identifier of the basket.
+    """
+    if tracer is not None:
+        tracer.begin(basket_id)
+
+
+@functools.wraps(_allocate)
+def _traced_allocate(self, name, quantities):
+    segments = _allocate(self, name, quantities)
+    # The trace may have been removed meanwhile.
+    if tracer is not None:
+        tracer.record(self, name, quantities, segments)
+    return segments
+
+
+@functools.wraps(_evaluate)
+def _traced_evaluate(self, quantities, products, subtotal=None,
+                     discounted=None):
+    discounts = _evaluate(self, quantities, products, subtotal, discounted)
+    if tracer is not None:
+        if subtotal is None:
+            subtotal = rules.basket_subtotal(quantities, products)
+        amounts = dict(discounts)
+        for rule in self.candidates(quantities):
+            tracer.record_rule(rule, quantities, subtotal,
+                               amounts.get(rule, 0))
+    return discounts
+
+
+class Trace:
+    """Class that accumulates the evaluation trace of baskets."""
+
+    def __init__(self, stream=None):
+        """
+        :param stream: File like object to write each basket's record to,
+          as a json line, once the basket is finished.  Records are kept in
+          ``baskets`` instead if None.
+        :return: None
+        """
+        self.stream = stream
+        self.baskets = []
+        self._basket_id = None
+        self._entries = None
+        self._rule_entries = None
+
+    def begin(self, basket_id):
+        """Start tracing a new basket, finishing the one before.
+
+        :param basket_id: Identifier of the basket.
+        """
+        self.finish()
+        self._basket_id = basket_id
+        self._entries = {}
+        self._rule_entries = {}
+
+    def finish(self):
+        """Finish tracing the current basket, if any."""
+        if self._entries is None:
+            return
+        record = self.basket_record(self._basket_id, self._entries,
+                                    self._rule_entries)
+        self._basket_id = self._entries = self._rule_entries = None
+        self.add(record)
+
+    def add(self, record):
+        """Add the record of a finished basket, e.g. one traced elsewhere.
+
+        :param dict record: The basket's record, see `basket_record`.
+        """
+        if self.stream is None:
+            self.baskets.append(record)
+        else:
+            self.stream.write(json.dumps(record))
+            self.stream.write('\n')
+
+    def record(self, index, name, quantities, segments):
+        """Record the evaluation of the promotions discounting a product.
+
+        A later evaluation of the same product in the same basket, e.g.
+        after an item is added, replaces the earlier one.
+
+        :param index: engine.PromotionIndex that allocated the promotions.
+        :param str name: Name of the discounted product.
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :param list segments: The ``(promotion, count)`` allocation made.
+        """
+        promotions = index.by_discounted.get(name)
+        if not promotions:
+            return
+        if self._entries is None:
+            self.begin(None)
+        quantity = quantities.get(name, 0)
+        applied = dict(segments)
+        entries = []
+        for promotion in promotions:
+            qualifying_count = quantities.get(promotion.qualifying_product, 0)
+            entries.append((promotion.promo_id, name, quantity,
+                            qualifying_count,
+                            qualifying_count // promotion.qualifying_qty,
+                            applied.get(promotion, 0)))
+        self._entries[name] = entries
+
+    def record_rule(self, rule, quantities, subtotal, amount):
+        """Record the evaluation of a rule promotion.
+
+        A later evaluation of the same rule in the same basket replaces the
+        earlier one.
+
+        :param rule: The rules.Rule evaluated.
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :param int subtotal: Undiscounted price of the basket in pence.
+        :param int amount: The discount the rule gave, in pence.
+        """
+        if self._entries is None:
+            self.begin(None)
+        self._rule_entries[rule] = (
+            rule.promo_id,
+            {name: quantities.get(name, 0) for name in rule.products},
+            None if rule.products else subtotal,
+            amount)
+
+    @staticmethod
+    def basket_record(basket_id, entries, rule_entries=None):
+        """Make the json serialisable record of a basket's trace.
+
+        :param basket_id: Identifier of the basket.
+        :param dict entries: Lists of entry tuples keyed by product name.
+        :param dict rule_entries: Rule entry tuples keyed by rule.
+        :return dict: The basket id and its entries, each a dict of
+          `FIELDS`, in the order evaluated, and ``rules``, its rule entries
+          as dicts of `RULE_FIELDS`, if any rule was evaluated.
+        """
+        record = {'basket': basket_id,
+                  'promotions': [dict(zip(FIELDS, entry))
+                                 for product_entries in entries.values()
+                                 for entry in product_entries]}
+        if rule_entries:
+            record['rules'] = [dict(zip(RULE_FIELDS, entry))
+                               for entry in rule_entries.values()]
+        return record
+
+    def report(self):
+        """Explain the traced baskets.
+
+        :return list: Lines of the explanation.
+        """
+        self.finish()
+        if not self.baskets:
+            return ['No promotions evaluated']
+        lines = []
+        for record in self.baskets:
+            if record['basket'] is not None:
+                lines.append(f'Basket {record["basket"]}:')
+            if not record['promotions'] and not record.get('rules'):
+                lines.append('No promotions evaluated')
+            for entry in record['promotions']:
+                lines.append(
+                    f'Promotion {entry["promotion"]} on {entry["product"]} '
+                    f'x{entry["quantity"]}: {entry["qualifying_count"]} '
+                    f'qualifying counted, {entry["earned"]} earned, '
+                    f'{entry["applied"]} applied')
+            for entry in record.get('rules', ()):
+                if entry['subtotal'] is None:
+                    read = ', '.join(f'{name} x{quantity}' for name, quantity
+                                     in entry['quantities'].items())
+                else:
+                    read = f'subtotal {entry["subtotal"]}p'
+                lines.append(f'Promotion {entry["promotion"]} on {read}: '
+                             f'{money.format_discount(entry["amount"])}')
+        return lines
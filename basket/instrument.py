@@ -0,0 +1,173 @@
+"""Instrumentation module.
+
+Timers and counters around the stages of pricing: loading the data files,
+adding items to baskets, evaluating promotions and rendering output.
+
+Instrumentation is off unless a recorder is installed with `enable`.  While
+it is off functions instrumented with `timed` cost one check of the
+module's ``recorder`` per call and methods on hot paths, instrumented with
+`hot`, cost nothing: their timing wrappers are only put in place by
+`enable`, and taken out again by `disable`.
+
+A recorder is any object with the two methods of `Recorder`:
+
+* ``record(stage, seconds)``, called after each instrumented call of a
+  stage, and
+* ``record_promotions(promotions, seconds)``, called after the promotions
+  discounting a product have been evaluated for a basket.
+
+Times are inclusive: the time of a stage includes that of any stage it
+calls, e.g. rendering a receipt calculates the basket's discounts.
+"""
+
+import functools
+import time
+
+# The installed recorder, or None while instrumentation is off.
+recorder = None
+
+clock = time.perf_counter
+
+
+# ``(class, attribute, method, stage)`` of each method instrumented with
+# `hot`.
+_hot_methods = []
+
+
+def enable(new_recorder=None):
+    """Turn instrumentation on.
+
+    :param new_recorder: Recorder to install, by default a new `Recorder`.
+    :return: The installed recorder.
+    """
+    global recorder
+    recorder = new_recorder if new_recorder is not None else Recorder()
+    for owner, name, method, stage in _hot_methods:
+        setattr(owner, name, _timer(method, stage))
+    return recorder
+
+
+def disable():
+    """Turn instrumentation off.
+
+    :return: The recorder that was installed, if any.
+    """
+    global recorder
+    previous, recorder = recorder, None
+    for owner, name, method, _ in _hot_methods:
+        setattr(owner, name, method)
+    return previous
+
+
+def _timer(func, stage):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if recorder is None:
+            return func(*args, **kwargs)
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # The recorder may have been removed meanwhile.
+            if recorder is not None:
+                recorder.record(stage, clock() - start)
+    return wrapper
+
+
+def timed(stage):
+    """Decorator timing each call of a function as a stage.
+
+    :param str stage: Name of the stage.
+    """
+    return functools.partial(_timer, stage=stage)
+
+
+class _HotMethod:
+    """Stands in for a method until its class is made, to register it."""
+
+    def __init__(self, method, stage):
+        self.method = method
+        self.stage = stage
+
+    def __set_name__(self, owner, name):
+        setattr(owner, name, self.method)
+        _hot_methods.append((owner, name, self.method, self.stage))
+
+
+def hot(stage):
+    """Decorator timing each call of a method as a stage.
+
+    The method is left as it is, and so costs nothing extra, unless
+    instrumentation is on.
+
+    :param str stage: Name of the stage.
+    """
+    return functools.partial(_HotMethod, stage=stage)
+
+
+class Recorder:
+    """Class that accumulates call counts and times."""
+
+    def __init__(self):
+        self.stages = {}
+        self.promotions = {}
+
+    def record(self, stage, seconds):
+        """Record a call of a stage.
+
+        :param str stage: Name of the stage.
+        :param float seconds: Time the call took.
+        """
+        totals = self.stages.get(stage)
+        if totals is None:
+            self.stages[stage] = [1, seconds]
+        else:
+            totals[0] += 1
+            totals[1] += seconds
+
+    def record_promotions(self, promotions, seconds):
+        """Record an evaluation of the promotions discounting a product.
+
+        The time is shared equally between the promotions.
+
+        :param promotions: The promotion.Promotion instances evaluated.
+        :param float seconds: Time the evaluation took.
+        """
+        if not promotions:
+            return
+        share = seconds / len(promotions)
+        for promotion in promotions:
+            totals = self.promotions.get(promotion)
+            if totals is None:
+                self.promotions[promotion] = [1, share]
+            else:
+                totals[0] += 1
+                totals[1] += share
+
+    def report(self, top=10):
+        """Summarise the recorded stages and promotions.
+
+        :param int top: Number of promotions to list by evaluations and by
+          time.
+        :return list: Lines of the report.
+        """
+        lines = [f'{"stage":<24}{"calls":>10}{"total ms":>12}'
+                 f'{"per call us":>14}']
+        for stage, (calls, seconds) in sorted(
+                self.stages.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{stage:<24}{calls:>10}{seconds * 1e3:>12.3f}'
+                         f'{seconds / calls * 1e6:>14.2f}')
+        if self.promotions:
+            for title, key in (('most evaluated', 0), ('most costly', 1)):
+                lines.append('')
+                lines.append(f'{"promotion (" + title + ")":<36}'
+                             f'{"evaluations":>12}{"total ms":>12}')
+                ranked = sorted(self.promotions.items(),
+                                key=lambda item: -item[1][key])
+                for promotion, (calls, seconds) in ranked[:top]:
+                    name = f'{promotion.promo_id}: {promotion.title}'
+                    if len(name) > 35:
+                        name = name[:32] + '...'
+                    lines.append(f'{name:<36}{calls:>12}'
+                                 f'{seconds * 1e3:>12.3f}')
+        return lines
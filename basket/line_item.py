@@ -0,0 +1,122 @@
+"""Line item module."""
+
+import copy
+
+
+class LineItem:
+    """Class that encapsulates a quantity of one product in a basket.
+
+    Rather than holding a copy of the product for every unit, a line item
+    counts the units and records which promotions apply to how many of
+    them, so its totals cost the same whatever the quantity.  Promotions
+    only ever apply to as many units as the line holds: units taken off the
+    line are taken off its last promotions first.
+    """
+
+    def __init__(self, product, quantity=0):
+        """
+        :param product: The catalogue product.Product instance; it is
+          shared, not copied.
+        :param int quantity: Number of units of the product.
+        :return: None
+        """
+        self.product = product
+        self.quantity = quantity
+        self.segments = []
+
+    def apply_promotions(self, segments):
+        """Apply promotions to units of this line.
+
+        :param list segments: ``(promotion, count)`` pairs in unit order, as
+          returned by `engine.PromotionIndex.allocate`.
+        """
+        self.segments = segments
+
+    def clear_promotions(self):
+        """Remove any promotions applied to this line."""
+        self.segments = []
+
+    def trim_promotions(self):
+        """Drop promotions applied to units no longer on the line."""
+        self.segments = self.applied_segments
+
+    @property
+    def applied_segments(self):
+        """The promotions applied to the units on the line.
+
+        :return list: ``(promotion, count)`` pairs in unit order, counting
+          no more units than the line's quantity.
+        """
+        remaining = self.quantity
+        applied = []
+        for promotion, count in self.segments:
+            if remaining <= 0:
+                break
+            count = min(count, remaining)
+            applied.append((promotion, count))
+            remaining -= count
+        return applied
+
+    @property
+    def name(self):
+        """Name of the product on this line."""
+        return self.product.name
+
+    @property
+    def discounted_quantity(self):
+        """Number of units with a promotion applied."""
+        return sum(count for _, count in self.applied_segments)
+
+    @property
+    def subtotal(self):
+        """The price of the line without discounts applied.
+
+        :return: Price in pence.
+        """
+        return self.product.price * self.quantity
+
+    @property
+    def discount_amount(self):
+        """The amount of discount earned by the line.
+
+        :return: Discount amount in pence.
+        """
+        price = self.product.price
+        return sum(promotion.discount(price, count)
+                   for promotion, count in self.applied_segments)
+
+    @property
+    def total(self):
+        """The price of the line with discounts applied.
+
+        :return: Price in pence.
+        """
+        return self.subtotal - self.discount_amount
+
+    @property
+    def discount_messages(self):
+        """Messages representing the promotions applied to the line.
+
+        :return list: ``(message, count)`` pairs, one per promotion applied.
+        """
+        price = self.product.price
+        return [(promotion.discount_message(price), count)
+                for promotion, count in self.applied_segments]
+
+    def units(self):
+        """Expand the line into one product per unit.
+
+        :return list: Shallow copies of the product, with the line's
+          promotions applied to the leading units.
+        """
+        units = []
+        for promotion, count in self.applied_segments:
+            for _ in range(count):
+                unit = copy.copy(self.product)
+                unit.apply_promotion(promotion)
+                units.append(unit)
+        for _ in range(self.quantity - len(units)):
+            unit = copy.copy(self.product)
+            unit.clear_promotion()
+            units.append(unit)
+        return units
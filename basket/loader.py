@@ -0,0 +1,541 @@
+"""Loader module.
+
+Loads the product catalogue and promotions from their json data files.
+
+The data files are json arrays of records.  They are parsed incrementally,
+a record at a time, and each record is validated and built into a
+`product.Product`, a `promotion.Promotion` or, for the other types of
+promotion, a `rules.Rule` as soon as it has been read, so memory use does
+not grow with the size of the file.  `ijson` is used for
+parsing when it is installed, and the standard library otherwise.
+
+Records that fail validation are skipped and described in a `LoadReport`.
+"""
+
+import atexit
+import collections
+import json
+import re
+import time
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None
+
+from basket import instrument
+from basket import log
+from basket import money
+from basket import product
+from basket import promotion
+from basket import rules
+
+# Characters read from a data file at a time.
+CHUNK_SIZE = 64 * 1024
+# Characters a record that fails to parse is allowed to grow to while more
+# of the file is read, before it is reported as invalid.
+MAX_RECORD_SIZE = 1024 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+_DELIMITER = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+_PENDING = re.compile(r'[0-9.eE+\-]*[ \t\n\r]*\Z')
+
+
+class SimpleLogger:
+    """Logger that is off unless ``enabled``.
+
+    Messages are printed to stdout as they are logged unless `configure` has
+    been called, after which they are written by a background
+    log.QueueWriter instead.
+    """
+    enabled = False
+    info = 'INFO'
+    error = 'ERROR'
+    writer = None
+    limiter = None
+    _file = None
+
+    def log(self, message, level=info, **fields):
+        """Simple logger.
+
+        :param str message: Log message, with ``{name}`` placeholders for
+          any fields.  It is only formatted if it is logged.
+        :param str level: Log level name
+        :param fields: Values of the placeholders, also written as fields of
+          their own in json output.
+        """
+        if not self.enabled:
+            return
+        if self.limiter is not None:
+            allowed, suppressed = self.limiter.allow((level, message))
+            if not allowed:
+                return
+            if suppressed:
+                fields['suppressed'] = suppressed
+        record = (time.time(), level, message, fields)
+        if self.writer is not None:
+            self.writer.put(record)
+        else:
+            print(log.format_text(record))
+
+    def configure(self, file_path=None, json_output=False, limit=None,
+                  interval=60.0):
+        """Write messages from a background thread.
+
+        :param str file_path: File to append messages to, or None (or
+          ``-``) for stderr.
+        :param bool json_output: Write messages as json lines.
+        :param int limit: Most times to log the same message per
+          ``interval`` seconds, or None for no limit.
+        :param float interval: Seconds over which ``limit`` applies.
+        """
+        self.close()
+        if file_path not in (None, '-'):
+            self._file = open(file_path, 'a', encoding='utf-8')
+        self.writer = log.QueueWriter(self._file, json_output)
+        if limit:
+            self.limiter = log.RateLimiter(limit, interval)
+        atexit.register(self.close)
+
+    def close(self):
+        """Write out any queued messages and go back to printing them.
+
+        Messages suppressed by the rate limit since one was last logged are
+        summarised first.
+        """
+        if self.writer is None:
+            return
+        if self.limiter is not None:
+            for (level, message), count in self.limiter.pending():
+                self.writer.put((time.time(), level,
+                                 'Suppressed {count} messages like: '
+                                 '{template}',
+                                 {'count': count, 'template': message}))
+        self.writer.close()
+        if self._file is not None:
+            self._file.close()
+        self.writer = self.limiter = self._file = None
+        atexit.unregister(self.close)
+
+
+logger = SimpleLogger()
+
+
+@instrument.timed('load_json')
+def load_json(json_file_path):
+    """Load json data.
+
+    :param str json_file_path: Path to json file to load.
+    """
+    data = None
+    try:
+        with open(json_file_path) as f:
+            data = json.load(f)
+    except EnvironmentError:
+        logger.log('No such file or directory: {path}', SimpleLogger.error,
+                   path=json_file_path)
+    except json.JSONDecodeError as e:
+        logger.log('Failed to parse data file {path}: {error}',
+                   SimpleLogger.error, path=json_file_path, error=e)
+    return data
+
+
+LoadError = collections.namedtuple('LoadError', 'index field reason')
+LoadError.__doc__ = """A record that could not be loaded.
+
+``index`` is the position of the record in the data file (None if the file
+itself could not be read), ``field`` the name of the offending field (None
+if the problem is with the record as a whole) and ``reason`` says what is
+wrong.
+"""
+
+
+class LoadReport:
+    """Class that reports on the records loaded from a data file."""
+
+    def __init__(self, file_path=None):
+        """
+        :param str file_path: Path of the data file reported on.
+        :return: None
+        """
+        self.file_path = file_path
+        self.records = 0
+        self.loaded = 0
+        self.errors = []
+
+    def reject(self, index, field, reason):
+        """Record a record, or file, that could not be loaded.
+
+        :param int index: Position of the record in the file.
+        :param str field: Name of the offending field.
+        :param str reason: What is wrong.
+        """
+        self.errors.append(LoadError(index, field, reason))
+
+    @property
+    def ok(self):
+        """True if every record was loaded."""
+        return not self.errors
+
+    def as_dict(self):
+        """The report as json serialisable data."""
+        return {'file': self.file_path, 'records': self.records,
+                'loaded': self.loaded,
+                'errors': [error._asdict() for error in self.errors]}
+
+
+def read_array(stream, chunk_size=CHUNK_SIZE):
+    """Parse a json array incrementally.
+
+    Only as much of the stream as is needed to parse the next element is
+    held in memory.
+
+    :param stream: Text file like object to read from.
+    :param int chunk_size: Characters to read at a time.
+    :return: Iterator of the elements of the array.
+    :raises: ValueError if the stream does not hold a json array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    offset = 0
+    eof = False
+    index = 0
+
+    def error(message, at):
+        return ValueError(f'{message} in record {index} (char {offset + at})')
+
+    def read_more():
+        # Grow reads with the amount already held so that a record larger
+        # than a chunk is only re-parsed a few times.
+        nonlocal buffer, pos, offset, eof
+        chunk = stream.read(max(chunk_size, len(buffer) - pos))
+        eof = not chunk
+        offset += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def next_char():
+        # Skip whitespace, returning the next character or '' at the end.
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos:pos + 1]
+            read_more()
+
+    if next_char() != '[':
+        raise error('Expecting a json array', pos)
+    pos += 1
+    if next_char() == ']':
+        pos += 1
+    else:
+        decode = decoder.raw_decode
+        batch = True
+        while True:
+            # Fast path: parse every complete record held in one call, by
+            # cutting the buffer after the last ``},``.  The cut can only
+            # parse if it falls between two records; if it does not, fall
+            # back to parsing a record at a time until more is read.
+            cut = buffer.rfind('},', pos) if batch else -1
+            if cut > pos:
+                try:
+                    elements = decoder.decode(f'[{buffer[pos:cut + 1]}]')
+                except json.JSONDecodeError:
+                    batch = False
+                else:
+                    yield from elements
+                    index += len(elements)
+                    pos = _WHITESPACE_RE.match(buffer, cut + 2).end()
+                    continue
+            if pos == len(buffer) and not eof:
+                read_more()
+                batch = True
+                next_char()
+                continue
+            try:
+                element, end = decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # The record may just be cut off by the end of the buffer,
+                # unless it is already implausibly long.
+                if eof or len(buffer) - pos > MAX_RECORD_SIZE:
+                    raise error(e.msg, e.pos)
+                read_more()
+                batch = True
+                next_char()
+                continue
+            match = _DELIMITER.match(buffer, end)
+            if match is None:
+                # Read on if the delimiter, or the rest of a number, may be
+                # in the next chunk.
+                if eof or not _PENDING.match(buffer, end):
+                    raise error("Expecting ',' delimiter", end)
+                read_more()
+                batch = True
+                continue
+            yield element
+            index += 1
+            pos = match.end()
+            if match.group(1) == ']':
+                break
+    if next_char():
+        raise error('Extra data', pos)
+
+
+def _read_array_fast(stream):
+    # ijson silently yields nothing for a document that is not an array.
+    head = stream.peek(CHUNK_SIZE).lstrip()
+    if head and not head.startswith(b'['):
+        raise ValueError('Expecting a json array in record 0')
+    try:
+        yield from ijson.items(stream, 'item', use_float=True)
+    except ijson.JSONError as e:
+        raise ValueError(str(e))
+
+
+def read_records(json_file_path, fast=None):
+    """Read the records of a json data file, one at a time.
+
+    :param str json_file_path: Path to the json file, holding an array.
+    :param bool fast: Parse with ijson (True) or the standard library
+      (False); by default ijson is used if it is installed.
+    :return: Iterator of the records.
+    :raises: EnvironmentError if the file cannot be read, ValueError if it
+      does not hold a json array.
+    """
+    if fast is None:
+        fast = ijson is not None
+    if fast:
+        with open(json_file_path, 'rb') as f:
+            yield from _read_array_fast(f)
+    else:
+        with open(json_file_path, encoding='utf-8') as f:
+            yield from read_array(f)
+
+
+def _text(value):
+    if not isinstance(value, str):
+        raise ValueError(f'expected a string, not {type(value).__name__}')
+    return value
+
+
+def _qualifying_qty(value):
+    qty = int(value)
+    if qty < 1:
+        raise ValueError('Unacceptable value for qualifying_qty')
+    return qty
+
+
+# Errors raised building a record from unacceptable data.  Records are
+# built first and only validated field by field, to say what is wrong, if
+# that fails.
+_RECORD_ERRORS = (KeyError, ValueError, TypeError, AttributeError)
+
+# The fields of each kind of record, with a function that raises ValueError
+# or TypeError for unacceptable values.
+PRODUCT_FIELDS = (('name', _text), ('price', int), ('unit', _text))
+PROMOTION_FIELDS = (('id', None), ('title', None),
+                    ('qualifying_product', _text),
+                    ('qualifying_qty', _qualifying_qty),
+                    ('discounted_product', _text),
+                    ('discount_percent', money.basis_points))
+
+
+def _products(value):
+    if not value or isinstance(value, str):
+        raise ValueError('expected a non-empty list of products')
+    for name in value:
+        _text(name)
+    return value
+
+
+def _bundle_products(value):
+    if not isinstance(value, dict) or not value:
+        raise ValueError('expected a non-empty object of quantities')
+    for name, qty in value.items():
+        if int(qty) < 1:
+            raise ValueError(f'Unacceptable quantity of {name}')
+    return value
+
+
+def _promotion_type(value):
+    if value != rules.PERCENT and value not in rules.KINDS:
+        raise ValueError(f'Unknown promotion type: {value}')
+    return value
+
+
+_RULE_FIELDS = (('id', None), ('title', None), ('type', _promotion_type))
+# The fields of each type of rule promotion, see the rules module.
+RULE_FIELDS = {
+    rules.MULTIBUY: _RULE_FIELDS + (('product', _text), ('buy', int),
+                                    ('pay', int)),
+    rules.BUNDLE: _RULE_FIELDS + (('products', _bundle_products),
+                                  ('price', int)),
+    rules.MIX_AND_MATCH: _RULE_FIELDS + (('products', _products),
+                                         ('quantity', int), ('price', int)),
+    rules.SPEND: _RULE_FIELDS + (('threshold', int),),
+}
+
+
+def promotion_fields(record):
+    """The fields a promotion record should have, given its type.
+
+    :param record: The record read from a data file.
+    :return: `PROMOTION_FIELDS` or one of `RULE_FIELDS`.
+    """
+    if not isinstance(record, dict):
+        return PROMOTION_FIELDS
+    kind = record.get('type', rules.PERCENT)
+    if kind == rules.PERCENT:
+        return PROMOTION_FIELDS
+    return RULE_FIELDS.get(kind, _RULE_FIELDS)
+
+
+def build_promotion(promo_def):
+    """Build a promotion of the type its definition gives.
+
+    :param promo_def: Promotion definition, as found in the promotions
+      file.  Without a ``type`` it is a percentage promotion.
+    :return: promotion.Promotion or rules.Rule instance.
+    :raises: ValueError if the type is unknown, see the classes built for
+      the other errors.
+    """
+    kind = promo_def.get('type', rules.PERCENT)
+    if kind == rules.PERCENT:
+        return promotion.Promotion(promo_def)
+    try:
+        cls = rules.KINDS[kind]
+    except (KeyError, TypeError):
+        raise ValueError(f'Unknown promotion type: {kind}')
+    return cls(promo_def)
+
+
+def validate(record, fields):
+    """Find the first problem with a record.
+
+    :param record: The record read from a data file.
+    :param fields: `PRODUCT_FIELDS`, `PROMOTION_FIELDS` or one of
+      `RULE_FIELDS`.
+    :return: ``(field, reason)`` tuple, or None if the record is valid.
+    """
+    if not isinstance(record, dict):
+        return None, 'expected a json object'
+    for field, check in fields:
+        if field not in record:
+            return field, f'missing {field}'
+        if check is not None:
+            try:
+                check(record[field])
+            except (ValueError, TypeError) as e:
+                return field, str(e)
+    return None
+
+
+def _load(json_file_path, build, report, fast):
+    if report is not None and report.file_path is None:
+        report.file_path = json_file_path
+    try:
+        return build(read_records(json_file_path, fast), report)
+    except EnvironmentError:
+        reason = f'No such file or directory: {json_file_path}'
+    except ValueError as e:
+        reason = f'Failed to parse data file {json_file_path}: {e}'
+    logger.log(reason, SimpleLogger.error)
+    if report is not None:
+        report.loaded = 0
+        report.reject(None, None, reason)
+    return None
+
+
+def _tally(report, index, problem):
+    if report is not None:
+        report.records += 1
+        if problem is None:
+            report.loaded += 1
+        else:
+            report.reject(index, *problem)
+
+
+@instrument.timed('load_products')
+def load_products(products_file_path, report=None, fast=None):
+    """Load product definitions.
+
+    Load product definition data describing the products this program will
+    accept including product names, units and price.  A file that cannot be
+    read or parsed loads no products at all.
+
+    :param str products_file_path: Path to goods file.
+    :param report: Optional LoadReport to describe the load in.
+    :param bool fast: See `read_records`.
+    :return dict: Dictionary of product.Product instances.
+    """
+    products = _load(products_file_path, build_products, report, fast)
+    if not products:
+        logger.log('No stock found in product data')
+        return {}
+    return products
+
+
+def build_products(data, report=None):
+    """Build products from their definitions.
+
+    :param data: Iterable of product definitions, as found in the goods
+      file.
+    :param report: Optional LoadReport to describe the records in.
+    :return dict: Dictionary of product.Product instances.
+    """
+    products = {}
+    for index, prod in enumerate(data):
+        problem = None
+        try:
+            p = product.Product(prod['name'], prod['price'], prod['unit'])
+            products[p.name] = p
+        except _RECORD_ERRORS as e:
+            problem = validate(prod, PRODUCT_FIELDS) or (None, str(e))
+            logger.log('Failed to load a product with data: {record} '
+                       '({reason})', SimpleLogger.error, record=prod,
+                       index=index, field=problem[0], reason=problem[1])
+        _tally(report, index, problem)
+    return products
+
+
+@instrument.timed('load_promotions')
+def load_promotions(promotions_file_path, report=None, fast=None):
+    """Load promotions.
+
+    Load promotions data that specifies discounts that can be applied
+    to goods purchased.  A file that cannot be read or parsed loads no
+    promotions at all.
+
+    :param str promotions_file_path: Path to promotions file.
+    :param report: Optional LoadReport to describe the load in.
+    :param bool fast: See `read_records`.
+    :return list: List of promotion.Promotion and rules.Rule instances.
+    """
+    return _load(promotions_file_path, build_promotions, report,
+                 fast) or []
+
+
+def build_promotions(data, report=None):
+    """Build promotions from their definitions.
+
+    :param data: Iterable of promotion definitions, as found in the
+      promotions file.
+    :param report: Optional LoadReport to describe the records in.
+    :return list: List of promotion.Promotion and rules.Rule instances.
+    """
+    promotions = []
+    for index, prod_promo in enumerate(data):
+        problem = None
+        try:
+            promotions.append(build_promotion(prod_promo))
+        except _RECORD_ERRORS as e:
+            problem = (validate(prod_promo, promotion_fields(prod_promo))
+                       or (None, str(e)))
+            logger.log('Failed to load offer with data: {record} '
+                       '({reason})', SimpleLogger.error, record=prod_promo,
+                       index=index, field=problem[0], reason=problem[1])
+        _tally(report, index, problem)
+    return promotions
@@ -0,0 +1,136 @@
+"""Load generator for the pricing server.
+
+Sends basket pricing requests to a running `basket.server` from many
+concurrent keep-alive connections and reports the request rate and latency
+percentiles::
+
+    python -m basket.loadgen --port 8080 --concurrency 50 --requests 10000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from basket import loader
+
+
+async def open_connection(host='127.0.0.1', port=8080, path=None):
+    """Connect to a pricing server.
+
+    :return: ``(reader, writer)`` tuple.
+    """
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+    return await asyncio.open_connection(host, port)
+
+
+async def request(reader, writer, method, path, payload=None):
+    """Make an HTTP request on an open connection.
+
+    :param reader: asyncio.StreamReader of the connection.
+    :param writer: asyncio.StreamWriter of the connection.
+    :param str method: HTTP method.
+    :param str path: Request path.
+    :param payload: Json serialisable request body, if any.
+    :return: ``(status, response payload)`` tuple.
+    """
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write((f'{method} {path} HTTP/1.1\r\n'
+                  'Host: basket\r\n'
+                  'Content-Type: application/json\r\n'
+                  f'Content-Length: {len(body)}\r\n\r\n').encode('latin-1')
+                 + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def percentile(sorted_values, percent):
+    """Nearest rank percentile of sorted values."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(percent / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run(baskets, concurrency=10, requests=1000, host='127.0.0.1',
+              port=8080, path=None):
+    """Generate load against a pricing server.
+
+    :param list baskets: Baskets to price, each a list of item names; they
+      are sent round robin.
+    :param int concurrency: Number of concurrent connections.
+    :param int requests: Total number of requests to make.
+    :return dict: Requests made, errors, requests per second and latency
+      percentiles in milliseconds.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        reader, writer = await open_connection(host, port, path)
+        try:
+            for i in counter:
+                start = time.perf_counter()
+                status, _ = await request(
+                    reader, writer, 'POST', '/price',
+                    {'basket': i, 'items': baskets[i % len(baskets)]})
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'concurrency': concurrency,
+        'rps': len(latencies) / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='basket.loadgen')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--socket', dest='path', default=None,
+                        help='Connect to this Unix socket instead')
+    parser.add_argument('--products', default='products.json',
+                        help='Products to fill random baskets from')
+    parser.add_argument('--basket-size', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    names = list(loader.load_products(args.products)) or ['unknown']
+    baskets = [[rng.choice(names) for _ in range(args.basket_size)]
+               for _ in range(100)]
+    stats = asyncio.run(run(baskets, args.concurrency, args.requests,
+                            args.host, args.port, args.path))
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,190 @@
+"""Log writer module.
+
+Background writing of log records for `loader.SimpleLogger`.  Logging a
+message only puts a record (the time, level, message template and its
+fields) on a queue; a writer thread formats the records, as text or json
+lines, and writes them to stderr or a file.  A `RateLimiter` can cap how
+often the same message is logged, e.g. the same item being out of stock on
+every basket of a bulk run.
+"""
+
+import json
+import os
+import sys
+import time
+
+
+def format_message(message, fields):
+    """Fill in a message template.
+
+    The ``suppressed`` count a `RateLimiter` adds is not a placeholder, so a
+    message logged with no other fields is left as it is, braces and all.
+
+    :param str message: Message, with ``{name}`` placeholders for fields if
+      there are any.
+    :param dict fields: Values of the placeholders.
+    :return str: The message.
+    """
+    if fields and fields.keys() != {'suppressed'}:
+        return message.format(**fields)
+    return message
+
+
+def format_text(record):
+    """Format a record as a line of text.
+
+    :param record: ``(created, level, message, fields)`` tuple.
+    :return str: The line, without a newline.
+    """
+    created, level, message, fields = record
+    now = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created))
+    line = f'{now} {level}: {format_message(message, fields)}'
+    suppressed = fields.get('suppressed')
+    if suppressed:
+        line += f' ({suppressed} similar messages suppressed)'
+    return line
+
+
+def format_json(record):
+    """Format a record as a json line.
+
+    The fields of the message are included, and non json values are given
+    as strings.
+
+    :param record: ``(created, level, message, fields)`` tuple.
+    :return str: The line, without a newline.
+    """
+    created, level, message, fields = record
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(created))
+    data = {'time': f'{stamp}.{int(created % 1 * 1000):03d}',
+            'level': level,
+            'message': format_message(message, fields)}
+    data.update((key, value) for key, value in fields.items()
+                if key not in data)
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RateLimiter:
+    """Class that limits how often the same message is logged."""
+
+    def __init__(self, limit, interval=60.0, clock=time.monotonic):
+        """
+        :param int limit: Most records with the same key to allow per
+          interval.
+        :param float interval: Length of an interval in seconds.
+        :param clock: Function returning the current time in seconds.
+        :return: None
+        """
+        self.limit = limit
+        self.interval = interval
+        self.clock = clock
+        self._windows = {}
+
+    def allow(self, key):
+        """Check whether a record may be logged.
+
+        :param key: Key of the record, e.g. its level and message template.
+        :return: ``(allowed, suppressed)`` tuple: whether to log the record
+          and, if so, the number of records with the same key suppressed
+          since the last one logged.
+        """
+        now = self.clock()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window is not None else 0
+            self._windows[key] = [now, 1, 0]
+            return True, suppressed
+        if window[1] < self.limit:
+            window[1] += 1
+            return True, 0
+        window[2] += 1
+        return False, 0
+
+    def pending(self):
+        """Keys with suppressed records not yet reported.
+
+        :return list: ``(key, suppressed)`` pairs.
+        """
+        return [(key, window[2]) for key, window in self._windows.items()
+                if window[2]]
+
+
+class QueueWriter:
+    """Class that writes log records from a background thread.
+
+    Records are dropped, and counted in ``dropped``, rather than slow the
+    logging thread down if the writer falls ``max_queue`` records behind.
+    A record that cannot be formatted is counted in ``failed`` and written
+    as an error in its place.
+    In a forked process (e.g. a bulk pricing worker) a new writer thread is
+    started on the first record.
+    """
+
+    def __init__(self, stream=None, json_output=False, max_queue=10000):
+        """
+        :param stream: Text file like object to write to, by default
+          stderr.
+        :param bool json_output: Write json lines rather than text.
+        :param int max_queue: Most records to hold waiting to be written.
+        :return: None
+        """
+        self.stream = stream if stream is not None else sys.stderr
+        self.format = format_json if json_output else format_text
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.failed = 0
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def _start(self):
+        # Imported here, rather than with the module, to keep them out of
+        # the start up of runs that only print their messages.
+        import queue
+        import threading
+
+        self._pid = os.getpid()
+        self._queue = queue.Queue(self.max_queue)
+        self._full = queue.Full
+        self._thread = threading.Thread(target=self._run, name='log-writer',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                line = self.format(record)
+            except Exception as exc:
+                # Report the record rather than let it stop the writer.
+                self.failed += 1
+                line = self.format((record[0], 'ERROR',
+                                    'Could not format log message '
+                                    '{template!r}: {reason!r}',
+                                    {'template': record[2], 'reason': exc}))
+            self.stream.write(line + '\n')
+            if self._queue.empty():
+                self.stream.flush()
+        self.stream.flush()
+
+    def put(self, record):
+        """Queue a record to be written.
+
+        :param record: ``(created, level, message, fields)`` tuple.
+        """
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except self._full:
+            self.dropped += 1
+
+    def close(self):
+        """Write any queued records and stop the writer thread."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+        self._pid = None
@@ -0,0 +1,82 @@
+"""Money module.
+
+Discounts are worked out in whole numbers only: prices are in pence and
+discount rates in basis points (hundredths of a percent), so no float
+rounding creeps into a receipt.  The discount on an amount is rounded to
+the penny under a rounding policy, one of:
+
+* `UNIT_FLOOR`, the discount on each unit rounded down (the default),
+  i.e. towards zero for a negative rate,
+* `UNIT_HALF_EVEN`, the discount on each unit rounded half to even,
+* `LINE_FLOOR`, the discount on all the units of a line, i.e. a product
+  discounted by a promotion, rounded down once, and
+* `LINE_HALF_EVEN`, likewise rounded half to even (banker's rounding).
+
+Rounding by line matches receipts that show a discount per line, whatever
+the quantity, but the discounts shown per unit may then not add up to it
+exactly.
+"""
+
+import math
+
+# Basis points in a whole.
+BASIS_POINTS = 10000
+
+UNIT_FLOOR = 'unit-floor'
+UNIT_HALF_EVEN = 'unit-half-even'
+LINE_FLOOR = 'line-floor'
+LINE_HALF_EVEN = 'line-half-even'
+
+# ``(per line, half even)`` flags of each rounding policy.
+ROUNDINGS = {
+    UNIT_FLOOR: (False, False),
+    UNIT_HALF_EVEN: (False, True),
+    LINE_FLOOR: (True, False),
+    LINE_HALF_EVEN: (True, True),
+}
+
+
+def basis_points(percent):
+    """Convert a percentage to basis points.
+
+    :param percent: Percentage, as a number or a numeric string.
+    :return int: The nearest whole number of basis points.
+    :raises: ValueError if ``percent`` is not a finite number.
+    """
+    value = float(percent)
+    if not math.isfinite(value):
+        raise ValueError(f'percentage must be finite, not {percent}')
+    return round(value * 100)
+
+
+def format_discount(amount):
+    """Format a discount as shown on receipts.
+
+    :param int amount: Discount in pence.
+    :return str: e.g. ``-40p`` or ``-£1.20``.
+    """
+    if amount < 100:
+        return f'-{amount}p'
+    return f'-£{amount / 100:.2f}'
+
+
+def apply_rate(amount, rate, half_even=False):
+    """The rounded discount at a rate on an amount.
+
+    Only integer operations are used, without branching on the amount, so
+    ``amount`` can equally be a NumPy integer array.
+
+    :param int amount: Amount in pence.
+    :param int rate: Discount rate in basis points.
+    :param bool half_even: Round half to even rather than towards zero.
+    :return int: Discount in pence.
+    """
+    scaled = amount * rate
+    quotient = scaled // BASIS_POINTS
+    remainder = scaled - quotient * BASIS_POINTS
+    if half_even:
+        twice = 2 * remainder
+        return quotient + ((twice > BASIS_POINTS)
+                           | ((twice == BASIS_POINTS) & (quotient & 1)))
+    # Floor division rounds a negative discount away from zero.
+    return quotient + ((scaled < 0) & (remainder != 0))
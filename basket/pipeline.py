@@ -0,0 +1,117 @@
+"""Pipeline module.
+
+Streams basket events through pricing a line at a time.  Each input line is
+a json event naming a basket and an item scanned into it, e.g.::
+
+    {"basket": "order-1", "item": "soup", "quantity": 2}
+
+(``quantity`` is optional, defaults to 1 and must be positive).  Events for
+a basket are expected to be contiguous: a basket is priced, and its record
+written, as soon as an event for a different basket (or the end of the
+input) is seen.
+Only the basket being filled is held in memory, as a basket.CompactBasket,
+so memory use stays flat however large the input is.
+"""
+
+import json
+
+from basket import explain
+from basket import instrument
+
+
+def read_events(stream):
+    """Read basket events from a stream of json lines.
+
+    Blank lines are skipped.
+
+    :param stream: File like object to read from.
+    :return: Iterator of ``(basket_id, item, quantity)`` tuples.
+    :raises: ValueError if a line is not a valid event.
+    """
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+            quantity = int(event.get('quantity', 1))
+            if quantity < 1:
+                raise ValueError('quantity must be positive')
+            yield event['basket'], str(event['item']), quantity
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError,
+                AttributeError) as e:
+            raise ValueError(f'Invalid event on line {line_no}: {e!r}')
+
+
+def price_events(events, cat):
+    """Price baskets incrementally as their events arrive.
+
+    :param events: Iterable of ``(basket_id, item, quantity)`` tuples, as
+      returned by `read_events`.
+    :param cat: catalogue.Catalogue to price against.
+    :return: Iterator of basket records (see `basket_record`), one per
+      basket in input order.
+    """
+    basket_id = None
+    shopping_basket = None
+    out_of_stock = 0
+    for event_basket_id, item, quantity in events:
+        if shopping_basket is None or event_basket_id != basket_id:
+            if shopping_basket is not None:
+                yield basket_record(basket_id, shopping_basket, out_of_stock)
+            basket_id = event_basket_id
+            shopping_basket = cat.basket(compact=True)
+            out_of_stock = 0
+        if not shopping_basket.add(item, quantity):
+            out_of_stock += quantity
+    if shopping_basket is not None:
+        yield basket_record(basket_id, shopping_basket, out_of_stock)
+
+
+def discount_records(discounts):
+    """Turn a basket's discounts into json serialisable records.
+
+    :param discounts: ``(promotion, amount)`` pairs, as in a basket's
+      ``promotion_discounts``.
+    :return list: A dict of the promotion's id and title and the amount, in
+      pence, per discount.
+    """
+    return [{'id': promotion.promo_id, 'title': promotion.title,
+             'amount': amount}
+            for promotion, amount in discounts]
+
+
+@instrument.timed('render')
+def basket_record(basket_id, shopping_basket, out_of_stock=0):
+    """Price a basket into a json serialisable record.
+
+    :param basket_id: Identifier of the basket.
+    :param shopping_basket: basket.CompactBasket to price.
+    :param int out_of_stock: Number of units that could not be added.
+    :return dict: The basket id, its subtotal, the discount earned from
+      each promotion, its total (all amounts in pence) and the number of
+      out of stock units.
+    """
+    explain.begin(basket_id)
+    shopping_basket.calculate_discounts()
+    return {
+        'basket': basket_id,
+        'subtotal': shopping_basket.subtotal,
+        'discounts': discount_records(shopping_basket.promotion_discounts),
+        'total': shopping_basket.total,
+        'out_of_stock': out_of_stock,
+    }
+
+
+def write_records(records, stream):
+    """Write records to a stream as json lines.
+
+    :param records: Iterable of json serialisable records.
+    :param stream: File like object to write to.
+    :return int: Number of records written.
+    """
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False))
+        stream.write('\n')
+        count += 1
+    return count
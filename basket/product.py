@@ -1,8 +1,16 @@
 """Product module."""
 
+import sys
+
 
 class Product:
-    """Class that encapsulates a product item to be purchased."""
+    """Class that encapsulates a product item to be purchased.
+
+    Products are copied for every unit added to a basket so instances are
+    slotted, and names interned, to keep them small.
+    """
+
+    __slots__ = ('name', 'price', 'unit', '_promotion')
 
     def __init__(self, name, price, unit):
         """
@@ -13,11 +21,20 @@ class Product:
         :param price: Price of the product in pence.
         :param unit: The product's unit of quantity, e.g. bag or loaf.
         """
-        self.name = name.lower()
+        self.name = sys.intern(name.lower())
         self.price = int(price)  # Assumed price is in pence
-        self.unit = unit.lower()
+        self.unit = sys.intern(unit.lower())
         self._promotion = None
 
+    def __copy__(self):
+        """Shallow copy without re-validating the product's values."""
+        clone = Product.__new__(Product)
+        clone.name = self.name
+        clone.price = self.price
+        clone.unit = self.unit
+        clone._promotion = self._promotion
+        return clone
+
     def apply_promotion(self, promotion):
         """Apply an offer to this product.
 
@@ -29,6 +46,11 @@ class Product:
         """Remove any promotion applied to this product."""
         self._promotion = None
 
+    @property
+    def promotion(self):
+        """The promotion.Promotion applied to this product, or None."""
+        return self._promotion
+
     @property
     def has_promotion(self):
         """Check if product has a promotion applied.
@@ -55,7 +77,7 @@ class Product:
         :return: Discount amount in pence.
         """
         if self._promotion:
-            return int(self.price * self._promotion.discount_percent / 100.0)
+            return self._promotion.discount_for(self.price)
         return 0
 
     @property
@@ -64,10 +86,6 @@ class Product:
 
         :return: String message.
         """
-        discount_amount_str = '-£{:.2f}'.format(self.discount_amount/100)
-        if self.discount_amount < 100:
-            discount_amount_str = '-{}p'.format(self.discount_amount)
         if self._promotion:
-            return '{}: {}'.format(
-                self._promotion.title, discount_amount_str)
+            return self._promotion.discount_message(self.price)
         return None
@@ -1,8 +1,26 @@
 """Offer module."""
 
+import sys
+
+from basket import money
+
 
 class Promotion:
-    """Class that encapsulates a product promotion."""
+    """Class that encapsulates a product promotion.
+
+    The discount and message the promotion gives on a unit are looked up in
+    a table keyed by unit price, filled by `prime` (or on first use) and
+    cleared whenever the title, discount or rounding policy changes.  A
+    change of product price simply looks up a different entry.
+
+    The discount is held in basis points and worked out in whole pence
+    under a rounding policy of the money module; `discount` gives the
+    discount on several units at once.
+    """
+
+    __slots__ = ('promo_id', '_title', 'qualifying_product', 'qualifying_qty',
+                 'discounted_product', '_discount_bp', '_rounding',
+                 '_per_line', '_half_even', '_discounts')
 
     def __init__(self, promo_def):
         """
@@ -16,11 +34,107 @@ class Promotion:
         :raises: ValueError if the qualifying qty is invalid, KeyError if one
           of the required dict keys is missing.
         """
+        self._discounts = {}
+        self.rounding = money.UNIT_FLOOR
         self.promo_id = promo_def['id']
         self.title = promo_def['title']
-        self.qualifying_product = promo_def['qualifying_product'].lower()
+        self.qualifying_product = sys.intern(
+            promo_def['qualifying_product'].lower())
         self.qualifying_qty = int(promo_def['qualifying_qty'])
-        if not self.qualifying_qty:
+        if self.qualifying_qty < 1:
             raise KeyError('Unacceptable value for qualifying_qty')
-        self.discounted_product = promo_def['discounted_product'].lower()
-        self.discount_percent = float(promo_def['discount_percent'])
+        self.discounted_product = sys.intern(
+            promo_def['discounted_product'].lower())
+        self.discount_percent = promo_def['discount_percent']
+
+    @property
+    def title(self):
+        """Title of the promotion, as shown on receipts."""
+        return self._title
+
+    @title.setter
+    def title(self, title):
+        self._title = title
+        self._discounts = {}
+
+    @property
+    def discount_percent(self):
+        """Percentage discount given on each discounted unit."""
+        return self._discount_bp / 100
+
+    @discount_percent.setter
+    def discount_percent(self, discount_percent):
+        self.discount_bp = money.basis_points(discount_percent)
+
+    @property
+    def discount_bp(self):
+        """Discount given on each discounted unit in basis points."""
+        return self._discount_bp
+
+    @discount_bp.setter
+    def discount_bp(self, discount_bp):
+        self._discount_bp = int(discount_bp)
+        self._discounts = {}
+
+    @property
+    def rounding(self):
+        """Rounding policy of the discount, see the money module."""
+        return self._rounding
+
+    @rounding.setter
+    def rounding(self, rounding):
+        try:
+            self._per_line, self._half_even = money.ROUNDINGS[rounding]
+        except KeyError:
+            raise ValueError(f'Unknown rounding policy: {rounding}')
+        self._rounding = rounding
+        self._discounts = {}
+
+    def prime(self, price):
+        """Work out the discount and message for a unit price.
+
+        :param int price: Unit price in pence.
+        :return: ``(discount amount, message)`` tuple.
+        """
+        discount_amount = money.apply_rate(price, self._discount_bp,
+                                           self._half_even)
+        message = f'{self.title}: {money.format_discount(discount_amount)}'
+        entry = self._discounts[price] = (discount_amount, message)
+        return entry
+
+    def discount(self, price, count):
+        """The discount this promotion gives on several units.
+
+        Under a per line rounding policy the discount on all of the units
+        is rounded once, otherwise it is that on one unit times the count.
+
+        :param int price: Unit price in pence.
+        :param count: Number of units, an int or a NumPy integer array.
+        :return: Discount amount in pence.
+        """
+        if self._per_line:
+            return money.apply_rate(price * count, self._discount_bp,
+                                    self._half_even)
+        return self.discount_for(price) * count
+
+    def discount_for(self, price):
+        """The discount this promotion gives on a single unit.
+
+        :param int price: Unit price in pence.
+        :return: Discount amount in pence.
+        """
+        try:
+            return self._discounts[price][0]
+        except KeyError:
+            return self.prime(price)[0]
+
+    def discount_message(self, price):
+        """Returns a message that represents this promotion on a unit.
+
+        :param int price: Unit price in pence.
+        :return: String message.
+        """
+        try:
+            return self._discounts[price][1]
+        except KeyError:
+            return self.prime(price)[1]
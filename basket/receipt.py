@@ -0,0 +1,26 @@
+"""Receipt module."""
+
+from basket import instrument
+
+
+@instrument.timed('render')
+def render(shopping_basket):
+    """Render the receipt for a basket.
+
+    Calculates the basket's discounts and lists its subtotal, the message
+    for each discounted item, then for each rule promotion that applies,
+    and its total.
+
+    :param shopping_basket: basket.Basket instance.
+    :return list: Lines of the receipt.
+    """
+    lines = [f'Subtotal: £{shopping_basket.subtotal/100:.2f}']
+    shopping_basket.calculate_discounts()
+    for item in shopping_basket.discounted_items:
+        lines.append(item.discount_message)
+    for rule, amount in shopping_basket.rule_discounts:
+        lines.append(rule.message(amount))
+    if len(lines) == 1:
+        lines.append('(No offers available)')
+    lines.append(f'Total: £{shopping_basket.total/100:.2f}')
+    return lines
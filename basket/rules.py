@@ -0,0 +1,380 @@
+"""Rule promotions module.
+
+Besides "buy N of X, get Y% off Z" (promotion.Promotion) the promotions
+file can hold promotions of these types, told apart by their ``type``:
+
+* ``multibuy``, e.g. 3 for 2: every ``buy`` units of ``product`` cost the
+  price of ``pay`` units.
+* ``bundle``: the ``products`` (a mapping of product name to quantity)
+  together cost ``price`` pence.
+* ``mix_and_match``: any ``quantity`` units of the ``products`` listed cost
+  ``price`` pence.  The most expensive units are grouped together first.
+* ``spend``: spending at least ``threshold`` pence, on the ``products``
+  listed or on the whole basket if there are none, takes ``discount``
+  pence, or ``discount_percent`` percent rounded down, off.
+
+Unlike per unit promotions these rules discount the basket as a whole.
+They are applied in order, after the per unit promotions, and the units a
+rule uses (the three tins of a 3 for 2, say) are not used by the rules
+after it.  A rule's discount is capped at what is still left to pay on the
+products it uses, or on the whole basket for a rule on the spend, so
+neither a line nor the basket is ever priced below zero.
+
+The rules of a catalogue are compiled, when it is loaded, into a
+`RuleProgram` that indexes them by the products they read.  Pricing a
+basket then takes one pass over its aggregated quantities to find the
+rules that could apply, and each of those reads only the quantities of its
+own products, however many rules there are.
+"""
+
+import sys
+
+from basket import money
+
+PERCENT = 'percent'
+MULTIBUY = 'multibuy'
+BUNDLE = 'bundle'
+MIX_AND_MATCH = 'mix_and_match'
+SPEND = 'spend'
+
+
+def _name(name):
+    return sys.intern(name.lower())
+
+
+class Rule:
+    """Base class of the promotions that discount a basket as a whole.
+
+    Subclasses set ``products`` to the names of the products whose
+    quantities they read, empty if they read the basket's subtotal, and
+    implement `apply`.  Rules that do not use up the units they read, like
+    a spend threshold, set ``uses_units`` to False.
+    """
+
+    __slots__ = ('promo_id', 'title', 'products')
+    uses_units = True
+
+    def __init__(self, promo_def):
+        """
+        :param promo_def: Dictionary like object defining the promotion,
+          including the keys `id` and `title`.
+        :raises: KeyError if a required key is missing.
+        """
+        self.promo_id = promo_def['id']
+        self.title = promo_def['title']
+        self.products = ()
+
+    def evaluate(self, quantities, products, subtotal):
+        """The discount this rule gives a basket.
+
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :param products: Mapping of product name to product.Product, for
+          the prices.
+        :param int subtotal: Undiscounted price of the basket in pence.
+        :return int: Discount amount in pence, 0 if the rule does not
+          apply.
+        """
+        return self.apply(quantities, products, subtotal)[0]
+
+    def apply(self, quantities, products, subtotal):
+        """The discount this rule gives a basket and the units it uses.
+
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :param products: Mapping of product name to product.Product, for
+          the prices.
+        :param int subtotal: Undiscounted price of the basket in pence.
+        :return: ``(amount, used)``, the discount in pence, 0 if the rule
+          does not apply, and a dict of the units it uses keyed by product
+          name.
+        """
+        raise NotImplementedError
+
+    def message(self, amount):
+        """Returns a message that represents this rule's discount.
+
+        :param int amount: Discount amount in pence.
+        :return: String message.
+        """
+        return f'{self.title}: {money.format_discount(amount)}'
+
+
+class MultiBuy(Rule):
+    """Every ``buy`` units of a product for the price of ``pay``."""
+
+    __slots__ = ('buy', 'pay')
+
+    def __init__(self, promo_def):
+        """
+        :param promo_def: See `Rule`, plus the keys `product`, `buy` and
+          `pay`.
+        :raises: ValueError unless ``0 <= pay < buy``, KeyError if a
+          required key is missing.
+        """
+        super().__init__(promo_def)
+        self.products = (_name(promo_def['product']),)
+        self.buy = int(promo_def['buy'])
+        self.pay = int(promo_def['pay'])
+        if not 0 <= self.pay < self.buy:
+            raise ValueError('pay must be at least 0 and less than buy')
+
+    def apply(self, quantities, products, subtotal):
+        name = self.products[0]
+        applications = quantities.get(name, 0) // self.buy
+        if not applications:
+            return 0, {}
+        return (applications * (self.buy - self.pay) * products[name].price,
+                {name: applications * self.buy})
+
+
+class Bundle(Rule):
+    """A set of products, in given quantities, for a fixed price."""
+
+    __slots__ = ('quantities', 'price')
+
+    def __init__(self, promo_def):
+        """
+        :param promo_def: See `Rule`, plus the keys `products`, mapping
+          product names to quantities, and `price` in pence.
+        :raises: ValueError if there are no products or a quantity is not
+          positive, KeyError if a required key is missing.
+        """
+        super().__init__(promo_def)
+        self.quantities = tuple((_name(name), int(qty))
+                                for name, qty in promo_def['products'].items())
+        if not self.quantities:
+            raise ValueError('A bundle needs products')
+        if any(qty < 1 for _, qty in self.quantities):
+            raise ValueError('Bundle quantities must be positive')
+        self.products = tuple(name for name, _ in self.quantities)
+        self.price = int(promo_def['price'])
+
+    def apply(self, quantities, products, subtotal):
+        applications = min(quantities.get(name, 0) // qty
+                           for name, qty in self.quantities)
+        if not applications:
+            return 0, {}
+        full_price = sum(products[name].price * qty
+                         for name, qty in self.quantities)
+        return (applications * max(full_price - self.price, 0),
+                {name: applications * qty for name, qty in self.quantities})
+
+
+class MixAndMatch(Rule):
+    """Any ``quantity`` units from a group of products for a fixed price."""
+
+    __slots__ = ('quantity', 'price')
+
+    def __init__(self, promo_def):
+        """
+        :param promo_def: See `Rule`, plus the keys `products`, a list of
+          product names, `quantity` and `price` in pence.
+        :raises: ValueError if there are no products or the quantity is
+          not positive, KeyError if a required key is missing.
+        """
+        super().__init__(promo_def)
+        self.products = tuple(dict.fromkeys(
+            _name(name) for name in promo_def['products']))
+        if not self.products:
+            raise ValueError('A mix and match group needs products')
+        self.quantity = int(promo_def['quantity'])
+        if self.quantity < 1:
+            raise ValueError('quantity must be positive')
+        self.price = int(promo_def['price'])
+
+    def apply(self, quantities, products, subtotal):
+        held = [(products[name].price, quantities[name], name)
+                for name in self.products if quantities.get(name)]
+        sets = sum(qty for _, qty, _ in held) // self.quantity
+        if not sets:
+            return 0, {}
+        # Group the units most expensive first, whole runs of sets of one
+        # price at a time.
+        held.sort(reverse=True)
+        used = {}
+        unused = sets * self.quantity
+        for _, qty, name in held:
+            used[name] = min(qty, unused)
+            unused -= used[name]
+            if not unused:
+                break
+        discount = 0
+        partial_units = partial_price = 0
+        for price, qty, _ in held:
+            if partial_units:
+                fill = min(qty, self.quantity - partial_units)
+                partial_units += fill
+                partial_price += fill * price
+                qty -= fill
+                if partial_units == self.quantity:
+                    discount += max(partial_price - self.price, 0)
+                    sets -= 1
+                    partial_units = partial_price = 0
+            whole = min(qty // self.quantity, sets)
+            discount += whole * max(self.quantity * price - self.price, 0)
+            sets -= whole
+            if not sets:
+                break
+            qty -= whole * self.quantity
+            if qty:
+                partial_units, partial_price = qty, qty * price
+        return discount, used
+
+
+class SpendThreshold(Rule):
+    """A discount for spending at least a threshold."""
+
+    __slots__ = ('threshold', 'amount', 'discount_bp')
+    uses_units = False
+
+    def __init__(self, promo_def):
+        """
+        :param promo_def: See `Rule`, plus the keys `threshold` in pence
+          and either `discount` in pence or `discount_percent`, and
+          optionally `products`, a list of the product names the spend is
+          counted on.
+        :raises: ValueError if there is not exactly one of the discounts,
+          KeyError if a required key is missing.
+        """
+        super().__init__(promo_def)
+        self.products = tuple(dict.fromkeys(
+            _name(name) for name in promo_def.get('products', ())))
+        self.threshold = int(promo_def['threshold'])
+        if ('discount' in promo_def) == ('discount_percent' in promo_def):
+            raise ValueError('Expecting one of discount and '
+                             'discount_percent')
+        self.amount = self.discount_bp = None
+        if 'discount' in promo_def:
+            self.amount = int(promo_def['discount'])
+        else:
+            self.discount_bp = money.basis_points(
+                promo_def['discount_percent'])
+
+    def apply(self, quantities, products, subtotal):
+        if self.products:
+            subtotal = sum(products[name].price * quantities[name]
+                           for name in self.products if quantities.get(name))
+        if not subtotal or subtotal < self.threshold:
+            return 0, {}
+        if self.amount is not None:
+            return min(self.amount, subtotal), {}
+        return money.apply_rate(subtotal, self.discount_bp), {}
+
+
+# The rule class of each promotion type.
+KINDS = {
+    MULTIBUY: MultiBuy,
+    BUNDLE: Bundle,
+    MIX_AND_MATCH: MixAndMatch,
+    SPEND: SpendThreshold,
+}
+
+
+class RuleProgram:
+    """Rules compiled for evaluation against aggregated quantities.
+
+    The rules are indexed by the products whose quantities they read, so
+    only the rules involving a product in the basket, and those on the
+    basket's subtotal, are evaluated.
+    """
+
+    def __init__(self, rules):
+        """
+        :param list rules: `Rule` instances, in the order their discounts
+          are to be listed.
+        :return: None
+        """
+        self.rules = list(rules)
+        self.positions = {rule: i for i, rule in enumerate(self.rules)}
+        self.by_product = {}
+        self.basket_rules = []
+        for rule in self.rules:
+            if rule.products:
+                for name in rule.products:
+                    self.by_product.setdefault(name, []).append(rule)
+            else:
+                self.basket_rules.append(rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def affected_rules(self, name):
+        """The rules whose discounts depend on a product.
+
+        :param str name: Name of a product whose quantity has changed.
+        :return list: The rules reading the product's quantity, then those
+          on the basket's subtotal.
+        """
+        return self.by_product.get(name, []) + self.basket_rules
+
+    def candidates(self, quantities):
+        """The rules that could apply to a basket.
+
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :return list: The rules reading the quantity of a product in the
+          basket and those on the basket's subtotal, in order.
+        """
+        candidates = set(self.basket_rules)
+        for name in quantities:
+            candidates.update(self.by_product.get(name, ()))
+        return sorted(candidates, key=self.positions.__getitem__)
+
+    def evaluate(self, quantities, products, subtotal=None,
+                 discounted=None):
+        """The discounts the rules give a basket.
+
+        The rules are applied in order, each to the units the rules before
+        it have not used, and each discount is capped at what is left to
+        pay on the products the rule reads (see the module docstring).
+
+        :param dict quantities: Quantity in the basket keyed by product name.
+        :param products: Mapping of product name to product.Product, for
+          the prices.
+        :param int subtotal: Undiscounted price of the basket in pence,
+          worked out from ``quantities`` if needed and not given.
+        :param dict discounted: Optional discount in pence the per unit
+          promotions give each product, keyed by product name.
+        :return list: ``(rule, amount)`` pairs, amount in pence, for the
+          rules that apply, in order.
+        """
+        if subtotal is None and self.basket_rules:
+            subtotal = basket_subtotal(quantities, products)
+        if discounted is None:
+            discounted = {}
+        remaining = dict(quantities)
+        # What is left to pay on each product, in pence.
+        left = {name: max(products[name].price * quantity
+                          - discounted.get(name, 0), 0)
+                for name, quantity in quantities.items()}
+        discounts = []
+        for rule in self.candidates(quantities):
+            if rule.uses_units:
+                amount, used = rule.apply(remaining, products, subtotal)
+            else:
+                amount, used = rule.apply(quantities, products, subtotal)
+            for name, quantity in used.items():
+                remaining[name] -= quantity
+            if amount <= 0:
+                continue
+            names = used or rule.products or left
+            amount = min(amount, sum(left.get(name, 0) for name in names))
+            if amount <= 0:
+                continue
+            unpaid = amount
+            for name in names:
+                share = min(left.get(name, 0), unpaid)
+                if share:
+                    left[name] -= share
+                    unpaid -= share
+            discounts.append((rule, amount))
+        return discounts
+
+
+def basket_subtotal(quantities, products):
+    """Undiscounted price of a basket.
+
+    :param dict quantities: Quantity in the basket keyed by product name.
+    :param products: Mapping of product name to product.Product.
+    :return int: Price in pence.
+    """
+    return sum(products[name].price * quantity
+               for name, quantity in quantities.items())
@@ -0,0 +1,254 @@
+"""Pricing server module.
+
+A resident pricing service: the catalogue is loaded once and baskets are
+priced on request over HTTP, on a TCP port or a Unix socket, for as many
+concurrent clients as connect.  Only the small subset of HTTP/1.1 needed by
+the service is spoken: requests with a ``Content-Length`` body and
+keep-alive connections.
+
+``POST /price`` with a json body of ``{"items": [...]}`` (and optionally a
+``"basket"`` id, and a ``"store"`` id if the server prices for several
+stores) responds with the basket's record (see
+`pipeline.basket_record`); ``GET /health`` responds
+with ``{"status": "ok"}`` and ``GET /stats`` with the number of requests
+served and the pricing cache's statistics.
+"""
+
+import asyncio
+import json
+
+from basket import batch
+from basket import instrument
+from basket import pipeline
+
+MAX_BODY = 16 * 1024 * 1024
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class HTTPError(Exception):
+    """An error to be returned to the client as an HTTP response."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def read_request(reader):
+    """Read an HTTP request.
+
+    :param reader: asyncio.StreamReader to read from.
+    :return: ``(method, path, headers, body)`` tuple, or None if the client
+      closed the connection.
+    :raises: HTTPError if the request is malformed.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, 'Malformed request line')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, 'Invalid Content-Length')
+    if length > MAX_BODY:
+        raise HTTPError(413, 'Request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+@instrument.timed('encode')
+def encode_response(status, payload, keep_alive=True):
+    """Encode a json HTTP response.
+
+    :param int status: HTTP status code.
+    :param payload: Json serialisable response body.
+    :param bool keep_alive: Keep the connection open after the response.
+    :return bytes: The response.
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    head = (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode('latin-1') + body
+
+
+class PricingServer:
+    """Class that prices baskets on request against a resident catalogue."""
+
+    def __init__(self, cat, cache=None, stores=None):
+        """
+        :param cat: catalogue.Catalogue to price against.
+        :param cache: Optional cache.PricingCache of basket pricings.
+        :param stores: Optional stores.Stores to price baskets for a store
+          against, when a request names one.
+        :return: None
+        """
+        self.catalogue = cat
+        self.cache = cache
+        self.stores = stores
+        self.requests = 0
+        self._lookup = {}
+
+    def reload(self, cat):
+        """Swap in a new catalogue.
+
+        Baskets already being priced finish against the catalogue they
+        started with.
+
+        :param cat: catalogue.Catalogue to price against from now on.
+        """
+        self.catalogue = cat
+        self._lookup = {}
+
+    def price(self, items, basket_id=None, store_id=None):
+        """Price a basket.
+
+        :param list items: Names of the items in the basket.
+        :param basket_id: Identifier of the basket, echoed in the record.
+        :param store_id: Identifier of the store to price the basket for,
+          or None for the server's catalogue.
+        :return dict: The basket's record, see `pipeline.basket_record`.
+        :raises: HTTPError if there is no such store.
+        """
+        if store_id is not None:
+            if self.stores is None:
+                raise HTTPError(400, 'This server does not price for stores')
+            try:
+                return self.stores.price(store_id,
+                                         [str(item) for item in items],
+                                         basket_id)
+            except KeyError as e:
+                raise HTTPError(404, e.args[0])
+        cat = self.catalogue
+        if self.cache is not None:
+            items = [str(item) for item in items]
+            quantities = batch.basket_quantities(items, cat.products,
+                                                 self._lookup)
+            pricing = self.cache.price(cat, quantities)
+            return {'basket': basket_id, **pricing,
+                    'out_of_stock': len(items) - sum(quantities.values())}
+        shopping_basket = cat.basket(compact=True)
+        out_of_stock = 0
+        for item in items:
+            if not shopping_basket.add(str(item)):
+                out_of_stock += 1
+        return pipeline.basket_record(basket_id, shopping_basket,
+                                      out_of_stock)
+
+    def respond(self, method, path, body):
+        """Handle a request.
+
+        :param str method: HTTP method.
+        :param str path: Request path.
+        :param bytes body: Request body.
+        :return: ``(status, payload)`` tuple.
+        :raises: HTTPError if the request cannot be handled.
+        """
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, {'requests': self.requests,
+                         'cache': (self.cache.stats()
+                                   if self.cache is not None else None)}
+        if path != '/price':
+            raise HTTPError(404, f'No such path: {path}')
+        if method != 'POST':
+            raise HTTPError(405, 'Use POST to price a basket')
+        try:
+            request = json.loads(body)
+            items = request['items']
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, 'Body must be a json object with a list '
+                                 'of "items"')
+        if not isinstance(items, list):
+            raise HTTPError(400, '"items" must be a list')
+        return 200, self.price(items, request.get('basket'),
+                               request.get('store'))
+
+    async def handle(self, reader, writer):
+        """Serve the requests made on a connection until it is closed.
+
+        :param reader: asyncio.StreamReader of the connection.
+        :param writer: asyncio.StreamWriter of the connection.
+        """
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get('connection') != 'close'
+                    status, payload = self.respond(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                    keep_alive = False
+                self.requests += 1
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080, path=None):
+        """Start listening.
+
+        :param str host: Address to listen on.
+        :param int port: TCP port to listen on.
+        :param str path: Listen on this Unix socket instead of a TCP port.
+        :return: asyncio.Server instance.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+def serve(cat, host='127.0.0.1', port=8080, path=None, watcher=None,
+          cache=None, stores=None):
+    """Run a pricing server until interrupted.
+
+    :param cat: catalogue.Catalogue to price against.
+    :param str host: Address to listen on.
+    :param int port: TCP port to listen on.
+    :param str path: Listen on this Unix socket instead of a TCP port.
+    :param watcher: Optional watcher.CatalogueWatcher whose reloaded
+      catalogues are swapped into the server.
+    :param cache: Optional cache.PricingCache of basket pricings.
+    :param stores: Optional stores.Stores to price for, see
+      `PricingServer`.
+    """
+    pricing_server = PricingServer(cat, cache, stores)
+
+    async def run():
+        srv = await pricing_server.start(host, port, path)
+        async with srv:
+            await srv.serve_forever()
+
+    if watcher is not None:
+        watcher.on_reload = pricing_server.reload
+        watcher.start()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
@@ -0,0 +1,179 @@
+"""Sharded pricing module.
+
+Promotions only ever link a qualifying product to a discounted product, so
+the products of a basket fall into groups that no promotion links (see
+engine.PromotionIndex.product_groups) and the discounts of each group can
+be worked out without looking at the others.  `ShardedPricer` prices very
+large baskets, such as wholesale orders, by packing these groups into one
+shard per worker process and pricing the shards in parallel.  Each worker
+holds its own copy of the catalogue, sent once when it starts, and the
+results are merged in the order the products were added, so the record is
+the same as pricing the basket in one go.  Rule promotions (see the rules
+module) can link any products, so they are evaluated here once the shards
+are priced, from the basket's quantities and the discount each shard gave
+each product.
+
+Baskets below a threshold are priced in this process, as handing them to
+the workers would cost more than it saves.
+"""
+
+import multiprocessing
+import os
+
+from basket import basket
+from basket import batch
+from basket import pipeline
+
+# Baskets of fewer items than this are priced in this process.
+SHARD_THRESHOLD = 100000
+
+# The catalogue, and the position of each of its promotions, set by
+# `init_worker` in this process.
+_catalogue = None
+_positions = None
+
+
+def partition(groups, shards):
+    """Pack groups of products into shards of about the same size.
+
+    The largest groups are placed first, each in the shard with the fewest
+    products so far, so the packing only depends on the groups.
+
+    :param list groups: Lists of product names, see
+      engine.PromotionIndex.product_groups.
+    :param int shards: Number of shards to pack into.
+    :return list: The non-empty shards, each a list of product names.
+    """
+    packed = [[] for _ in range(shards)]
+    for group in sorted(groups, key=len, reverse=True):
+        min(packed, key=len).extend(group)
+    return [shard for shard in packed if shard]
+
+
+def init_worker(cat):
+    """Set the catalogue used by `price_shard` in this process.
+
+    :param cat: catalogue.Catalogue to price against.
+    """
+    global _catalogue, _positions
+    _catalogue = cat
+    _positions = {promotion: i for i, promotion in enumerate(cat.promotions)}
+
+
+def price_shard(quantities):
+    """Price one shard of a basket against the catalogue of `init_worker`.
+
+    :param dict quantities: Quantity of each product in the shard, keyed by
+      name.
+    :return tuple: The shard's subtotal and total, in pence, and the
+      ``(promotion position, amount)`` discounts of each discounted
+      product, keyed by name.
+    """
+    shopping_basket = basket.CompactBasket(
+        _catalogue.products, _catalogue.promotions, _catalogue.index)
+    for name, quantity in quantities.items():
+        shopping_basket.add(name, quantity)
+    shopping_basket.calculate_discounts()
+    discounts = {}
+    for line in shopping_basket.discounted_lines:
+        price = line.product.price
+        discounts[line.name] = [(_positions[promotion],
+                                 promotion.discount(price, count))
+                                for promotion, count in line.segments]
+    return shopping_basket.subtotal, shopping_basket.total, discounts
+
+
+class ShardedPricer:
+    """Class that prices very large baskets on a pool of worker processes.
+
+    The pool is started for the first basket that needs it.  Close the
+    pricer, or use it as a context manager, to stop the workers.
+    """
+
+    def __init__(self, cat, workers=None, threshold=SHARD_THRESHOLD):
+        """
+        :param cat: catalogue.Catalogue to price against.  It is copied to
+          each worker, so changes to it once the pool has started are not
+          seen.
+        :param int workers: Number of worker processes, defaults to the
+          number of CPUs.  With a single worker baskets are priced in this
+          process.
+        :param int threshold: Price baskets of fewer items than this in
+          this process.
+        :return: None
+        """
+        self.catalogue = cat
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+        self._pool = None
+        self._promotions = None
+        self._lookup = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes, if they have been started."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def price(self, items, basket_id=None):
+        """Price a basket.
+
+        :param items: Iterable of the names of the items in the basket.
+        :param basket_id: Identifier of the basket, echoed in the record.
+        :return dict: The basket's record, see `pipeline.basket_record`.
+        """
+        items = list(items)
+        cat = self.catalogue
+        quantities = batch.basket_quantities(items, cat.products,
+                                             self._lookup)
+        out_of_stock = len(items) - sum(quantities.values())
+        if len(items) < self.threshold or self.workers == 1:
+            shopping_basket = cat.basket(compact=True)
+            for name, quantity in quantities.items():
+                shopping_basket.add(name, quantity)
+            return pipeline.basket_record(basket_id, shopping_basket,
+                                          out_of_stock)
+
+        shards = partition(cat.index.product_groups(quantities), self.workers)
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers, init_worker,
+                                              (cat,))
+            self._promotions = list(cat.promotions)
+        subtotal = total = 0
+        discounted = {}
+        for shard_subtotal, shard_total, shard_discounts in self._pool.map(
+                price_shard,
+                [{name: quantities[name] for name in shard}
+                 for shard in shards]):
+            subtotal += shard_subtotal
+            total += shard_total
+            discounted.update(shard_discounts)
+
+        # Add the discounts up in the order a single basket would.
+        amounts = {}
+        for name in quantities:
+            for position, amount in discounted.get(name, ()):
+                amounts[position] = amounts.get(position, 0) + amount
+        discounts = [(self._promotions[position], amount)
+                     for position, amount in amounts.items()]
+        if cat.program is not None:
+            rule_discounts = cat.program.evaluate(
+                quantities, cat.products, subtotal,
+                {name: sum(amount for _, amount in discounted[name])
+                 for name in quantities if name in discounted})
+            discounts += rule_discounts
+            total -= sum(amount for _, amount in rule_discounts)
+        return {
+            'basket': basket_id,
+            'subtotal': subtotal,
+            'discounts': pipeline.discount_records(discounts),
+            'total': total,
+            'out_of_stock': out_of_stock,
+        }
@@ -0,0 +1,289 @@
+"""Multi-store catalogue module.
+
+Many stores sell mostly the same products under mostly the same
+promotions.  Rather than each store loading its own copy of the catalogue,
+`Stores` holds one base catalogue.Catalogue and, for each store, only what
+differs from it: the store's own prices, any products only it sells, the
+promotions only it runs and the shared promotions it does not run.
+
+A store's `StoreCatalogue` looks products and promotions up in the store's
+overlay first and in the base catalogue after, so the memory a store takes
+grows with the size of its overlay rather than the size of the catalogue.
+Promotions are shared objects: a shared promotion applied at a store's own
+price just gets another entry in its discount table.
+
+The overlays are read from a json file holding an array of objects like::
+
+    {"store": "0042",
+     "prices": {"soup": 70},
+     "products": [{"name": "Pie", "price": 250, "unit": "Each"}],
+     "promotions": [{"id": 90, "title": "Pie 10% off", ...}],
+     "exclude_promotions": [2]}
+
+where every key but ``store`` is optional.
+"""
+
+import collections.abc
+import copy
+import itertools
+
+from basket import catalogue
+from basket import loader
+from basket import pipeline
+from basket import product
+from basket import rules
+
+
+class Overlay(collections.abc.Mapping):
+    """Read-only mapping of a few entries laid over a base mapping."""
+
+    def __init__(self, own, base):
+        """
+        :param dict own: Entries that take precedence over ``base``.
+        :param base: Mapping to fall back on.
+        :return: None
+        """
+        self.own = own
+        self.base = base
+
+    def __getitem__(self, key):
+        value = self.own.get(key)
+        if value is None:
+            return self.base[key]
+        return value
+
+    def get(self, key, default=None):
+        value = self.own.get(key)
+        if value is None:
+            return self.base.get(key, default)
+        return value
+
+    def __contains__(self, key):
+        return key in self.own or key in self.base
+
+    def __iter__(self):
+        yield from self.own
+        for key in self.base:
+            if key not in self.own:
+                yield key
+
+    def __len__(self):
+        return len(self.base) + sum(1 for key in self.own
+                                    if key not in self.base)
+
+
+class StorePromotions(collections.abc.Sequence):
+    """Read-only sequence of a store's promotions.
+
+    The shared promotions the store runs, in order, followed by its own.
+    """
+
+    def __init__(self, base, excluded, own):
+        """
+        :param base: Sequence of the shared promotions.
+        :param set excluded: Ids of the shared promotions not run.
+        :param list own: The store's own promotions.
+        :return: None
+        """
+        self.base = base
+        self.excluded = excluded
+        self.own = own
+        self._len = len(own) + len(base)
+        if excluded:
+            self._len -= sum(1 for p in base if p.promo_id in excluded)
+
+    def __iter__(self):
+        for promotion in self.base:
+            if promotion.promo_id not in self.excluded:
+                yield promotion
+        yield from self.own
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(itertools.islice(self, *i.indices(len(self))))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('promotion index out of range')
+        return next(itertools.islice(self, i, None))
+
+    def __len__(self):
+        return self._len
+
+
+class StoreCatalogue(catalogue.Catalogue):
+    """Catalogue of one store, laid over a base catalogue."""
+
+    def __init__(self, base, store_id, prices=None, products=None,
+                 promotions=None, excluded=None):
+        """
+        :param base: catalogue.Catalogue shared by the stores.
+        :param store_id: Identifier of the store.
+        :param dict prices: The store's prices, in pence, keyed by the name
+          of a base product.
+        :param dict products: product.Product instances only the store
+          sells.
+        :param list promotions: promotion.Promotion and rules.Rule
+          instances only the store runs, applied after the shared ones.
+        :param excluded: Ids of the shared promotions the store does not
+          run.
+        :raises: KeyError if a price is given for a product not in the
+          base catalogue.
+        :return: None
+        """
+        self.base = base
+        self.store_id = store_id
+        self.rounding = base.rounding
+        own_products = dict(products or {})
+        for name, price in (prices or {}).items():
+            prod = base.products[name.lower()]
+            own_products[prod.name] = product.Product(prod.name, price,
+                                                      prod.unit)
+        self.products = Overlay(own_products, base.products)
+
+        own_promotions = list(promotions or ())
+        excluded = set(excluded or ())
+        own_rules = [p for p in own_promotions if isinstance(p, rules.Rule)]
+        self.program = base.program
+        if own_rules or (excluded and base.program is not None):
+            if own_rules:
+                own_promotions = [p for p in own_promotions
+                                  if not isinstance(p, rules.Rule)]
+            store_rules = [] if base.program is None else [
+                rule for rule in base.program.rules
+                if rule.promo_id not in excluded]
+            store_rules += own_rules
+            self.program = None
+            if store_rules:
+                self.program = rules.RuleProgram(store_rules)
+        for promotion in own_promotions:
+            promotion.rounding = self.rounding
+        self.promotions = StorePromotions(base.promotions, excluded,
+                                          own_promotions)
+        changed = list(own_promotions)
+        if excluded:
+            changed.extend(p for p in base.promotions
+                           if p.promo_id in excluded)
+        self.index = self._overlay_index(changed)
+        for promotion in own_promotions:
+            prod = self.products.get(promotion.discounted_product)
+            if prod is not None:
+                promotion.prime(prod.price)
+        self.touch()
+
+    def _overlay_index(self, changed):
+        """Lay the store's promotions over the base catalogue's index.
+
+        :param list changed: Promotions the store adds or leaves out.
+        :return: Promotion index of the same kind as the base catalogue's.
+        """
+        index = copy.copy(self.base.index)
+        index.promotions = self.promotions
+        for attribute, key in (('by_discounted', 'discounted_product'),
+                               ('by_qualifying', 'qualifying_product')):
+            base_groups = getattr(self.base.index, attribute)
+            names = {getattr(p, key) for p in changed}
+            own = {}
+            for name in names:
+                own[name] = [p for p in base_groups.get(name, ())
+                             if p.promo_id not in self.promotions.excluded]
+            for promotion in self.promotions.own:
+                own[getattr(promotion, key)].append(promotion)
+            setattr(index, attribute, Overlay(own, base_groups))
+        if hasattr(index, 'products'):
+            # An engine.OptimalPromotionIndex ranks by the store's prices.
+            index.products = self.products
+            index._rankings = {}
+        return index
+
+
+class Stores:
+    """Class that prices baskets for many stores sharing a catalogue."""
+
+    def __init__(self, base):
+        """
+        :param base: catalogue.Catalogue shared by the stores.
+        :return: None
+        """
+        self.base = base
+        self.catalogues = {}
+
+    def add(self, store_id, prices=None, products=None, promotions=None,
+            excluded=None):
+        """Add a store.
+
+        A store with nothing of its own prices against the base catalogue.
+
+        :param store_id: Identifier of the store.
+        :param prices: See `StoreCatalogue`.
+        :param products: See `StoreCatalogue`.
+        :param promotions: See `StoreCatalogue`.
+        :param excluded: See `StoreCatalogue`.
+        :return: The store's catalogue.
+        """
+        if prices or products or promotions or excluded:
+            cat = StoreCatalogue(self.base, store_id, prices, products,
+                                 promotions, excluded)
+        else:
+            cat = self.base
+        self.catalogues[store_id] = cat
+        return cat
+
+    def catalogue(self, store_id):
+        """The catalogue of a store.
+
+        :param store_id: Identifier of the store.
+        :return: The store's catalogue.
+        :raises: KeyError if there is no such store.
+        """
+        try:
+            return self.catalogues[store_id]
+        except KeyError:
+            raise KeyError(f'No such store: {store_id}')
+
+    def price(self, store_id, items, basket_id=None):
+        """Price a basket at a store.
+
+        :param store_id: Identifier of the store.
+        :param items: Iterable of the names of the items in the basket.
+        :param basket_id: Identifier of the basket, echoed in the record.
+        :return dict: The basket's record, see `pipeline.basket_record`.
+        :raises: KeyError if there is no such store.
+        """
+        shopping_basket = self.catalogue(store_id).basket(compact=True)
+        out_of_stock = 0
+        for item in items:
+            if not shopping_basket.add(item):
+                out_of_stock += 1
+        return pipeline.basket_record(basket_id, shopping_basket,
+                                      out_of_stock)
+
+    def load(self, stores_file_path):
+        """Add the stores described in a json file.
+
+        Products and promotions that cannot be loaded are logged and
+        skipped, as by loader.build_products and loader.build_promotions.
+
+        :param str stores_file_path: Path to the stores file.
+        :return int: Number of stores added.
+        :raises: ValueError if the file cannot be read or a store is
+          malformed.
+        """
+        count = 0
+        try:
+            for index, record in enumerate(
+                    loader.read_records(stores_file_path)):
+                try:
+                    self.add(
+                        record['store'], record.get('prices'),
+                        loader.build_products(record.get('products', ())),
+                        loader.build_promotions(record.get('promotions', ())),
+                        record.get('exclude_promotions'))
+                except (KeyError, TypeError, AttributeError,
+                        ValueError) as e:
+                    raise ValueError(f'Invalid store in record {index} of '
+                                     f'{stores_file_path}: {e}')
+                count += 1
+        except EnvironmentError as e:
+            raise ValueError(f'Failed to load stores: {e}')
+        return count
@@ -0,0 +1,159 @@
+"""Vectorised pricing module.
+
+Optional NumPy backend for `batch.price_baskets`.  A chunk of baskets is
+encoded as a matrix of product counts and priced with array operations:
+subtotals, the number of discounts each promotion earns, the cap on the
+units it can discount and the discount amounts are all computed for every
+basket in the chunk at once.  Rule promotions (see the rules module) are
+evaluated a basket at a time on the same quantities, and capped at what the
+per unit promotions leave to pay on each product, as their discounts do
+not reduce to array operations.
+
+NumPy is not a requirement of this package; `available` reports whether
+the backend can be used.
+"""
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+from basket import engine
+
+
+def available():
+    """Check if the vectorised backend can be used.
+
+    :return: True if NumPy is installed and False otherwise.
+    """
+    return numpy is not None
+
+
+class VectorisedPricer:
+    """Prices chunks of baskets with array operations.
+
+    The catalogue and promotion index are turned into arrays once, when the
+    pricer is made, and shared by every chunk it prices.
+    """
+
+    def __init__(self, products, index, program=None):
+        """
+        :param dict products: The products available.
+        :param index: engine.PromotionIndex of the promotions available.
+        :param program: Optional rules.RuleProgram of the rule promotions
+          available.
+        :return: None
+        """
+        self.products = products
+        self.program = program
+        names = [prod.name for prod in products.values()]
+        self.columns = {name: col for col, name in enumerate(names)}
+        self.prices = numpy.array(
+            [prod.price for prod in products.values()], dtype=numpy.int64)
+
+        # Only products a promotion involves need a dense count column.
+        promoted = [name for name in names
+                    if name in index.by_qualifying
+                    or name in index.by_discounted]
+        self.promoted_columns = {name: col
+                                 for col, name in enumerate(promoted)}
+        is_promoted = numpy.zeros(len(names), dtype=bool)
+        promoted_column = numpy.zeros(len(names), dtype=numpy.int64)
+        for name, col in self.promoted_columns.items():
+            is_promoted[self.columns[name]] = True
+            promoted_column[self.columns[name]] = col
+        self.is_promoted = is_promoted
+        self.promoted_column = promoted_column
+
+        # For each discounted product, its name, column and price and its
+        # promotions in reverse order (or best first, for an
+        # engine.OptimalPromotionIndex) with their qualifying columns and
+        # quantities.
+        self.optimal = isinstance(index, engine.OptimalPromotionIndex)
+        self.groups = []
+        for name, promotions in index.by_discounted.items():
+            if name not in self.promoted_columns:
+                continue
+            if self.optimal:
+                promotions = [p for p, _ in index.ranking(name)]
+            else:
+                promotions = list(reversed(promotions))
+            promotions = [p for p in promotions
+                          if p.qualifying_product in self.promoted_columns]
+            if not promotions:
+                continue
+            self.groups.append((
+                name,
+                self.promoted_columns[name],
+                int(self.prices[self.columns[name]]),
+                list(zip(promotions,
+                         [self.promoted_columns[p.qualifying_product]
+                          for p in promotions]))))
+
+    def price(self, quantities):
+        """Price a chunk of baskets.
+
+        :param list quantities: One dict of quantities keyed by product name
+          per basket, as returned by `batch.basket_quantities`.
+        :return: ``(subtotals, discounts)`` NumPy integer arrays.
+        """
+        rows = []
+        cols = []
+        counts = []
+        for row, basket_quantities in enumerate(quantities):
+            for name, qty in basket_quantities.items():
+                rows.append(row)
+                cols.append(self.columns[name])
+                counts.append(qty)
+        rows = numpy.array(rows, dtype=numpy.int64)
+        cols = numpy.array(cols, dtype=numpy.int64)
+        counts = numpy.array(counts, dtype=numpy.int64)
+
+        subtotals = numpy.zeros(len(quantities), dtype=numpy.int64)
+        numpy.add.at(subtotals, rows, self.prices[cols] * counts)
+
+        matrix = numpy.zeros((len(quantities), len(self.promoted_columns)),
+                             dtype=numpy.int64)
+        promoted = self.is_promoted[cols]
+        matrix[rows[promoted], self.promoted_column[cols[promoted]]] = (
+            counts[promoted])
+
+        discounts = numpy.zeros(len(quantities), dtype=numpy.int64)
+        # The discount on each discounted product, for the rule promotions.
+        line_discounts = []
+        for name, col, price, promotions in self.groups:
+            available_qty = matrix[:, col]
+            line_discount = numpy.zeros(len(quantities), dtype=numpy.int64)
+            if self.optimal:
+                # Fill the units from the best promotion down.
+                remaining = available_qty.copy()
+                for promotion, qualifying_col in promotions:
+                    earned = numpy.maximum(
+                        matrix[:, qualifying_col] // promotion.qualifying_qty,
+                        0)
+                    count = numpy.minimum(earned, remaining)
+                    line_discount += promotion.discount(price, count)
+                    remaining -= count
+            else:
+                covered = numpy.zeros(len(quantities), dtype=numpy.int64)
+                for promotion, qualifying_col in promotions:
+                    earned = numpy.minimum(
+                        matrix[:, qualifying_col] // promotion.qualifying_qty,
+                        available_qty)
+                    line_discount += promotion.discount(
+                        price, numpy.maximum(earned - covered, 0))
+                    numpy.maximum(covered, earned, out=covered)
+            discounts += line_discount
+            line_discounts.append((name, line_discount))
+        if self.program is not None:
+            for row, basket_quantities in enumerate(quantities):
+                if not basket_quantities:
+                    continue
+                discounted = {name: int(line_discount[row])
+                              for name, line_discount in line_discounts
+                              if line_discount[row]}
+                for _, amount in self.program.evaluate(
+                        basket_quantities, self.products,
+                        int(subtotals[row]), discounted):
+                    discounts[row] += amount
+        return subtotals, discounts
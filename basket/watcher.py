@@ -0,0 +1,146 @@
+"""Catalogue watcher module.
+
+Keeps a long running process's catalogue in step with the products and
+promotions files.  A background thread polls the files' modification times
+and sizes; when they change, the contents are hashed and, if they really
+differ, parsed into a new `catalogue.Catalogue` which is then swapped in.
+
+The swap is a single attribute assignment, so readers never wait for a
+reload and never see a half built catalogue: a basket made from
+``watcher.catalogue`` keeps pricing against that snapshot even if a newer
+one is swapped in meanwhile.
+"""
+
+import hashlib
+import io
+import os
+import threading
+
+from basket import catalogue
+from basket import loader
+from basket import money
+
+
+class CatalogueWatcher:
+    """Class that reloads a catalogue when its data files change."""
+
+    def __init__(self, products_file_path, promotions_file_path,
+                 interval=1.0, on_reload=None, optimal=False,
+                 rounding=money.UNIT_FLOOR):
+        """
+        Loads the catalogue straight away, in the calling thread.
+
+        :param str products_file_path: Path to products file.
+        :param str promotions_file_path: Path to promotions file.
+        :param float interval: Seconds between polls of the files.
+        :param on_reload: Optional callable given each new catalogue once it
+          has been swapped in.
+        :param bool optimal: Allocate promotions for the lowest price, see
+          catalogue.Catalogue.
+        :param str rounding: Rounding policy of the discounts, see
+          catalogue.Catalogue.
+        :return: None
+        """
+        self.paths = (products_file_path, promotions_file_path)
+        self.interval = interval
+        self.on_reload = on_reload
+        self.optimal = optimal
+        self.rounding = rounding
+        self.reloads = 0
+        self._signature = None
+        self._digest = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.catalogue = catalogue.Catalogue({}, [])
+        self.check()
+
+    def _stat(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def check(self):
+        """Reload the catalogue if its data files have changed.
+
+        Files that cannot be read or parsed as json arrays (e.g. because
+        they are half written) leave the current catalogue in place; they
+        are tried again once they change.
+
+        :return: True if a new catalogue was swapped in and False otherwise.
+        """
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+
+        try:
+            contents = []
+            for path in self.paths:
+                with open(path, 'rb') as f:
+                    contents.append(f.read())
+        except EnvironmentError as e:
+            loader.logger.log('Failed to reload catalogue: {error}',
+                              loader.SimpleLogger.error, error=e)
+            return False
+
+        digest = hashlib.sha256(b'\0'.join(contents)).hexdigest()
+        if digest == self._digest:
+            return False
+        try:
+            products_data, promotions_data = (
+                list(loader.read_array(io.StringIO(c.decode('utf-8'))))
+                for c in contents)
+        except ValueError as e:
+            loader.logger.log('Failed to reload catalogue: {error}',
+                              loader.SimpleLogger.error, error=e)
+            return False
+
+        cat = catalogue.Catalogue(loader.build_products(products_data),
+                                  loader.build_promotions(promotions_data),
+                                  self.optimal, self.rounding)
+        self._digest = digest
+        self.catalogue = cat
+        self.reloads += 1
+        loader.logger.log('Loaded catalogue {digest} with {products} '
+                          'products and {promotions} promotions',
+                          digest=digest[:12], products=len(cat.products),
+                          promotions=len(cat.promotions))
+        if self.on_reload is not None:
+            self.on_reload(cat)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # Keep polling whatever goes wrong with one reload.
+            try:
+                self.check()
+            except Exception as e:
+                loader.logger.log('Failed to reload catalogue: {error}',
+                                  loader.SimpleLogger.error, error=e)
+
+    def start(self):
+        """Start polling the files in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='catalogue-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop polling the files."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,136 @@
+"""Discount arithmetic benchmark.
+
+Compares the float discount kernel pricing used to use,
+``int(price * percent / 100.0)`` per unit, with the integer basis point
+kernel of `basket.money`, and prices large baskets under each rounding
+policy::
+
+    python -m benchmarks.discounts --baskets 20 --basket-size 10000
+
+Each kernel is timed over the ``(promotion, price, count)`` lines of the
+priced baskets; ``mismatches`` counts the lines where the float kernel's
+discount differs from the exact one.
+"""
+
+import argparse
+import json
+import platform
+import random
+
+from basket import catalogue
+from basket import loader
+from basket import money
+from benchmarks import generate
+from benchmarks import pricing
+
+
+def float_kernel(lines):
+    """Total discount of ``(percent, price, count)`` lines, as it was."""
+    return sum(int(price * percent / 100.0) * count
+               for percent, price, count in lines)
+
+
+def integer_kernel(lines):
+    """Total discount of ``(basis points, price, count)`` lines."""
+    apply_rate = money.apply_rate
+    return sum(apply_rate(price, rate) * count
+               for rate, price, count in lines)
+
+
+def run(num_products=1000, num_promotions=500, num_baskets=20,
+        basket_size=10000, skew=1.0, repeat=3, seed=0):
+    """Run the discount benchmark.
+
+    :return dict: Details of the environment and the result records.
+    """
+    rng = random.Random(seed)
+    products_def = generate.generate_products(num_products, rng)
+    names = [p['name'] for p in products_def]
+    promotions_def = generate.generate_promotions(num_promotions, names, rng)
+    # Fractional percentages, where float rounding shows.
+    for promotion_def in promotions_def:
+        promotion_def['discount_percent'] += rng.randint(0, 99) / 100
+    baskets = generate.generate_baskets(names, num_baskets, basket_size,
+                                        skew, rng)
+    params = {'products': num_products, 'promotions': num_promotions,
+              'baskets': num_baskets, 'basket_size': basket_size}
+
+    results = []
+    lines = None
+    for rounding in money.ROUNDINGS:
+        cat = catalogue.Catalogue(loader.build_products(products_def),
+                                  loader.build_promotions(promotions_def),
+                                  rounding=rounding)
+        filled = []
+        for items in baskets:
+            b = cat.basket(compact=True)
+            for item in items:
+                b.add(item)
+            filled.append(b)
+
+        def calculate():
+            for b in filled:
+                b.calculate_discounts()
+                b.total
+        results.append(pricing.result(
+            f'calculate_{rounding}', pricing.time_call(calculate, repeat),
+            num_baskets, **params))
+
+        if lines is None:
+            lines = [(promotion, b.lines[name].product.price, count)
+                     for b in filled for name in b.lines
+                     for promotion, count in b.lines[name].segments]
+
+        def discount():
+            return sum(promotion.discount(price, count)
+                       for promotion, price, count in lines)
+        results.append(pricing.result(
+            f'discount_{rounding}', pricing.time_call(discount, repeat),
+            len(lines), **params))
+
+    float_lines = [(promotion.discount_percent, price, count)
+                   for promotion, price, count in lines]
+    integer_lines = [(promotion.discount_bp, price, count)
+                     for promotion, price, count in lines]
+    for stage, kernel, kernel_lines in (
+            ('float_kernel', float_kernel, float_lines),
+            ('integer_kernel', integer_kernel, integer_lines)):
+        results.append(pricing.result(
+            stage, pricing.time_call(lambda: kernel(kernel_lines), repeat),
+            len(lines), **params))
+    mismatches = sum(
+        int(price * percent / 100.0) != money.apply_rate(price, rate)
+        for (percent, price, _), (rate, _, _) in zip(float_lines,
+                                                     integer_lines))
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'seed': seed,
+            'lines': len(lines),
+            'mismatches': mismatches,
+            'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.discounts')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--promotions', type=int, default=500)
+    parser.add_argument('--baskets', type=int, default=20)
+    parser.add_argument('--basket-size', type=int, default=10000)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='File to write the results to, '
+                                         'default is stdout')
+    args = parser.parse_args(argv)
+
+    results = run(args.products, args.promotions, args.baskets,
+                  args.basket_size, args.skew, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,113 @@
+"""Synthetic data generators.
+
+Generates product catalogues, promotions and baskets of configurable size
+for the benchmarks.  Catalogues can be written out as `products.json` and
+`promotions.json` files in the same format as the ones in the repository::
+
+    python -m benchmarks.generate OUTPUT_DIR --products 10000 --promotions 5000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+
+UNITS = ['Bag', 'Bar', 'Bottle', 'Box', 'Each', 'Loaf', 'Pack', 'Tin']
+
+
+def generate_products(count, rng):
+    """Generate product definitions.
+
+    :param int count: Number of products.
+    :param rng: random.Random instance.
+    :return list: Product definitions as found in `products.json`.
+    """
+    return [{'name': f'Product {i:06d}', 'price': rng.randint(10, 2000),
+             'unit': rng.choice(UNITS)} for i in range(count)]
+
+
+def generate_promotions(count, product_names, rng):
+    """Generate promotion definitions.
+
+    About half are "N% off" a single product; the rest need some number of
+    one product to discount another.
+
+    :param int count: Number of promotions.
+    :param list product_names: Names of the products to promote.
+    :param rng: random.Random instance.
+    :return list: Promotion definitions as found in `promotions.json`.
+    """
+    promotions = []
+    for i in range(count):
+        discounted = rng.choice(product_names)
+        percent = rng.choice([10, 20, 25, 33, 50])
+        if rng.random() < 0.5:
+            qualifying, qty = discounted, 1
+            title = f'{discounted} {percent}% off'
+        else:
+            qualifying, qty = rng.choice(product_names), rng.randint(2, 4)
+            title = f'{qty} {qualifying} get {percent}% off {discounted}'
+        promotions.append({
+            'id': i + 1, 'title': title,
+            'qualifying_product': qualifying, 'qualifying_qty': qty,
+            'discounted_product': discounted, 'discount_percent': percent})
+    return promotions
+
+
+def generate_baskets(product_names, count, size, skew, rng):
+    """Generate baskets of item names.
+
+    Items are drawn from a Zipf-like distribution over the products: the
+    product of rank ``r`` is picked with weight ``1 / r ** skew``, so a skew
+    of 0 is uniform and larger skews concentrate baskets on a few products.
+
+    :param list product_names: Names of the products to pick from.
+    :param int count: Number of baskets.
+    :param int size: Number of items in each basket.
+    :param float skew: Zipf exponent.
+    :param rng: random.Random instance.
+    :return list: Baskets, each a list of item names.
+    """
+    cum_weights = list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, len(product_names) + 1)))
+    return [rng.choices(product_names, cum_weights=cum_weights, k=size)
+            for _ in range(count)]
+
+
+def write_catalogue(directory, products, promotions):
+    """Write a catalogue out as json files.
+
+    :param str directory: Directory to write into.
+    :param list products: Product definitions.
+    :param list promotions: Promotion definitions.
+    :return: ``(products file path, promotions file path)`` tuple.
+    """
+    products_file_path = os.path.join(directory, 'products.json')
+    promotions_file_path = os.path.join(directory, 'promotions.json')
+    with open(products_file_path, 'w') as f:
+        json.dump(products, f)
+    with open(promotions_file_path, 'w') as f:
+        json.dump(promotions, f)
+    return products_file_path, promotions_file_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.generate')
+    parser.add_argument('output', help='Directory to write the files to')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--promotions', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    products = generate_products(args.products, rng)
+    promotions = generate_promotions(
+        args.promotions, [p['name'] for p in products], rng)
+    os.makedirs(args.output, exist_ok=True)
+    for path in write_catalogue(args.output, products, promotions):
+        print(path)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,107 @@
+"""Catalogue loading benchmark.
+
+Compares ways of loading synthetic product and promotion files of
+increasing size: parsing the whole file with `json.load` and then building
+the records (how the loader used to work), the loader's streaming parser
+and, when it is installed, the loader with ijson.  Peak memory allocated
+while loading is reported alongside the times::
+
+    python -m benchmarks.loading --sizes 1000:500 100000:50000
+"""
+
+import argparse
+import json
+import platform
+import random
+import tempfile
+import tracemalloc
+
+from basket import loader
+from benchmarks import generate
+from benchmarks import pricing
+
+
+def load_whole(products_file_path, promotions_file_path):
+    return (loader.build_products(loader.load_json(products_file_path)),
+            loader.build_promotions(loader.load_json(promotions_file_path)))
+
+
+def load_streaming(products_file_path, promotions_file_path, fast=False):
+    return (loader.load_products(products_file_path, fast=fast),
+            loader.load_promotions(promotions_file_path, fast=fast))
+
+
+def peak_memory(func):
+    """Peak bytes allocated by a call, as traced by tracemalloc."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(num_products, num_promotions, repeat, rng):
+    """Benchmark each loader against one catalogue size.
+
+    :return list: Result records, see `pricing.result`.
+    """
+    products_def = generate.generate_products(num_products, rng)
+    names = [p['name'] for p in products_def]
+    promotions_def = generate.generate_promotions(num_promotions, names, rng)
+    params = {'products': num_products, 'promotions': num_promotions}
+    loaders = {'json_load': load_whole, 'streaming': load_streaming}
+    if loader.ijson is not None:
+        loaders['ijson'] = lambda *paths: load_streaming(*paths, fast=True)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate.write_catalogue(directory, products_def,
+                                         promotions_def)
+        for stage, load in loaders.items():
+            record = pricing.result(stage, pricing.time_call(
+                lambda: load(*paths), repeat), num_products + num_promotions,
+                **params)
+            record['peak_bytes'] = peak_memory(lambda: load(*paths))
+            results.append(record)
+    return results
+
+
+def run(sizes, repeat=3, seed=0):
+    """Run the loading benchmark.
+
+    :param list sizes: ``(products, promotions)`` catalogue sizes.
+    :return dict: Details of the environment and the result records.
+    """
+    rng = random.Random(seed)
+    results = []
+    for num_products, num_promotions in sizes:
+        results.extend(run_size(num_products, num_promotions, repeat, rng))
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'ijson': loader.ijson is not None,
+            'seed': seed,
+            'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.loading')
+    parser.add_argument('--sizes', nargs='+', default=pricing.DEFAULT_SIZES,
+                        metavar='PRODUCTS:PROMOTIONS')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='File to write the results to, '
+                                         'default is stdout')
+    args = parser.parse_args(argv)
+
+    results = run([pricing.parse_size(size) for size in args.sizes],
+                  args.repeat, args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
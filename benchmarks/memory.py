@@ -0,0 +1,79 @@
+"""Memory benchmark.
+
+Measures the memory held per basket line, i.e. per unit scanned into a
+`basket.Basket`, with tracemalloc.  Run with::
+
+    python -m benchmarks.memory [--lines N]
+"""
+
+import argparse
+import json
+import tracemalloc
+
+from basket import basket
+from basket import product
+from basket import promotion
+
+
+def make_catalogue(size=100):
+    """Make a catalogue of products with one promotion each.
+
+    :param int size: Number of products.
+    :return: ``(products, promotions)`` tuple.
+    """
+    products = {}
+    promotions = []
+    for i in range(size):
+        p = product.Product(f'Product {i}', 100 + i, 'Each')
+        products[p.name] = p
+        promotions.append(promotion.Promotion({
+            'id': i, 'title': f'Product {i} 10% off',
+            'qualifying_product': p.name, 'qualifying_qty': 2,
+            'discounted_product': p.name, 'discount_percent': 10}))
+    return products, promotions
+
+
+def bytes_per_line(cls, lines, products, promotions):
+    """Measure the memory a basket holds per line added.
+
+    :param cls: Basket class to measure.
+    :param int lines: Number of units to add.
+    :param dict products: The products available.
+    :param list promotions: The promotions available.
+    :return float: Bytes allocated per line, with discounts calculated.
+    """
+    names = list(products)
+    tracemalloc.start()
+    try:
+        b = cls(products, promotions)
+        before, _ = tracemalloc.get_traced_memory()
+        for i in range(lines):
+            b.add(names[i % len(names)])
+        b.calculate_discounts()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (after - before) / lines
+
+
+def run(lines=100000):
+    """Run the benchmark.
+
+    :param int lines: Number of units to add to each basket.
+    :return dict: Bytes per line keyed by basket class name.
+    """
+    products, promotions = make_catalogue()
+    return {cls.__name__: bytes_per_line(cls, lines, products, promotions)
+            for cls in (basket.Basket, basket.IncrementalBasket,
+                        basket.CompactBasket)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.memory')
+    parser.add_argument('--lines', type=int, default=100000)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.lines), indent=2))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
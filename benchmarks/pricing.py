@@ -0,0 +1,236 @@
+"""Pricing benchmark suite.
+
+Times the stages of pricing against synthetic catalogues of increasing
+size: loading the products and promotions, adding items to baskets,
+calculating discounts and complete `python -m basket` runs.  Results are
+written as json so runs can be compared to catch regressions::
+
+    python -m benchmarks.pricing --sizes 10:10 10000:5000 --output out.json
+
+It also compares `basket.batch.price_baskets` with pricing the same
+baskets one `basket.Basket` at a time, on a small catalogue like the
+bundled one and baskets of a few sizes; the ``price_baskets`` records
+hold the ``speedup`` over the loop.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import tempfile
+import time
+
+from basket import __main__ as cli
+from basket import basket
+from basket import batch
+from basket import catalogue
+from basket import loader
+from benchmarks import generate
+
+DEFAULT_SIZES = ['10:10', '1000:500', '10000:5000', '100000:50000']
+DEFAULT_BATCH_SIZES = [2, 15, 50]
+
+
+def time_call(func, repeat):
+    """Time a function.
+
+    :param func: Callable taking no arguments.
+    :param int repeat: Number of times to call it.
+    :return list: Wall clock seconds taken by each call.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def result(stage, timings, ops, **params):
+    """Summarise the timings of a stage.
+
+    :param str stage: Name of the stage.
+    :param list timings: Seconds taken by each repeat.
+    :param int ops: Operations performed by each repeat.
+    :param params: Parameters of the run to record.
+    :return dict: The result record.
+    """
+    best = min(timings)
+    return dict(params, stage=stage, ops=ops, best=best,
+                mean=statistics.mean(timings), per_op=best / ops)
+
+
+def run_size(num_products, num_promotions, num_baskets, basket_size, skew,
+             repeat, rng):
+    """Benchmark every stage against one catalogue size.
+
+    Baskets are filled through `basket.Basket.add` and priced with
+    `basket.Basket.calculate_discounts`, each timed separately.
+
+    :return list: Result records, see `result`.
+    """
+    products_def = generate.generate_products(num_products, rng)
+    names = [p['name'] for p in products_def]
+    promotions_def = generate.generate_promotions(num_promotions, names, rng)
+    baskets = generate.generate_baskets(names, num_baskets, basket_size,
+                                        skew, rng)
+    params = {'products': num_products, 'promotions': num_promotions,
+              'baskets': num_baskets, 'basket_size': basket_size,
+              'skew': skew}
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        products_file_path, promotions_file_path = generate.write_catalogue(
+            directory, products_def, promotions_def)
+
+        results.append(result('load_products', time_call(
+            lambda: cli.load_products(products_file_path), repeat),
+            1, **params))
+        results.append(result('load_promotions', time_call(
+            lambda: cli.load_promotions(promotions_file_path), repeat),
+            1, **params))
+
+        products = cli.load_products(products_file_path)
+        promotions = cli.load_promotions(promotions_file_path)
+        filled = []
+
+        def fill():
+            filled.clear()
+            for items in baskets:
+                b = basket.Basket(products, promotions)
+                for item in items:
+                    b.add(item)
+                filled.append(b)
+
+        def calculate():
+            for b in filled:
+                b.calculate_discounts()
+
+        add_timings = []
+        calculate_timings = []
+        for _ in range(repeat):
+            add_timings.extend(time_call(fill, 1))
+            calculate_timings.extend(time_call(calculate, 1))
+        results.append(result('basket_add', add_timings,
+                              num_baskets * basket_size, **params))
+        results.append(result('calculate_discounts', calculate_timings,
+                              num_baskets, **params))
+
+        argv = ['--products', products_file_path,
+                '--promotions', promotions_file_path] + baskets[0]
+
+        def run_main():
+            with contextlib.redirect_stdout(io.StringIO()):
+                cli.main(argv)
+
+        results.append(result('main', time_call(run_main, repeat), 1,
+                              **params))
+    return results
+
+
+def run_batch(num_products, num_promotions, num_baskets, basket_sizes,
+              skew, repeat, rng):
+    """Compare batch pricing with pricing one basket at a time.
+
+    The loop fills a `basket.Basket` sharing the catalogue's promotion
+    index for each basket, calculates its discounts and takes its total;
+    `batch.price_baskets` prices the same baskets in one call.
+
+    :param list basket_sizes: Items per basket of each comparison.
+    :return list: Result records, see `result`, the ``price_baskets`` ones
+      with the ``speedup`` over the loop.
+    """
+    products_def = generate.generate_products(num_products, rng)
+    names = [p['name'] for p in products_def]
+    promotions_def = generate.generate_promotions(num_promotions, names, rng)
+    cat = catalogue.Catalogue(loader.build_products(products_def),
+                              loader.build_promotions(promotions_def))
+    results = []
+    for basket_size in basket_sizes:
+        baskets = generate.generate_baskets(names, num_baskets, basket_size,
+                                            skew, rng)
+        params = {'products': num_products, 'promotions': num_promotions,
+                  'baskets': num_baskets, 'basket_size': basket_size,
+                  'skew': skew}
+
+        def loop():
+            for items in baskets:
+                b = cat.basket()
+                for item in items:
+                    b.add(item)
+                b.calculate_discounts()
+                b.total
+
+        loop_result = result('basket_loop', time_call(loop, repeat),
+                             num_baskets, **params)
+        batch_result = result('price_baskets', time_call(
+            lambda: batch.price_baskets(baskets, cat.products, cat.index),
+            repeat), num_baskets, **params)
+        batch_result['speedup'] = loop_result['best'] / batch_result['best']
+        results.extend([loop_result, batch_result])
+    return results
+
+
+def run(sizes, num_baskets=100, basket_size=50, skew=1.0, repeat=3,
+        seed=0, batch_sizes=DEFAULT_BATCH_SIZES, batch_baskets=20000):
+    """Run the benchmark suite.
+
+    :param list sizes: ``(products, promotions)`` catalogue sizes.
+    :param list batch_sizes: Items per basket to compare batch pricing
+      at, see `run_batch`.
+    :param int batch_baskets: Baskets priced by each comparison.
+    :return dict: Details of the environment and the result records.
+    """
+    rng = random.Random(seed)
+    results = []
+    for num_products, num_promotions in sizes:
+        results.extend(run_size(num_products, num_promotions, num_baskets,
+                                basket_size, skew, repeat, rng))
+    if batch_sizes:
+        results.extend(run_batch(5, 3, batch_baskets, batch_sizes, 0.0,
+                                 repeat, rng))
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'seed': seed,
+            'results': results}
+
+
+def parse_size(size):
+    """Parse a ``PRODUCTS:PROMOTIONS`` catalogue size."""
+    num_products, _, num_promotions = size.partition(':')
+    return int(num_products), int(num_promotions or num_products)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.pricing')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        metavar='PRODUCTS:PROMOTIONS')
+    parser.add_argument('--baskets', type=int, default=100)
+    parser.add_argument('--basket-size', type=int, default=50)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--batch-sizes', type=int, nargs='*',
+                        default=DEFAULT_BATCH_SIZES, metavar='BASKET_SIZE',
+                        help='Items per basket to compare batch pricing '
+                             'with the basket loop at, none to skip it')
+    parser.add_argument('--batch-baskets', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='File to write the results to, '
+                                         'default is stdout')
+    args = parser.parse_args(argv)
+
+    results = run([parse_size(size) for size in args.sizes], args.baskets,
+                  args.basket_size, args.skew, args.repeat, args.seed,
+                  args.batch_sizes, args.batch_baskets)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,98 @@
+"""Sharded pricing benchmark.
+
+Prices one very large basket, such as a wholesale order, in a single
+process and with `basket.shard.ShardedPricer` on pools of increasing
+size::
+
+    python -m benchmarks.sharding --products 50000 --basket-size 300000
+
+The parallel part is the pricing of the shards; reducing the basket to
+quantities and splitting it into product groups stays in this process, so
+the gain depends on how many distinct products the basket holds.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+
+from basket import catalogue
+from basket import loader
+from basket import shard
+from benchmarks import generate
+from benchmarks import pricing
+
+
+def run(num_products=50000, num_promotions=25000, basket_size=300000,
+        skew=0.5, workers=None, repeat=3, seed=0, optimal=False):
+    """Run the sharding benchmark.
+
+    :param list workers: Pool sizes to time, defaults to 2 and the number
+      of CPUs.
+    :return dict: Details of the environment and the result records.
+    """
+    rng = random.Random(seed)
+    products_def = generate.generate_products(num_products, rng)
+    names = [p['name'] for p in products_def]
+    promotions_def = generate.generate_promotions(num_promotions, names, rng)
+    cat = catalogue.Catalogue(loader.build_products(products_def),
+                              loader.build_promotions(promotions_def),
+                              optimal)
+    items = generate.generate_baskets(names, 1, basket_size, skew, rng)[0]
+    quantities = {name.lower(): None for name in items}
+    groups = cat.index.product_groups(quantities)
+    params = {'products': num_products, 'promotions': num_promotions,
+              'basket_size': basket_size, 'optimal': optimal}
+
+    results = []
+    expected = None
+    for pool_size in [1] + (workers or sorted({2, os.cpu_count() or 1})):
+        with shard.ShardedPricer(cat, pool_size, threshold=0) as pricer:
+            # Start the pool before timing.
+            record = pricer.price(items)
+            timings = pricing.time_call(lambda: pricer.price(items), repeat)
+        if expected is None:
+            expected = record
+        elif record != expected:
+            raise AssertionError(f'{pool_size} workers priced differently')
+        results.append(pricing.result(f'workers_{pool_size}', timings, 1,
+                                      workers=pool_size, **params))
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'seed': seed,
+            'lines': len(quantities),
+            'groups': len(groups),
+            'largest_group': max(map(len, groups), default=0),
+            'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.sharding')
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--promotions', type=int, default=25000)
+    parser.add_argument('--basket-size', type=int, default=300000)
+    parser.add_argument('--skew', type=float, default=0.5)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        help='Pool sizes to time, default 2 and the number '
+                             'of CPUs')
+    parser.add_argument('--optimal', action='store_true')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='File to write the results to, '
+                                         'default is stdout')
+    args = parser.parse_args(argv)
+
+    results = run(args.products, args.promotions, args.basket_size,
+                  args.skew, args.workers, args.repeat, args.seed,
+                  args.optimal)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,170 @@
+"""Start up benchmark.
+
+Measures what ``python -m basket`` spends before pricing anything: the
+imports of `basket.__main__`, from ``python -X importtime``, and the wall
+time of pricing a single basket compared with that of starting the
+interpreter alone::
+
+    python -m benchmarks.startup --repeat 10
+
+Importing `basket.__main__` should stay within `IMPORT_BUDGET`; with
+``--check`` the benchmark exits with an error if it does not.  That budget
+depends on the machine, so the tests check `RELATIVE_BUDGET` instead,
+which scales with the time the interpreter takes to start, and that none
+of `HEAVY_MODULES` is imported.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import pricing
+
+# Most microseconds importing basket.__main__ may take.
+IMPORT_BUDGET = 100000
+
+# Most time importing basket.__main__ may add to starting the interpreter,
+# as a multiple of the time starting it takes (see import_overhead).
+RELATIVE_BUDGET = 3
+
+# Modules that a single basket run must not import.
+HEAVY_MODULES = ('argparse', 'asyncio', 'multiprocessing', 'numpy',
+                 'threading')
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _python(*args, **kwargs):
+    env = dict(os.environ, PYTHONPATH=_ROOT)
+    return subprocess.run([sys.executable, *args], env=env,
+                          capture_output=True, text=True, check=True,
+                          **kwargs)
+
+
+def import_times(module='basket.__main__'):
+    """Time the import of a module in a fresh interpreter.
+
+    :param str module: Name of the module.
+    :return dict: ``(self, cumulative)`` microseconds spent importing each
+      module imported with it, keyed by module name.
+    """
+    stderr = _python('-X', 'importtime', '-c', f'import {module}').stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def time_run(args, repeat, cwd=None):
+    """Time a command run in a fresh interpreter.
+
+    :param list args: Arguments to the interpreter.
+    :param int repeat: Number of runs.
+    :param str cwd: Directory to run in.
+    :return list: Seconds taken by each run.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _python(*args, cwd=cwd)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def import_overhead(repeat=5, module='basket.__main__'):
+    """Time the import of a module relative to starting the interpreter.
+
+    Runs of a bare ``python -c pass`` and of the import alternate, and the
+    fastest of each is taken, so that the load on the machine affects both
+    alike.
+
+    :param int repeat: Number of runs of each.
+    :param str module: Name of the module.
+    :return float: Time the import adds to starting the interpreter, as a
+      multiple of the time starting it takes.
+    """
+    bare = []
+    full = []
+    for _ in range(repeat):
+        bare.extend(time_run(['-c', 'pass'], 1))
+        full.extend(time_run(['-c', f'import {module}'], 1))
+    return (min(full) - min(bare)) / min(bare)
+
+
+def run(repeat=5, top=10):
+    """Run the start up benchmark.
+
+    :param int repeat: Number of runs of each command.
+    :param int top: Number of the slowest imports to list.
+    :return dict: Details of the environment, the import time of
+      `basket.__main__`, its slowest imports and the result records.
+    """
+    times = import_times()
+    overhead = import_overhead(repeat)
+    slowest = sorted(times.items(), key=lambda item: -item[1][0])[:top]
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'products.json'), 'w') as f:
+            json.dump([{'name': 'Soup', 'price': 65, 'unit': 'Tin'}], f)
+        with open(os.path.join(directory, 'promotions.json'), 'w') as f:
+            json.dump([], f)
+        results = [
+            pricing.result('interpreter',
+                           time_run(['-c', 'pass'], repeat), 1),
+            pricing.result('single_basket',
+                           time_run(['-m', 'basket', 'soup'], repeat,
+                                    directory), 1),
+        ]
+    return {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'import_us': times['basket.__main__'][1],
+            'import_budget_us': IMPORT_BUDGET,
+            'within_budget': times['basket.__main__'][1] < IMPORT_BUDGET,
+            'import_overhead': overhead,
+            'relative_budget': RELATIVE_BUDGET,
+            'within_relative_budget': overhead < RELATIVE_BUDGET,
+            'heavy_modules': [name for name in HEAVY_MODULES
+                              if name in times],
+            'slowest_imports': [{'module': name, 'self_us': own,
+                                 'cumulative_us': cumulative}
+                                for name, (own, cumulative) in slowest],
+            'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.startup')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with an error if importing '
+                             'basket.__main__ takes longer than either '
+                             'budget')
+    parser.add_argument('--output', help='File to write the results to, '
+                                         'default is stdout')
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.top)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.check and not results['within_budget']:
+        sys.exit(f'Importing basket.__main__ took {results["import_us"]}us, '
+                 f'over the budget of {IMPORT_BUDGET}us')
+    if args.check and not results['within_relative_budget']:
+        sys.exit(f'Importing basket.__main__ took '
+                 f'{results["import_overhead"]:.2f} times as long as '
+                 f'starting the interpreter, over the budget of '
+                 f'{RELATIVE_BUDGET}')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,126 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+import basket.aio as aio
+import basket.catalogue as catalogue
+import basket.product as product
+import basket.promotion as promotion
+
+
+class SlowCatalogue(catalogue.Catalogue):
+    """Catalogue whose baskets take a millisecond to add each item."""
+
+    added = 0
+
+    def basket(self, compact=False):
+        shopping_basket = super().basket(compact)
+        add = shopping_basket.add
+
+        def slow_add(item):
+            time.sleep(0.001)
+            self.added += 1
+            return add(item)
+        shopping_basket.add = slow_add
+        return shopping_basket
+
+
+class CountingExecutor(concurrent.futures.ThreadPoolExecutor):
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def make_catalogue(cls=catalogue.Catalogue):
+    return cls(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf')},
+        [promotion.Promotion({'id': 2, 'title': 'Half price loaf',
+                              'qualifying_product': 'soup',
+                              'qualifying_qty': 2,
+                              'discounted_product': 'bread',
+                              'discount_percent': 50})])
+
+
+@pytest.fixture
+def executor():
+    with CountingExecutor(2) as executor:
+        yield executor
+
+
+@pytest.fixture
+def check_interval(monkeypatch):
+    monkeypatch.setattr(aio, 'CHECK_INTERVAL', 10)
+
+
+def test_price_inline(executor):
+    record = asyncio.run(aio.price_basket_async(
+        make_catalogue(), ['soup', 'soup', 'bread', 'pie'], 'b1',
+        executor=executor))
+    assert record == {
+        'basket': 'b1', 'subtotal': 210,
+        'discounts': [{'id': 2, 'title': 'Half price loaf', 'amount': 40}],
+        'total': 170, 'out_of_stock': 1}
+    assert executor.submitted == 0
+
+
+def test_price_on_executor(executor):
+    cat = make_catalogue()
+    items = ['soup', 'soup', 'bread'] * 100
+
+    async def price():
+        return await asyncio.gather(*(
+            aio.price_basket_async(cat, items, i, inline_limit=10,
+                                   executor=executor)
+            for i in range(4)))
+    records = asyncio.run(price())
+    assert executor.submitted == 4
+    assert [record['basket'] for record in records] == [0, 1, 2, 3]
+    assert all(record == dict(aio.price_items(cat, items), basket=i)
+               for i, record in enumerate(records))
+
+
+def test_price_shared_executor():
+    record = asyncio.run(aio.price_basket_async(
+        make_catalogue(), ['soup'] * 3, inline_limit=1))
+    assert record['total'] == 195
+    assert aio.get_executor() is aio.get_executor()
+    aio.shutdown()
+    assert aio._executor is None
+
+
+def test_price_timeout(executor, check_interval):
+    cat = make_catalogue(SlowCatalogue)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(aio.price_basket_async(cat, ['soup'] * 1000,
+                                           timeout=0.05, inline_limit=10,
+                                           executor=executor))
+    executor.shutdown()
+    assert 0 < cat.added < 1000
+
+
+def test_price_cancelled(executor, check_interval):
+    cat = make_catalogue(SlowCatalogue)
+
+    async def cancel():
+        task = asyncio.ensure_future(aio.price_basket_async(
+            cat, ['soup'] * 1000, inline_limit=10, executor=executor))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await task
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+    executor.shutdown()
+    assert 0 < cat.added < 1000
+
+
+def test_price_items_cancelled():
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(concurrent.futures.CancelledError):
+        aio.price_items(make_catalogue(), ['soup'], cancelled=cancelled)
@@ -94,3 +94,131 @@ def test_add_items_discount(products, promotions):
     assert len(b.discounted_items) == 2
     assert b.discounted_items[0] is b.items[0]
     assert b.discounted_items[1] is b.items[1]
+
+
+def test_compact_basket(products, promotions):
+    b = basket.CompactBasket(products, promotions)
+    assert b.products is products
+    assert b.promotions is promotions
+    assert b.lines == {}
+    assert b.items == []
+
+
+def test_compact_add_item(products, promotions):
+    b = basket.CompactBasket(products, promotions)
+    assert b.add('Apples')
+    assert b.add('apples', 499)
+    assert b.add('pie') is False
+    assert list(b.lines) == ['apples']
+    assert b.lines['apples'].quantity == 500
+    assert b.lines['apples'].product is products['apples']
+    assert b.quantities == {'apples': 500}
+    assert b.subtotal == 50000
+    assert b.total == 50000
+
+
+@pytest.mark.parametrize('quantity', [0, -3])
+def test_compact_bad_quantity(products, promotions, quantity):
+    b = basket.CompactBasket(products, promotions)
+    b.add('apples')
+    with pytest.raises(ValueError):
+        b.add('apples', quantity)
+    with pytest.raises(ValueError):
+        b.remove('apples', quantity)
+    assert b.quantities == {'apples': 1}
+
+
+def test_compact_discount(products, promotions):
+    b = basket.CompactBasket(products, promotions)
+    b.add('apples', 2)
+    b.add('milk')
+    b.calculate_discounts()
+    assert b.subtotal == 330
+    assert b.total == 310
+    assert b.discounted_lines == [b.lines['apples']]
+    assert b.lines['apples'].discount_messages == [('Apples 10% off: -10p', 2)]
+
+
+def test_compact_items(products, promotions):
+    b = basket.CompactBasket(products, promotions)
+    b.add('apples')
+    b.add('milk')
+    b.add('apples')
+    b.calculate_discounts()
+    assert [p.name for p in b.items] == ['apples', 'apples', 'milk']
+    assert len(b.discounted_items) == 2
+    assert b.discounted_items[0] is b.items[0]
+    assert sum(p.discounted_price for p in b.items) == b.total
+    b.add('milk')
+    assert len(b.items) == 4
+
+
+def test_compact_promotion_discounts(products, promotions):
+    b = basket.CompactBasket(products, promotions)
+    b.add('apples', 3)
+    b.calculate_discounts()
+    assert b.promotion_discounts == [(promotions[0], 30)]
+
+
+def test_remove_item(products, promotions):
+    b = basket.Basket(products, promotions)
+    b.add('apples')
+    b.add('milk')
+    b.add('apples')
+    last = b.items[-1]
+    assert b.remove('Apples')
+    assert last not in b.items
+    assert [p.name for p in b.items] == ['apples', 'milk']
+    assert b.remove('bread') is False
+    assert b.subtotal == 230
+
+
+def test_incremental_basket(products, promotions):
+    b = basket.IncrementalBasket(products, promotions)
+    assert b.add('apples')
+    assert b.total == 90
+    assert b.discounted_items == b.items
+    assert b.add('milk')
+    assert b.add('pie') is False
+    assert (b.subtotal, b.total) == (230, 220)
+    assert b.remove('apples')
+    assert (b.subtotal, b.total) == (130, 130)
+    assert not b.discounted_items
+    assert b.remove('apples') is False
+
+
+def test_incremental_recalculate(products, promotions):
+    b = basket.IncrementalBasket(products, promotions)
+    b.add('apples')
+    b.promotions = []
+    b.calculate_discounts()
+    assert b.total == 100
+    assert not b.discounted_items
+
+
+def test_compact_remove_item(products, promotions):
+    b = basket.CompactBasket(products, promotions)
+    b.add('apples', 3)
+    assert b.remove('apples', 2)
+    assert b.lines['apples'].quantity == 1
+    assert b.remove('apples', 2) is False
+    assert b.remove('apples')
+    assert b.lines == {}
+    assert b.remove('milk') is False
+
+
+def test_compact_remove_discounted(products, promotions):
+    b = basket.CompactBasket(products, promotions)
+    expected = basket.Basket(products, promotions)
+    b.add('apples', 3)
+    for _ in range(3):
+        expected.add('apples')
+    b.calculate_discounts()
+    expected.calculate_discounts()
+    assert b.remove('apples', 2)
+    expected.remove('apples')
+    expected.remove('apples')
+    assert b.quantities == {'apples': 1}
+    assert len(b.items) == 1
+    assert b.lines['apples'].segments == [(promotions[0], 1)]
+    assert b.total == expected.total
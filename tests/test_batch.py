@@ -0,0 +1,150 @@
+import random
+
+import pytest
+
+import basket.basket as basket
+import basket.batch as batch
+import basket.engine as engine
+import basket.instrument as instrument
+import basket.product as product
+import basket.promotion as promotion
+
+
+@pytest.fixture
+def products():
+    return {
+      'soup': product.Product('soup', 65, 'tin'),
+      'bread': product.Product('bread', 80, 'loaf'),
+      'milk': product.Product('milk', 130, 'bottle'),
+      'apples': product.Product('apples', 100, 'bag'), }
+
+
+@pytest.fixture
+def promotions():
+    return [
+        promotion.Promotion({'id': 1, 'title': 'Apples 10% off',
+                             'qualifying_product': 'apples',
+                             'qualifying_qty': 1,
+                             'discounted_product': 'apples',
+                             'discount_percent': 10}),
+        promotion.Promotion({'id': 2,
+                             'title': '2 tins soup get you a half price loaf',
+                             'qualifying_product': 'soup',
+                             'qualifying_qty': 2,
+                             'discounted_product': 'bread',
+                             'discount_percent': 50})]
+
+
+def test_basket_quantities(products):
+    lookup = {}
+    quantities = batch.basket_quantities(
+        ['Apples', 'apples', 'pie', 'soup'], products, lookup)
+    assert quantities == {'apples': 2, 'soup': 1}
+    assert lookup == {'Apples': 'apples', 'apples': 'apples', 'pie': None,
+                      'soup': 'soup'}
+
+
+def test_price_baskets(products, promotions):
+    result = batch.price_baskets(
+        [['apples', 'milk'],
+         ['milk', 'soup', 'eggs'],
+         ['milk', 'soup', 'soup', 'bread', 'apples'],
+         []],
+        products, promotions)
+    assert len(result) == 4
+    assert result.subtotals == [230, 195, 440, 0]
+    assert result.discounts == [10, 0, 50, 0]
+    assert result.totals == [220, 195, 390, 0]
+    assert list(result.rows())[2] == (440, 50, 390)
+
+
+def test_price_baskets_index(products, promotions):
+    index = engine.PromotionIndex(promotions)
+    result = batch.price_baskets([['apples']], products, index)
+    assert result.totals == [90]
+
+
+def test_price_baskets_generator(products, promotions):
+    baskets = (['apples'] * n for n in range(3))
+    result = batch.price_baskets(baskets, products, promotions)
+    assert result.totals == [0, 90, 180]
+
+
+def test_matches_basket(products, promotions):
+    rng = random.Random(0)
+    names = list(products) + ['Soup', 'eggs']
+    baskets = [[rng.choice(names) for _ in range(rng.randint(0, 20))]
+               for _ in range(200)]
+    result = batch.price_baskets(baskets, products, promotions)
+    for items, (subtotal, discount, total) in zip(baskets, result.rows()):
+        b = basket.Basket(products, promotions)
+        for item in items:
+            b.add(item)
+        b.calculate_discounts()
+        assert (subtotal, total) == (b.subtotal, b.total)
+        assert discount == subtotal - total
+
+
+@pytest.mark.parametrize('instrumented', [False, True])
+@pytest.mark.parametrize('optimal', [False, True])
+def test_matches_allocate(products, promotions, instrumented, optimal):
+    promotions.append(promotion.Promotion({
+        'id': 3, 'title': 'Bread 20% off', 'qualifying_product': 'bread',
+        'qualifying_qty': 1, 'discounted_product': 'bread',
+        'discount_percent': 20}))
+    if optimal:
+        index = engine.OptimalPromotionIndex(promotions, products)
+    else:
+        index = engine.PromotionIndex(promotions)
+    rng = random.Random(0)
+    baskets = [[rng.choice(list(products)) for _ in range(rng.randint(0, 9))]
+               for _ in range(100)]
+    expected = []
+    for items in baskets:
+        b = basket.CompactBasket(products, promotions, index)
+        for item in items:
+            b.add(item)
+        b.calculate_discounts()
+        expected.append(b.total)
+    recorder = instrument.enable() if instrumented else None
+    try:
+        result = batch.price_baskets(baskets, products, index)
+    finally:
+        instrument.disable()
+    assert result.totals == expected
+    if instrumented:
+        assert recorder.promotions
+
+
+def test_price_baskets_no_numpy(products, promotions, monkeypatch):
+    monkeypatch.setattr(batch.vectorised, 'numpy', None)
+    result = batch.price_baskets([['apples', 'milk']], products, promotions,
+                                 backend=batch.NUMPY)
+    assert result.totals == [220]
+
+
+def test_price_baskets_bad_backend(products, promotions):
+    with pytest.raises(ValueError) as e:
+        batch.price_baskets([], products, promotions, backend='fortran')
+    assert 'Unknown pricing backend: fortran' in str(e)
+
+
+@pytest.mark.parametrize('rounding', ['line-floor', 'line-half-even',
+                                      'unit-half-even'])
+def test_price_baskets_rounding(products, promotions, rounding):
+    pytest.importorskip('numpy')
+    for p in promotions:
+        p.discount_percent = 12.5
+        p.rounding = rounding
+    baskets = [['apples'] * n + ['soup'] * 2 + ['bread'] * n
+               for n in range(1, 8)]
+    expected = []
+    for items in baskets:
+        b = basket.CompactBasket(products, promotions)
+        for item in items:
+            b.add(item)
+        b.calculate_discounts()
+        expected.append(b.subtotal - b.total)
+    for backend in (batch.PYTHON, batch.NUMPY):
+        result = batch.price_baskets(baskets, products, promotions, backend)
+        assert result.discounts == expected
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+import basket.bulk as bulk
+
+
+@pytest.fixture
+def products_json_file(tmpdir):
+    tmpfile = tmpdir.join('products.json')
+    tmpfile.write('''[
+    {"name": "Soup", "price": 65, "unit": "Tin"},
+    {"name": "Bread", "price": 80, "unit": "Loaf"},
+    {"name": "Apples", "price": 100, "unit": "Bag"}]''')
+    return str(tmpfile)
+
+
+@pytest.fixture
+def promo_json_file(tmpdir):
+    tmpfile = tmpdir.join('promo.json')
+    tmpfile.write('''[
+    {"id": 2, "title": "2 tins soup get you a half price loaf",
+     "qualifying_product": "Soup", "qualifying_qty": 2,
+     "discounted_product": "Bread", "discount_percent": 50}]''')
+    return str(tmpfile)
+
+
+@pytest.mark.parametrize('fmt, data', [
+    (bulk.LINES, 'apples soup\n\n  bread \n'),
+    (bulk.JSONL, '["apples", "soup"]\n\n{"items": ["bread"]}\n'),
+    (bulk.CSV, 'apples, soup\n\nbread,\n'),
+])
+def test_read_baskets(fmt, data):
+    baskets = list(bulk.read_baskets(io.StringIO(data), fmt))
+    assert baskets == [['apples', 'soup'], ['bread']]
+
+
+def test_read_baskets_bad_json():
+    with pytest.raises(ValueError) as e:
+        list(bulk.read_baskets(io.StringIO('["soup"]\n[soup\n'), bulk.JSONL))
+    assert 'Invalid basket on line 2' in str(e)
+
+
+@pytest.mark.parametrize('data', ['[1, 2]', '"soup"', '{"items": "soup"}',
+                                  '{"items": [["soup"]]}'])
+def test_read_baskets_not_items(data):
+    with pytest.raises(ValueError) as e:
+        list(bulk.read_baskets(io.StringIO('["soup"]\n' + data),
+                               bulk.JSONL))
+    assert 'Invalid basket on line 2' in str(e)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_price_all(products_json_file, promo_json_file, workers):
+    baskets = [['soup', 'soup', 'bread'], ['apples'], ['pie']] * 50
+    receipts = list(bulk.price_all(baskets, products_json_file,
+                                   promo_json_file, workers=workers,
+                                   chunksize=8))
+    assert len(receipts) == 150
+    assert receipts[:3] == [
+        ['Subtotal: £2.10', '2 tins soup get you a half price loaf: -40p',
+         'Total: £1.70'],
+        ['Subtotal: £1.00', '(No offers available)', 'Total: £1.00'],
+        ['Subtotal: £0.00', '(No offers available)', 'Total: £0.00']]
+    assert receipts[3:6] == receipts[:3]
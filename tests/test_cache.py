@@ -0,0 +1,146 @@
+import threading
+
+import pytest
+
+import basket.cache as cache
+import basket.catalogue as catalogue
+import basket.pipeline as pipeline
+import basket.product as product
+import basket.promotion as promotion
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cat():
+    return catalogue.Catalogue(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf'),
+         'apples': product.Product('apples', 100, 'bag')},
+        [promotion.Promotion({'id': 1, 'title': 'Apples 10% off',
+                              'qualifying_product': 'apples',
+                              'qualifying_qty': 1,
+                              'discounted_product': 'apples',
+                              'discount_percent': 10}),
+         promotion.Promotion({'id': 2, 'title': 'Half price loaf',
+                              'qualifying_product': 'soup',
+                              'qualifying_qty': 2,
+                              'discounted_product': 'bread',
+                              'discount_percent': 50})])
+
+
+def test_fingerprint():
+    assert cache.fingerprint({'soup': 2, 'bread': 1}) == \
+        cache.fingerprint({'bread': 1, 'soup': 2}) == \
+        (('bread', 1), ('soup', 2))
+    assert cache.fingerprint({'soup': 2, 'bread': 0}) == (('soup', 2),)
+
+
+def test_price_contents(cat):
+    shopping_basket = cat.basket(compact=True)
+    for item in ['soup', 'soup', 'bread', 'apples']:
+        shopping_basket.add(item)
+    record = pipeline.basket_record(None, shopping_basket)
+    pricing = cache.price_contents(cat, [('apples', 1), ('bread', 1),
+                                         ('soup', 2)])
+    assert (pricing['subtotal'], pricing['total']) == (
+        record['subtotal'], record['total'])
+    # Discounts are listed in product order rather than scanning order
+    assert pricing['discounts'] == record['discounts'][::-1]
+
+
+def test_price(cat):
+    pricing_cache = cache.PricingCache()
+    first = pricing_cache.price(cat, {'soup': 2, 'bread': 1})
+    again = pricing_cache.price(cat, {'bread': 1, 'soup': 2})
+    assert again is first
+    assert first['total'] == 170
+    assert pricing_cache.price(cat, {'soup': 1, 'bread': 1})['total'] == 145
+    stats = pricing_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 2, 2)
+    assert stats['hit_rate'] == pytest.approx(1 / 3)
+
+
+def test_lru():
+    pricing_cache = cache.PricingCache(maxsize=2)
+    pricing_cache.put('a', 1)
+    pricing_cache.put('b', 2)
+    assert pricing_cache.get('a') == 1
+    pricing_cache.put('c', 3)
+    assert pricing_cache.get('b') is None
+    assert pricing_cache.get('a') == 1
+    assert pricing_cache.get('c') == 3
+    assert pricing_cache.evictions == 1
+    assert len(pricing_cache) == 2
+
+
+def test_ttl():
+    clock = Clock()
+    pricing_cache = cache.PricingCache(ttl=10, clock=clock)
+    pricing_cache.put('a', 1)
+    clock.now = 9.9
+    assert pricing_cache.get('a') == 1
+    clock.now = 10
+    assert pricing_cache.get('a') is None
+    assert pricing_cache.expirations == 1
+    assert len(pricing_cache) == 0
+
+
+def test_bad_size():
+    with pytest.raises(ValueError):
+        cache.PricingCache(maxsize=0)
+
+
+def test_new_catalogue(cat):
+    pricing_cache = cache.PricingCache()
+    assert pricing_cache.price(cat, {'soup': 2, 'bread': 1})['total'] == 170
+    cheaper = catalogue.Catalogue(cat.products, [])
+    assert cheaper.version != cat.version
+    assert pricing_cache.price(cheaper, {'soup': 2, 'bread': 1})['total'] \
+        == 210
+    assert pricing_cache.invalidations == 1
+    assert pricing_cache.stats()['size'] == 1
+
+
+def test_reload_in_flight(cat, monkeypatch):
+    pricing_cache = cache.PricingCache()
+    reloaded = catalogue.Catalogue(cat.products, [])
+    started = threading.Event()
+    release = threading.Event()
+    price_contents = cache.price_contents
+
+    def slow_price_contents(priced_cat, contents):
+        if priced_cat is cat:
+            started.set()
+            release.wait(5)
+        return price_contents(priced_cat, contents)
+
+    monkeypatch.setattr(cache, 'price_contents', slow_price_contents)
+    results = []
+    in_flight = threading.Thread(target=lambda: results.append(
+        pricing_cache.price(cat, {'soup': 2, 'bread': 1})))
+    in_flight.start()
+    assert started.wait(5)
+    assert pricing_cache.price(reloaded, {'soup': 2, 'bread': 1})[
+        'total'] == 210
+    release.set()
+    in_flight.join(5)
+    assert results[0]['total'] == 170
+    assert pricing_cache.price(reloaded, {'soup': 2, 'bread': 1})[
+        'total'] == 210
+    assert pricing_cache.hits == 1
+    assert pricing_cache.stats()['size'] == 1
+
+
+def test_touch(cat):
+    pricing_cache = cache.PricingCache()
+    assert pricing_cache.price(cat, {'apples': 1})['total'] == 90
+    cat.promotions[0].discount_percent = 20
+    assert pricing_cache.price(cat, {'apples': 1})['total'] == 90
+    cat.touch()
+    assert pricing_cache.price(cat, {'apples': 1})['total'] == 80
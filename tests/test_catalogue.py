@@ -0,0 +1,84 @@
+import pytest
+
+import basket.basket as basket
+import basket.catalogue as catalogue
+import basket.engine as engine
+import basket.product as product
+import basket.promotion as promotion
+
+
+@pytest.fixture
+def cat():
+    return catalogue.Catalogue(
+        {'apples': product.Product('apples', 100, 'bag')},
+        [promotion.Promotion({'id': 1, 'title': 'Apples 10% off',
+                              'qualifying_product': 'apples',
+                              'qualifying_qty': 1,
+                              'discounted_product': 'apples',
+                              'discount_percent': 10})])
+
+
+def test_catalogue(cat):
+    assert cat.index.promotions is cat.promotions
+    assert cat.index.by_discounted['apples'] == cat.promotions
+
+
+@pytest.mark.parametrize('compact, cls', [
+    (False, basket.Basket), (True, basket.CompactBasket)])
+def test_basket(cat, compact, cls):
+    b = cat.basket(compact)
+    assert type(b) is cls
+    assert b.products is cat.products
+    assert b.promotions is cat.promotions
+    assert b.promotion_index is cat.index
+    b.add('apples')
+    b.calculate_discounts()
+    assert b.total == 90
+
+
+def test_load():
+    cat = catalogue.Catalogue.load('products.json', 'promotions.json')
+    assert 'soup' in cat.products
+    assert len(cat.promotions) == 3
+
+
+def test_prime(cat):
+    assert cat.promotions[0]._discounts == {100: (10, 'Apples 10% off: -10p')}
+    cat.products['apples'].price = 200
+    cat.prime()
+    assert 200 in cat.promotions[0]._discounts
+
+
+def test_optimal(cat):
+    optimal = catalogue.Catalogue(cat.products, cat.promotions, optimal=True)
+    assert type(optimal.index) is engine.OptimalPromotionIndex
+    assert optimal.index.products is cat.products
+    assert type(cat.index) is engine.PromotionIndex
+
+
+@pytest.mark.parametrize('rounding, total', [
+    ('unit-floor', 40), ('unit-half-even', 35), ('line-floor', 38),
+    ('line-half-even', 37)])
+def test_rounding(rounding, total):
+    cat = catalogue.Catalogue(
+        {'gum': product.Product('gum', 15, 'pack')},
+        [promotion.Promotion({'id': 1, 'title': 'Gum half price',
+                              'qualifying_product': 'gum',
+                              'qualifying_qty': 1,
+                              'discounted_product': 'gum',
+                              'discount_percent': 50})],
+        rounding=rounding)
+    assert cat.promotions[0].rounding == rounding
+    baskets = [cat.basket(), cat.basket(compact=True),
+               basket.IncrementalBasket(cat.products, cat.promotions,
+                                        cat.index)]
+    for b in baskets:
+        for _ in range(5):
+            b.add('gum')
+        b.calculate_discounts()
+        assert b.total == total
+
+
+def test_bad_rounding():
+    with pytest.raises(ValueError, match='Unknown rounding policy'):
+        catalogue.Catalogue({}, [], rounding='ceiling')
@@ -0,0 +1,129 @@
+import pytest
+
+import basket.batch as batch
+import basket.catalogue as catalogue
+import basket.compiled as compiled
+import basket.product as product
+import basket.promotion as promotion
+
+
+@pytest.fixture
+def cat():
+    return catalogue.Catalogue(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf'),
+         'milk': product.Product('milk', 130, 'bottle'),
+         'apples': product.Product('apples', 100, 'bag'),
+         'crème': product.Product('crème', 250, 'pot')},
+        [promotion.Promotion({'id': 1, 'title': 'Apples 10% off',
+                              'qualifying_product': 'apples',
+                              'qualifying_qty': 1,
+                              'discounted_product': 'apples',
+                              'discount_percent': 10}),
+         promotion.Promotion({'id': 'two',
+                              'title': '2 tins soup get you a half price loaf',
+                              'qualifying_product': 'soup',
+                              'qualifying_qty': 2,
+                              'discounted_product': 'bread',
+                              'discount_percent': 50}),
+         promotion.Promotion({'id': 3, 'title': 'Apples 25% off',
+                              'qualifying_product': 'milk',
+                              'qualifying_qty': 1,
+                              'discounted_product': 'apples',
+                              'discount_percent': 25})])
+
+
+@pytest.fixture
+def mapped(cat, tmpdir):
+    path = str(tmpdir.join('catalogue.bin'))
+    compiled.compile_catalogue(cat, path)
+    return compiled.MappedCatalogue(path)
+
+
+def test_products(cat, mapped):
+    assert len(mapped.products) == len(cat.products)
+    assert sorted(mapped.products) == sorted(cat.products)
+    for name, prod in cat.products.items():
+        assert name in mapped.products
+        found = mapped.products[name]
+        assert (found.name, found.price, found.unit) == (
+            prod.name, prod.price, prod.unit)
+    assert mapped.products['soup'] is mapped.products['soup']
+
+
+def test_products_missing(mapped):
+    assert 'pie' not in mapped.products
+    assert 'zzz' not in mapped.products
+    assert mapped.products.get('pie') is None
+    with pytest.raises(KeyError):
+        mapped.products['pie']
+
+
+def test_promotions(cat, mapped):
+    assert len(mapped.promotions) == len(cat.promotions)
+    for promo, found in zip(cat.promotions, mapped.promotions):
+        assert (found.promo_id, found.title, found.qualifying_product,
+                found.qualifying_qty, found.discounted_product,
+                found.discount_percent) == (
+            promo.promo_id, promo.title, promo.qualifying_product,
+            promo.qualifying_qty, promo.discounted_product,
+            promo.discount_percent)
+    assert mapped.promotions[-1] is mapped.promotions[2]
+    with pytest.raises(IndexError):
+        mapped.promotions[3]
+
+
+def test_index(cat, mapped):
+    def ids(promos):
+        return [promo.promo_id for promo in promos]
+
+    for by_name in ('by_discounted', 'by_qualifying'):
+        expected = getattr(cat.index, by_name)
+        groups = getattr(mapped.index, by_name)
+        assert sorted(groups) == sorted(expected)
+        for name in expected:
+            assert ids(groups[name]) == ids(expected[name])
+    assert 'crème' not in mapped.index.by_discounted
+    assert (mapped.index.affected_products('milk')
+            == cat.index.affected_products('milk'))
+
+
+def test_basket(cat, mapped):
+    items = ['apples', 'apples', 'milk', 'soup', 'soup', 'bread', 'crème']
+    totals = []
+    for c in (cat, mapped):
+        for compact in (False, True):
+            b = c.basket(compact)
+            for item in items:
+                assert b.add(item)
+            b.calculate_discounts()
+            totals.append((b.subtotal, b.total))
+    assert totals == [totals[0]] * 4
+
+
+def test_batch(cat, mapped):
+    baskets = [['apples', 'milk'], ['soup', 'soup', 'bread'], ['pie']]
+    expected = batch.price_baskets(baskets, cat.products, cat.index)
+    result = batch.price_baskets(baskets, mapped.products, mapped.index)
+    assert list(result.rows()) == list(expected.rows())
+
+
+def test_bad_file(tmpdir):
+    path = tmpdir.join('catalogue.bin')
+    path.write('not a catalogue' * 10)
+    with pytest.raises(ValueError):
+        compiled.MappedCatalogue(str(path))
+    path.write('short')
+    with pytest.raises(ValueError):
+        compiled.MappedCatalogue(str(path))
+
+
+def test_rounding(cat, tmpdir):
+    cat.promotions[1].discount_percent = 12.34
+    path = str(tmpdir.join('catalogue.bin'))
+    compiled.compile_catalogue(cat, path)
+    mapped = compiled.MappedCatalogue(path, rounding='line-half-even')
+    assert mapped.promotions[1].discount_bp == 1234
+    assert mapped.promotions[1].rounding == 'line-half-even'
+    with pytest.raises(ValueError):
+        compiled.MappedCatalogue(path, rounding='ceiling')
@@ -0,0 +1,268 @@
+import copy
+import random
+
+import pytest
+
+import basket.basket as basket
+import basket.engine as engine
+import basket.product as product
+import basket.promotion as promotion
+
+
+NAMES = ['soup', 'bread', 'milk', 'apples', 'soap', 'eggs']
+
+
+def reference_discounts(items, promotions):
+    """The original O(promotions x items) discount algorithm."""
+    for p in items:
+        p.clear_promotion()
+    for promo in promotions:
+        qualifying = [p for p in items if p.name == promo.qualifying_product]
+        num_discounts = len(qualifying) // promo.qualifying_qty
+        if not num_discounts:
+            continue
+        for prod in [p for p in items if p.name == promo.discounted_product]:
+            prod.apply_promotion(promo)
+            num_discounts -= 1
+            if not num_discounts:
+                break
+
+
+def random_products(rng):
+    return {name: product.Product(name, rng.randint(1, 500), 'unit')
+            for name in NAMES[:-1]}
+
+
+def random_promotions(rng, count):
+    return [promotion.Promotion({
+        'id': i,
+        'title': f'Promotion {i}',
+        'qualifying_product': rng.choice(NAMES),
+        'qualifying_qty': rng.randint(1, 4),
+        'discounted_product': rng.choice(NAMES),
+        'discount_percent': rng.randint(1, 100)}) for i in range(count)]
+
+
+@pytest.fixture
+def promotions():
+    return [
+        promotion.Promotion({'id': 1, 'title': 'Apples 10% off',
+                             'qualifying_product': 'apples',
+                             'qualifying_qty': 1,
+                             'discounted_product': 'apples',
+                             'discount_percent': 10}),
+        promotion.Promotion({'id': 2, 'title': 'Soup gets you cheap bread',
+                             'qualifying_product': 'soup',
+                             'qualifying_qty': 2,
+                             'discounted_product': 'bread',
+                             'discount_percent': 50}),
+        promotion.Promotion({'id': 3, 'title': 'Bread 30% off',
+                             'qualifying_product': 'bread',
+                             'qualifying_qty': 1,
+                             'discounted_product': 'bread',
+                             'discount_percent': 30})]
+
+
+def test_index(promotions):
+    index = engine.PromotionIndex(promotions)
+    assert index.promotions is promotions
+    assert index.by_qualifying['soup'] == [promotions[1]]
+    assert index.by_discounted['bread'] == promotions[1:]
+    assert 'milk' not in index.by_qualifying
+    assert 'milk' not in index.by_discounted
+
+
+def test_affected_products(promotions):
+    index = engine.PromotionIndex(promotions)
+    assert index.affected_products('soup') == {'soup', 'bread'}
+    assert index.affected_products('milk') == {'milk'}
+
+
+def test_product_groups(promotions):
+    index = engine.PromotionIndex(promotions)
+    assert index.product_groups(['milk', 'bread', 'apples', 'soup']) == [
+        ['milk'], ['bread', 'soup'], ['apples']]
+    assert index.product_groups(['bread', 'milk']) == [['bread'], ['milk']]
+    assert index.product_groups([]) == []
+
+
+def test_allocate(promotions):
+    index = engine.PromotionIndex(promotions)
+    quantities = {'soup': 4, 'bread': 3}
+    # Bread 30% off is applied last and covers every loaf
+    assert index.allocate('bread', quantities) == [(promotions[2], 3)]
+    assert index.allocate('soup', quantities) == []
+    assert index.allocate('apples', quantities) == []
+
+
+def test_allocate_override(promotions):
+    index = engine.PromotionIndex(promotions[:2] + [promotion.Promotion({
+        'id': 4, 'title': 'Two loaves get one cheap',
+        'qualifying_product': 'bread', 'qualifying_qty': 2,
+        'discounted_product': 'bread', 'discount_percent': 20})])
+    quantities = {'soup': 6, 'bread': 4}
+    segments = index.allocate('bread', quantities)
+    assert [(p.promo_id, n) for p, n in segments] == [(4, 2), (2, 1)]
+
+
+def test_allocate_all(promotions):
+    index = engine.PromotionIndex(promotions)
+    allocations = index.allocate_all({'apples': 2, 'soup': 1, 'milk': 1})
+    assert allocations == {'apples': [(promotions[0], 2)]}
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_matches_reference(seed):
+    rng = random.Random(seed)
+    products = random_products(rng)
+    promotions = random_promotions(rng, rng.randint(0, 12))
+    items = [rng.choice(NAMES) for _ in range(rng.randint(0, 40))]
+
+    b = basket.Basket(products, promotions)
+    for item in items:
+        b.add(item)
+    expected = copy.deepcopy(b.items)
+    reference_discounts(expected, copy.deepcopy(promotions))
+    b.calculate_discounts()
+
+    assert ([p._promotion and p._promotion.promo_id for p in b.items]
+            == [p._promotion and p._promotion.promo_id for p in expected])
+    assert b.total == sum(p.discounted_price for p in expected)
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_compact_matches_reference(seed):
+    rng = random.Random(seed)
+    products = random_products(rng)
+    promotions = random_promotions(rng, rng.randint(0, 12))
+    items = [rng.choice(NAMES) for _ in range(rng.randint(0, 40))]
+
+    b = basket.Basket(products, promotions)
+    compact = basket.CompactBasket(products, promotions)
+    for item in items:
+        b.add(item)
+        compact.add(item)
+    reference_discounts(b.items, promotions)
+    compact.calculate_discounts()
+
+    assert compact.subtotal == b.subtotal
+    assert compact.total == b.total
+    assert (sorted(p.discount_message for p in compact.discounted_items)
+            == sorted(p.discount_message for p in b.discounted_items))
+
+
+@pytest.mark.parametrize('qualifying_qty', [0, -1, -3])
+def test_reference_rejects_qualifying_qty(qualifying_qty):
+    # The reference discounts nothing for a qualifying quantity below 1 but
+    # a negative one earns negative discounts; neither is accepted.
+    with pytest.raises(KeyError):
+        promotion.Promotion({'id': 1, 'title': 'Bad',
+                             'qualifying_product': 'soup',
+                             'qualifying_qty': qualifying_qty,
+                             'discounted_product': 'bread',
+                             'discount_percent': 10})
+
+
+def test_recalculate(promotions):
+    products = {'bread': product.Product('bread', 80, 'loaf'),
+                'soup': product.Product('soup', 65, 'tin')}
+    b = basket.Basket(products, promotions)
+    for item in ['bread', 'soup', 'soup']:
+        b.add(item)
+    b.calculate_discounts()
+    assert b.total == 65 + 65 + 56
+    b.promotions = promotions[:2]
+    b.calculate_discounts()
+    assert b.total == 65 + 65 + 40
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_incremental_matches_reference(seed):
+    rng = random.Random(seed)
+    products = random_products(rng)
+    promotions = random_promotions(rng, rng.randint(0, 12))
+    b = basket.IncrementalBasket(products, promotions)
+
+    for _ in range(60):
+        if rng.random() < 0.7:
+            b.add(rng.choice(NAMES))
+        else:
+            b.remove(rng.choice(NAMES))
+        expected = copy.deepcopy(b.items)
+        reference_discounts(expected, copy.deepcopy(promotions))
+        assert ([p._promotion and p._promotion.promo_id for p in b.items]
+                == [p._promotion and p._promotion.promo_id
+                    for p in expected])
+        assert b.subtotal == sum(p.price for p in expected)
+        assert b.total == sum(p.discounted_price for p in expected)
+
+
+def best_discount(products, promotions, quantities):
+    """Largest discount any allocation of promotions to units can give."""
+    total = 0
+    for name, qty in quantities.items():
+        # best[n] is the largest discount on n units from the promotions
+        # seen so far, each discounting at most the units it has earned.
+        best = [0] * (qty + 1)
+        for promo in promotions:
+            if promo.discounted_product != name:
+                continue
+            earned = (quantities.get(promo.qualifying_product, 0)
+                      // promo.qualifying_qty)
+            unit_discount = promo.discount_for(products[name].price)
+            best = [max(best[n - k] + k * unit_discount
+                        for k in range(min(earned, n) + 1))
+                    for n in range(qty + 1)]
+        total += best[qty]
+    return total
+
+
+def test_optimal_allocate(promotions):
+    products = {'bread': product.Product('bread', 80, 'loaf'),
+                'soup': product.Product('soup', 65, 'tin')}
+    index = engine.OptimalPromotionIndex(promotions, products)
+    quantities = {'soup': 4, 'bread': 3}
+    # Half price beats 30% off on the two loaves the soup earns
+    assert index.allocate('bread', quantities) == [
+        (promotions[1], 2), (promotions[2], 1)]
+    assert index.allocate('soup', quantities) == []
+    assert engine.PromotionIndex(promotions).allocate(
+        'bread', quantities) == [(promotions[2], 3)]
+
+
+def test_optimal_ranking(promotions):
+    products = {'bread': product.Product('bread', 80, 'loaf')}
+    index = engine.OptimalPromotionIndex(promotions, products)
+    assert index.ranking('bread') == [(promotions[1], 40), (promotions[2], 24)]
+    assert index.ranking('bread') is index.ranking('bread')
+    products['bread'].price = 100
+    assert index.ranking('bread') == [(promotions[1], 50), (promotions[2], 30)]
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_optimal_is_best(seed):
+    rng = random.Random(seed)
+    products = random_products(rng)
+    promotions = random_promotions(rng, rng.randint(0, 12))
+    items = [rng.choice(NAMES[:-1]) for _ in range(rng.randint(0, 40))]
+
+    in_order = basket.CompactBasket(products, promotions)
+    optimal = basket.CompactBasket(
+        products, promotions,
+        engine.OptimalPromotionIndex(promotions, products))
+    shuffled = promotions[:]
+    rng.shuffle(shuffled)
+    reordered = basket.Basket(
+        products, shuffled, engine.OptimalPromotionIndex(shuffled, products))
+    for item in items:
+        in_order.add(item)
+        optimal.add(item)
+        reordered.add(item)
+    for b in (in_order, optimal, reordered):
+        b.calculate_discounts()
+
+    discount = optimal.subtotal - optimal.total
+    assert discount == best_discount(products, promotions,
+                                     optimal.quantities)
+    assert optimal.total <= in_order.total
+    assert reordered.total == optimal.total
@@ -0,0 +1,150 @@
+import io
+import json
+
+import pytest
+
+import basket.basket as basket
+import basket.catalogue as catalogue
+import basket.engine as engine
+import basket.explain as explain
+import basket.loader as loader
+import basket.pipeline as pipeline
+import basket.product as product
+import basket.promotion as promotion
+import basket.rules as rules
+
+
+@pytest.fixture
+def cat():
+    return catalogue.Catalogue(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf'),
+         'milk': product.Product('milk', 130, 'bottle')},
+        [promotion.Promotion({'id': 2, 'title': 'Half price loaf',
+                              'qualifying_product': 'soup',
+                              'qualifying_qty': 2,
+                              'discounted_product': 'bread',
+                              'discount_percent': 50}),
+         promotion.Promotion({'id': 3, 'title': 'Bread 10% off',
+                              'qualifying_product': 'bread',
+                              'qualifying_qty': 1,
+                              'discounted_product': 'bread',
+                              'discount_percent': 10})])
+
+
+@pytest.fixture
+def trace():
+    trace = explain.enable()
+    yield trace
+    explain.disable()
+
+
+@pytest.fixture
+def rule_cat(cat):
+    return catalogue.Catalogue(cat.products, loader.build_promotions([
+        {'id': 4, 'title': 'Soup 3 for 2', 'type': 'multibuy',
+         'product': 'soup', 'buy': 3, 'pay': 2},
+        {'id': 7, 'title': '£1 off when you spend £5', 'type': 'spend',
+         'threshold': 500, 'discount': 100}]))
+
+
+def fill(shopping_basket, items):
+    for item in items:
+        shopping_basket.add(item)
+    return shopping_basket
+
+
+def test_disabled(cat):
+    allocate = engine.PromotionIndex.allocate
+    evaluate = rules.RuleProgram.evaluate
+    trace = explain.enable()
+    assert engine.PromotionIndex.allocate is not allocate
+    assert rules.RuleProgram.evaluate is not evaluate
+    assert explain.disable() is trace
+    assert engine.PromotionIndex.allocate is allocate
+    assert rules.RuleProgram.evaluate is evaluate
+    assert explain.tracer is None
+    fill(cat.basket(), ['soup', 'soup', 'bread']).calculate_discounts()
+    assert trace.baskets == []
+    explain.begin('b1')
+    assert trace.baskets == []
+
+
+def test_trace(cat, trace):
+    fill(cat.basket(), ['soup', 'soup', 'soup', 'soup', 'bread', 'milk']
+         ).calculate_discounts()
+    explain.disable()
+    assert trace.baskets == [{'basket': None, 'promotions': [
+        {'promotion': 2, 'product': 'bread', 'quantity': 1,
+         'qualifying_count': 4, 'earned': 2, 'applied': 0},
+        {'promotion': 3, 'product': 'bread', 'quantity': 1,
+         'qualifying_count': 1, 'earned': 1, 'applied': 1}]}]
+    assert trace.report() == [
+        'Promotion 2 on bread x1: 4 qualifying counted, 2 earned, 0 applied',
+        'Promotion 3 on bread x1: 1 qualifying counted, 1 earned, 1 applied']
+
+
+def test_trace_latest(cat, trace):
+    shopping_basket = basket.IncrementalBasket(cat.products, cat.promotions,
+                                               cat.index)
+    explain.begin('b1')
+    fill(shopping_basket, ['bread', 'soup', 'soup'])
+    explain.disable()
+    assert [(entry['promotion'], entry['qualifying_count'], entry['applied'])
+            for entry in trace.baskets[0]['promotions']] == [(2, 2, 0),
+                                                             (3, 1, 1)]
+
+
+def test_trace_stream(cat):
+    stream = io.StringIO()
+    explain.enable(explain.Trace(stream))
+    try:
+        events = [('b1', 'soup', 2), ('b1', 'bread', 1), ('b2', 'milk', 1)]
+        records = list(pipeline.price_events(events, cat))
+    finally:
+        trace = explain.disable()
+    assert [record['total'] for record in records] == [202, 130]
+    assert trace.baskets == []
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line['basket'] for line in lines] == ['b1', 'b2']
+    assert [entry['applied'] for entry in lines[0]['promotions']] == [0, 1]
+    assert lines[1]['promotions'] == []
+    assert trace.report() == ['No promotions evaluated']
+
+
+def test_report(cat, trace):
+    explain.begin('b1')
+    explain.begin('b2')
+    fill(cat.basket(compact=True), ['soup', 'soup', 'bread', 'bread']
+         ).calculate_discounts()
+    assert trace.report() == [
+        'Basket b1:', 'No promotions evaluated', 'Basket b2:',
+        'Promotion 2 on bread x2: 2 qualifying counted, 1 earned, 0 applied',
+        'Promotion 3 on bread x2: 2 qualifying counted, 2 earned, 2 applied']
+
+
+def test_trace_rules(rule_cat, trace):
+    shopping_basket = fill(rule_cat.basket(compact=True),
+                           ['soup', 'soup', 'soup', 'milk'])
+    shopping_basket.calculate_discounts()
+    explain.disable()
+    assert shopping_basket.total == 260
+    assert trace.baskets == [{'basket': None, 'promotions': [], 'rules': [
+        {'promotion': 4, 'quantities': {'soup': 3}, 'subtotal': None,
+         'amount': 65},
+        {'promotion': 7, 'quantities': {}, 'subtotal': 325, 'amount': 0}]}]
+    assert trace.report() == ['Promotion 4 on soup x3: -65p',
+                              'Promotion 7 on subtotal 325p: -0p']
+
+
+def test_trace_rules_latest(rule_cat, trace):
+    shopping_basket = basket.IncrementalBasket(
+        rule_cat.products, rule_cat.promotions, rule_cat.index,
+        rule_cat.program)
+    explain.begin('b1')
+    fill(shopping_basket, ['soup', 'soup', 'soup', 'milk', 'milk', 'milk'])
+    explain.disable()
+    assert trace.baskets[0]['rules'] == [
+        {'promotion': 4, 'quantities': {'soup': 3}, 'subtotal': None,
+         'amount': 65},
+        {'promotion': 7, 'quantities': {}, 'subtotal': 585, 'amount': 100}]
@@ -0,0 +1,97 @@
+import pytest
+
+import basket.basket as basket
+import basket.catalogue as catalogue
+import basket.instrument as instrument
+import basket.product as product
+import basket.promotion as promotion
+import basket.receipt as receipt
+
+
+@pytest.fixture
+def cat():
+    return catalogue.Catalogue(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf')},
+        [promotion.Promotion({'id': 2, 'title': 'Half price loaf',
+                              'qualifying_product': 'soup',
+                              'qualifying_qty': 2,
+                              'discounted_product': 'bread',
+                              'discount_percent': 50})])
+
+
+@pytest.fixture
+def recorder():
+    recorder = instrument.enable()
+    yield recorder
+    instrument.disable()
+
+
+def test_disabled():
+    assert instrument.recorder is None
+    assert not hasattr(basket.Basket.add, '__wrapped__')
+    assert not hasattr(basket.CompactBasket.calculate_discounts,
+                       '__wrapped__')
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_stages(cat, recorder, compact):
+    assert basket.Basket.add.__wrapped__
+    shopping_basket = cat.basket(compact)
+    for item in ['soup', 'soup', 'bread', 'pie']:
+        shopping_basket.add(item)
+    receipt.render(shopping_basket)
+    assert recorder.stages['basket.add'][0] == 4
+    assert recorder.stages['calculate_discounts'][0] == 1
+    assert recorder.stages['render'][0] == 1
+    assert all(seconds >= 0 for _, seconds in recorder.stages.values())
+    assert list(recorder.promotions) == cat.promotions
+    assert recorder.promotions[cat.promotions[0]][0] == 1
+
+
+def test_disable(recorder):
+    assert instrument.disable() is recorder
+    assert instrument.recorder is None
+    assert not hasattr(basket.Basket.add, '__wrapped__')
+
+
+def test_timed(recorder):
+    @instrument.timed('double')
+    def double(x):
+        return 2 * x
+
+    assert double(2) == 4
+    assert double(3) == 6
+    assert recorder.stages['double'][0] == 2
+
+
+def test_custom_recorder(cat):
+    class Counter:
+        def __init__(self):
+            self.calls = []
+
+        def record(self, stage, seconds):
+            self.calls.append(stage)
+
+        def record_promotions(self, promotions, seconds):
+            self.calls.append([p.promo_id for p in promotions])
+
+    counter = instrument.enable(Counter())
+    try:
+        shopping_basket = cat.basket()
+        shopping_basket.add('bread')
+        shopping_basket.calculate_discounts()
+    finally:
+        instrument.disable()
+    assert counter.calls == ['basket.add', [2], 'calculate_discounts']
+
+
+def test_report(cat, recorder):
+    shopping_basket = cat.basket()
+    shopping_basket.add('bread')
+    receipt.render(shopping_basket)
+    lines = recorder.report()
+    assert lines[0].split() == ['stage', 'calls', 'total', 'ms', 'per',
+                                'call', 'us']
+    assert lines[1].split()[0] == 'render'
+    assert any(line.startswith('2: Half price loaf') for line in lines)
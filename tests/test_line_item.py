@@ -0,0 +1,75 @@
+import pytest
+
+import basket.line_item as line_item
+import basket.product as product
+import basket.promotion as promotion
+
+
+@pytest.fixture
+def prod():
+    return product.Product('bread', 80, 'loaf')
+
+
+@pytest.fixture
+def half_price():
+    return promotion.Promotion({'id': 2, 'title': 'Half price loaf',
+                                'qualifying_product': 'soup',
+                                'qualifying_qty': 2,
+                                'discounted_product': 'bread',
+                                'discount_percent': 50})
+
+
+@pytest.fixture
+def bread_off():
+    return promotion.Promotion({'id': 3, 'title': 'Bread 30% off',
+                                'qualifying_product': 'bread',
+                                'qualifying_qty': 1,
+                                'discounted_product': 'bread',
+                                'discount_percent': 30})
+
+
+def test_line_item(prod):
+    line = line_item.LineItem(prod, 3)
+    assert line.product is prod
+    assert line.name == 'bread'
+    assert line.quantity == 3
+    assert line.discounted_quantity == 0
+    assert line.subtotal == 240
+    assert line.discount_amount == 0
+    assert line.total == 240
+    assert line.discount_messages == []
+
+
+def test_apply_promotions(prod, half_price, bread_off):
+    line = line_item.LineItem(prod, 4)
+    line.apply_promotions([(bread_off, 1), (half_price, 2)])
+    assert line.discounted_quantity == 3
+    assert line.discount_amount == 24 + 2 * 40
+    assert line.total == 320 - 104
+    assert line.discount_messages == [('Bread 30% off: -24p', 1),
+                                      ('Half price loaf: -40p', 2)]
+    line.clear_promotions()
+    assert line.total == 320
+
+
+def test_units(prod, half_price):
+    line = line_item.LineItem(prod, 3)
+    line.apply_promotions([(half_price, 2)])
+    units = line.units()
+    assert len(units) == 3
+    assert all(unit is not prod for unit in units)
+    assert [unit.has_promotion for unit in units] == [True, True, False]
+    assert sum(unit.discounted_price for unit in units) == line.total
+    assert not prod.has_promotion
+
+
+def test_fewer_units_than_promoted(prod, half_price, bread_off):
+    line = line_item.LineItem(prod, 4)
+    line.apply_promotions([(bread_off, 1), (half_price, 2)])
+    line.quantity = 2
+    assert line.applied_segments == [(bread_off, 1), (half_price, 1)]
+    assert line.discounted_quantity == 2
+    assert line.discount_amount == 24 + 40
+    assert len(line.units()) == 2
+    line.trim_promotions()
+    assert line.segments == [(bread_off, 1), (half_price, 1)]
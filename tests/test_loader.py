@@ -0,0 +1,190 @@
+import io
+import json
+
+import pytest
+
+import basket.loader as loader
+
+
+class CountingStream(io.StringIO):
+    """StringIO that counts the characters read from it."""
+
+    chars_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.chars_read += len(data)
+        return data
+
+
+@pytest.fixture
+def data_file(tmpdir):
+    def write(data):
+        tmpfile = tmpdir.join('data.json')
+        tmpfile.write(data if isinstance(data, str) else json.dumps(data))
+        return str(tmpfile)
+    return write
+
+
+@pytest.mark.parametrize('doc', [
+    '[]',
+    ' [ 1 , 2.5,"a",{"x":[1,2]} , null, true ] \n',
+    '[123456789, 1e-5, -0.25E+3]',
+    '[{"a": "' + 'x' * 1000 + '"}]',
+    json.dumps([{'name': f'Product {i}', 'price': i, 'unit': 'é' * i}
+                for i in range(100)], indent=2),
+    json.dumps([{'a': {'b': {'c': 1}}, 's': '},{"x":'}] * 50),
+    json.dumps([[{'a': 1}, {'b': 2}], {'c': '},'}] * 50),
+])
+@pytest.mark.parametrize('chunk_size', [1, 3, 64, loader.CHUNK_SIZE])
+def test_read_array(doc, chunk_size):
+    assert list(loader.read_array(io.StringIO(doc), chunk_size)) == \
+        json.loads(doc)
+
+
+@pytest.mark.parametrize('doc, message', [
+    ('', 'Expecting a json array in record 0'),
+    ('{"name": "soup"}', 'Expecting a json array in record 0'),
+    ('[1,]', 'Expecting value in record 1'),
+    ('[1 2]', "Expecting ',' delimiter in record 0"),
+    ('[{"a": 1}', "Expecting ',' delimiter in record 0"),
+    ('[{"a": 1}, {"b": 2}, {"c": }]', 'Expecting value in record 2'),
+    ('[{"a": 1}] x', 'Extra data in record 1'),
+])
+@pytest.mark.parametrize('chunk_size', [1, 5, loader.CHUNK_SIZE])
+def test_read_array_invalid(doc, message, chunk_size):
+    with pytest.raises(ValueError, match=message):
+        list(loader.read_array(io.StringIO(doc), chunk_size))
+
+
+def test_read_array_streams():
+    stream = CountingStream('[{"a": 1}' + ', {"a": 1}' * 100000 + ']')
+    records = loader.read_array(stream, chunk_size=1024)
+    assert next(records) == {'a': 1}
+    assert stream.chars_read <= 2048
+
+
+def test_read_array_stops_at_bad_record():
+    doc = '[{"a": }' + ', {"a": 1}' * 1000000 + ']'
+    stream = CountingStream(doc)
+    with pytest.raises(ValueError, match='record 0'):
+        list(loader.read_array(stream))
+    assert stream.chars_read < len(doc) // 2
+
+
+def test_read_records_fast(data_file):
+    pytest.importorskip('ijson')
+    path = data_file([{'a': 1.5}, {'b': [1, 2]}])
+    assert list(loader.read_records(path, fast=True)) == \
+        list(loader.read_records(path, fast=False))
+    with pytest.raises(ValueError):
+        list(loader.read_records(data_file('{"a": 1}'), fast=True))
+
+
+def test_load_products_report(data_file):
+    report = loader.LoadReport()
+    products = loader.load_products(data_file([
+        {'name': 'Soup', 'price': 65, 'unit': 'Tin'},
+        {'name': 'Bread', 'price': '80p', 'unit': 'Loaf'},
+        {'name': 'Milk', 'unit': 'Bottle'},
+        {'name': 7, 'price': 10, 'unit': 'Each'},
+        ['Apples', 100, 'Bag'],
+        {'name': 'Apples', 'price': 100, 'unit': 'Bag'},
+    ]), report)
+    assert sorted(products) == ['apples', 'soup']
+    assert report.file_path.endswith('data.json')
+    assert (report.records, report.loaded) == (6, 2)
+    assert not report.ok
+    assert report.errors == [
+        (1, 'price', "invalid literal for int() with base 10: '80p'"),
+        (2, 'price', 'missing price'),
+        (3, 'name', 'expected a string, not int'),
+        (4, None, 'expected a json object'),
+    ]
+    assert report.as_dict()['errors'][2] == {
+        'index': 3, 'field': 'name', 'reason': 'expected a string, not int'}
+
+
+def test_load_promotions_report(data_file):
+    promo = {'id': 1, 'title': 'Apples 10% off',
+             'qualifying_product': 'apples', 'qualifying_qty': 1,
+             'discounted_product': 'apples', 'discount_percent': 10}
+    report = loader.LoadReport()
+    promotions = loader.load_promotions(data_file([
+        promo,
+        dict(promo, qualifying_qty=0),
+        dict(promo, discount_percent='ten'),
+        {key: value for key, value in promo.items() if key != 'id'},
+        dict(promo, qualifying_qty=-2),
+    ]), report)
+    assert len(promotions) == 1
+    assert report.loaded == 1
+    assert report.errors == [
+        (1, 'qualifying_qty', 'Unacceptable value for qualifying_qty'),
+        (2, 'discount_percent', "could not convert string to float: 'ten'"),
+        (3, 'id', 'missing id'),
+        (4, 'qualifying_qty', 'Unacceptable value for qualifying_qty'),
+    ]
+
+
+def test_load_rule_promotions_report(data_file):
+    multibuy = {'id': 4, 'title': 'Soup 3 for 2', 'type': 'multibuy',
+                'product': 'Soup', 'buy': 3, 'pay': 2}
+    report = loader.LoadReport()
+    promotions = loader.load_promotions(data_file([
+        multibuy,
+        {'id': 5, 'title': 'Meal deal', 'type': 'bundle',
+         'products': {'Soup': 1, 'Bread': 1}, 'price': 100},
+        dict(multibuy, pay=3),
+        {key: value for key, value in multibuy.items() if key != 'buy'},
+        {'id': 6, 'title': 'Meal deal', 'type': 'bundle',
+         'products': {'Soup': 0}, 'price': 100},
+        {'id': 7, 'title': 'Spend', 'type': 'spend', 'threshold': 'lots'},
+        {'id': 8, 'title': 'Bogof', 'type': 'bogof'},
+    ]), report)
+    assert [type(p).__name__ for p in promotions] == ['MultiBuy', 'Bundle']
+    assert report.errors == [
+        (2, None, 'pay must be at least 0 and less than buy'),
+        (3, 'buy', 'missing buy'),
+        (4, 'products', 'Unacceptable quantity of Soup'),
+        (5, 'threshold', "invalid literal for int() with base 10: 'lots'"),
+        (6, 'type', 'Unknown promotion type: bogof'),
+    ]
+
+
+def test_load_products_ok(data_file):
+    report = loader.LoadReport()
+    products = loader.load_products(data_file(
+        [{'name': 'Soup', 'price': 65, 'unit': 'Tin'}]), report)
+    assert products['soup'].price == 65
+    assert report.ok
+    assert (report.records, report.loaded) == (1, 1)
+
+
+def test_load_products_no_file():
+    report = loader.LoadReport()
+    assert loader.load_products('foo.json', report) == {}
+    assert report.errors == [
+        (None, None, 'No such file or directory: foo.json')]
+
+
+def test_load_products_bad_file(data_file):
+    report = loader.LoadReport()
+    assert loader.load_products(data_file(
+        '[{"name": "Soup", "price": 65, "unit": "Tin"}, {"name": }]'),
+        report) == {}
+    assert report.loaded == 0
+    (error,) = report.errors
+    assert error.index is None
+    assert 'Failed to parse data file' in error.reason
+    assert 'Expecting value in record 1' in error.reason
+
+
+def test_load_promotions_bad_file(data_file, capsys):
+    loader.logger.enabled = True
+    try:
+        assert loader.load_promotions(data_file('{}')) == []
+    finally:
+        loader.logger.enabled = False
+    stdout, _ = capsys.readouterr()
+    assert 'ERROR: Failed to parse data file' in stdout
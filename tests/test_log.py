@@ -0,0 +1,128 @@
+import io
+import json
+import time
+
+import pytest
+
+import basket.log as log
+from basket.loader import SimpleLogger
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Unformattable:
+    def __format__(self, spec):
+        raise AssertionError('formatted')
+
+
+@pytest.fixture
+def logger():
+    logger = SimpleLogger()
+    logger.enabled = True
+    yield logger
+    logger.close()
+
+
+def test_format_text():
+    created = time.mktime((2020, 1, 2, 3, 4, 5, 0, 0, -1))
+    assert log.format_text((created, 'INFO', 'Item {item!r}',
+                            {'item': 'soup'})) == \
+        "2020-01-02 03:04:05 INFO: Item 'soup'"
+    assert log.format_text((created, 'ERROR', 'No {x}', {})) == \
+        '2020-01-02 03:04:05 ERROR: No {x}'
+    assert log.format_text((created, 'INFO', 'Item {item}',
+                            {'item': 'soup', 'suppressed': 3})).endswith(
+        'Item soup (3 similar messages suppressed)')
+    assert log.format_text((created, 'INFO', 'Basket {1, 2}',
+                            {'suppressed': 3})).endswith(
+        'Basket {1, 2} (3 similar messages suppressed)')
+
+
+def test_format_json():
+    created = time.mktime((2020, 1, 2, 3, 4, 5, 0, 0, -1)) + 0.25
+    data = json.loads(log.format_json(
+        (created, 'ERROR', 'Failed: {reason}',
+         {'reason': ValueError('bad'), 'index': 3, 'level': 'x'})))
+    assert data == {'time': '2020-01-02T03:04:05.250', 'level': 'ERROR',
+                    'message': 'Failed: bad', 'reason': 'bad', 'index': 3}
+
+
+def test_rate_limiter():
+    clock = Clock()
+    limiter = log.RateLimiter(2, interval=10, clock=clock)
+    assert [limiter.allow('a') for _ in range(4)] == [
+        (True, 0), (True, 0), (False, 0), (False, 0)]
+    assert limiter.allow('b') == (True, 0)
+    assert limiter.pending() == [('a', 2)]
+    clock.now = 10
+    assert limiter.allow('a') == (True, 2)
+    assert limiter.pending() == []
+
+
+def test_queue_writer():
+    stream = io.StringIO()
+    writer = log.QueueWriter(stream, json_output=True)
+    for i in range(100):
+        writer.put((time.time(), 'INFO', 'Record {i}', {'i': i}))
+    writer.close()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record['i'] for record in records] == list(range(100))
+    assert writer.dropped == 0
+
+
+def test_queue_writer_bad_record():
+    stream = io.StringIO()
+    writer = log.QueueWriter(stream)
+    writer.put((0, 'INFO', 'Item {item}', {'other': 1}))
+    writer.put((0, 'INFO', 'Item {item}', {'item': 'soup'}))
+    writer.close()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith(
+        " ERROR: Could not format log message 'Item {item}': KeyError('item')")
+    assert lines[1].endswith(' INFO: Item soup')
+    assert writer.failed == 1
+
+
+def test_queue_writer_full():
+    stream = io.StringIO()
+    writer = log.QueueWriter(stream, max_queue=1)
+    stream.write = lambda text: time.sleep(0.1)
+    for i in range(5):
+        writer.put((0, 'INFO', 'Record', {}))
+    assert writer.dropped >= 3
+    writer.close()
+
+
+def test_logger_prints_by_default(logger, capsys):
+    logger.log('Item {item} not in stock', item='soup')
+    stdout, _ = capsys.readouterr()
+    assert stdout.endswith(' INFO: Item soup not in stock\n')
+
+
+def test_logger_disabled_does_not_format(logger, capsys):
+    logger.enabled = False
+    logger.log('Item {item}', item=Unformattable())
+    assert capsys.readouterr() == ('', '')
+
+
+def test_logger_configure(logger, tmpdir):
+    log_file = str(tmpdir.join('basket.log'))
+    logger.configure(log_file, limit=1)
+    for _ in range(3):
+        logger.log('Item {item} not in stock', item='soup')
+    logger.log('Failed', SimpleLogger.error)
+    logger.close()
+    with open(log_file) as f:
+        lines = f.read().splitlines()
+    assert [line.split(' ', 2)[2] for line in lines] == [
+        'INFO: Item soup not in stock',
+        'ERROR: Failed',
+        'INFO: Suppressed 2 messages like: Item {item} not in stock']
+    assert logger.writer is None and logger.limiter is None
@@ -1,8 +1,11 @@
+import json
 import time
 
 import pytest
 
 import basket.__main__ as main
+import basket.explain as explain
+from benchmarks import startup
 
 
 @pytest.fixture
@@ -271,3 +274,248 @@ def test_main_unknown_prod(capsys):
     expectd_op = ('INFO: Item \'pie\' not in stock\nSubtotal: £0.00\n'
                   '(No offers available)\nTotal: £0.00')
     assert expectd_op in stdout
+
+
+def test_main_bulk(products_json_file, promo_json_file, tmpdir, capsys):
+    baskets = tmpdir.join('baskets.txt')
+    baskets.write('apples\nsoup soup bread\n')
+    assert main.main(['--products', products_json_file,
+                      '--promotions', promo_json_file,
+                      '--bulk', str(baskets), '--workers', '1']) == 0
+    stdout, _ = capsys.readouterr()
+    assert stdout == ('Subtotal: £1.00\nApples 10% off: -10p\nTotal: £0.90\n'
+                      '\nSubtotal: £2.10\n'
+                      '2 tins soup get you a half price loaf: -40p\n'
+                      'Total: £1.70\n\n')
+
+
+def test_main_no_items(capsys):
+    with pytest.raises(SystemExit):
+        main.parse_args([])
+    _, stderr = capsys.readouterr()
+    assert 'the following arguments are required: item' in stderr
+
+
+def test_main_stream(products_json_file, promo_json_file, tmpdir, capsys):
+    events = tmpdir.join('events.jsonl')
+    events.write('{"basket": "a", "item": "apples"}\n'
+                 '{"basket": "b", "item": "soup", "quantity": 2}\n'
+                 '{"basket": "b", "item": "bread"}\n')
+    assert main.main(['--products', products_json_file,
+                      '--promotions', promo_json_file,
+                      '--stream', str(events)]) == 0
+    stdout, _ = capsys.readouterr()
+    records = [json.loads(line) for line in stdout.splitlines()]
+    assert [(r['basket'], r['subtotal'], r['total']) for r in records] == [
+        ('a', 100, 90), ('b', 210, 170)]
+    assert records[1]['discounts'][0]['amount'] == 40
+
+
+def test_main_compile(products_json_file, promo_json_file, tmpdir, capsys):
+    compiled = str(tmpdir.join('catalogue.bin'))
+    assert main.main(['compile', '--products', products_json_file,
+                      '--promotions', promo_json_file, '-o', compiled]) == 0
+    main.main(['--catalogue', compiled, 'soup', 'soup', 'bread'])
+    stdout, _ = capsys.readouterr()
+    assert stdout == ('Subtotal: £2.10\n'
+                      '2 tins soup get you a half price loaf: -40p\n'
+                      'Total: £1.70\n')
+
+
+def test_main_bad_catalogue(tmpdir, capsys):
+    compiled = tmpdir.join('catalogue.bin')
+    compiled.write('not a catalogue' * 10)
+    assert main.main(['--catalogue', str(compiled), 'soup', '--verbose']) == 1
+    stdout, _ = capsys.readouterr()
+    assert 'ERROR: Not a compiled catalogue' in stdout
+
+
+def test_main_best_price(tmpdir, capsys):
+    promotions = tmpdir.join('promotions.json')
+    promotions.write(json.dumps([
+        {'id': 1, 'title': 'Half price loaf with 2 soups',
+         'qualifying_product': 'soup', 'qualifying_qty': 2,
+         'discounted_product': 'bread', 'discount_percent': 50},
+        {'id': 2, 'title': 'Bread 30% off',
+         'qualifying_product': 'bread', 'qualifying_qty': 1,
+         'discounted_product': 'bread', 'discount_percent': 30}]))
+    argv = ['--promotions', str(promotions), 'soup', 'soup', 'bread']
+    main.main(argv)
+    main.main(argv + ['--best-price'])
+    stdout, _ = capsys.readouterr()
+    assert 'Bread 30% off: -24p\nTotal: £1.86' in stdout
+    assert 'Half price loaf with 2 soups: -40p\nTotal: £1.70' in stdout
+
+
+def test_main_profile(capsys):
+    main.main(['soup', 'soup', 'bread', '--profile'])
+    stdout, stderr = capsys.readouterr()
+    assert stdout.endswith('Total: £1.70\n')
+    stages = [line.split()[0] for line in stderr.splitlines()[1:7]]
+    assert sorted(stages) == ['basket.add', 'calculate_discounts',
+                              'load_products', 'load_promotions', 'render',
+                              'total']
+    assert 'most evaluated' in stderr
+    assert main.instrument.recorder is None
+
+
+def test_main_log_file(tmpdir, capsys):
+    log_file = str(tmpdir.join('basket.log'))
+    try:
+        main.main(['soup', 'foo', 'foo', 'foo', '--log-file', log_file,
+                   '--log-json', '--log-limit', '1'])
+    finally:
+        main.logger.enabled = False
+    stdout, _ = capsys.readouterr()
+    assert 'not in stock' not in stdout
+    assert main.logger.writer is None
+    with open(log_file) as f:
+        records = [json.loads(line) for line in f]
+    assert [record['message'] for record in records] == [
+        "Item 'foo' not in stock",
+        "Suppressed 2 messages like: Item '{item}' not in stock"]
+    assert records[0]['item'] == 'foo'
+
+
+@pytest.mark.parametrize('argv', [
+    ['soup'],
+    ['soup', 'bread', '--verbose', '--best-price'],
+    ['--products', 'p.json', 'soup', '--promotions', 'q.json'],
+])
+def test_parse_fast(argv):
+    assert vars(main.parse_fast(argv)) == vars(main.parse_args(argv))
+
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['--verbose'],
+    ['soup', '--profile'],
+    ['soup', '--products'],
+    ['soup', '--products=p.json'],
+    ['soup', '-h'],
+    ['--bulk', 'baskets.txt'],
+])
+def test_parse_fast_needs_parser(argv):
+    assert main.parse_fast(argv) is None
+
+
+def test_startup_imports():
+    times = startup.import_times('basket.__main__')
+    assert [name for name in startup.HEAVY_MODULES if name in times] == []
+
+
+def test_startup_import_budget():
+    assert startup.import_overhead() < startup.RELATIVE_BUDGET
+
+
+def test_main_rounding(tmpdir, capsys):
+    promotions = tmpdir.join('promotions.json')
+    promotions.write(json.dumps([
+        {'id': 1, 'title': 'Soup 7.5% off', 'qualifying_product': 'soup',
+         'qualifying_qty': 1, 'discounted_product': 'soup',
+         'discount_percent': 7.5}]))
+    argv = ['--promotions', str(promotions), 'soup', 'soup']
+    main.main(argv)
+    main.main(argv + ['--rounding', 'line-floor'])
+    stdout, _ = capsys.readouterr()
+    # 7.5% of 65p is 4.875p a tin, 9.75p for the two.
+    first, second = stdout.split('Subtotal')[1:]
+    assert first.endswith('Total: £1.22\n')
+    assert second.endswith('Total: £1.21\n')
+
+
+def test_main_store(tmpdir, capsys):
+    stores_file = tmpdir.join('stores.json')
+    stores_file.write(json.dumps([{'store': 'dear',
+                                   'prices': {'bread': 100}}]))
+    argv = ['soup', 'soup', 'bread', '--stores', str(stores_file)]
+    main.main(argv + ['--store', 'dear'])
+    stdout, _ = capsys.readouterr()
+    assert stdout == ('Subtotal: £2.30\n'
+                      '2 tins soup get you a half price loaf: -50p\n'
+                      'Total: £1.80\n')
+    try:
+        assert main.main(argv + ['--store', 'cheap', '--verbose']) == 1
+    finally:
+        main.logger.enabled = False
+    stdout, _ = capsys.readouterr()
+    assert 'ERROR: No such store: cheap' in stdout
+    with pytest.raises(SystemExit):
+        main.main(['soup', '--store', 'dear'])
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_main_bulk_store(tmpdir, capsys, workers):
+    stores_file = tmpdir.join('stores.json')
+    stores_file.write(json.dumps([{'store': 'dear',
+                                   'prices': {'bread': 100}}]))
+    baskets = tmpdir.join('baskets.txt')
+    baskets.write('soup soup bread\n')
+    argv = ['--bulk', str(baskets), '--workers', workers,
+            '--stores', str(stores_file)]
+    assert main.main(argv + ['--store', 'dear']) == 0
+    stdout, _ = capsys.readouterr()
+    assert 'Total: £1.80\n' in stdout
+    assert main.main(argv + ['--store', 'cheap']) == 1
+    stdout, _ = capsys.readouterr()
+    assert 'Total' not in stdout
+
+
+def test_main_stream_store(tmpdir, capsys):
+    stores_file = tmpdir.join('stores.json')
+    stores_file.write(json.dumps([{'store': 'dear',
+                                   'prices': {'bread': 100}}]))
+    events = tmpdir.join('events.jsonl')
+    events.write('{"basket": "a", "item": "soup", "quantity": 2}\n'
+                 '{"basket": "a", "item": "bread"}\n')
+    argv = ['--stream', str(events), '--stores', str(stores_file)]
+    assert main.main(argv + ['--store', 'dear']) == 0
+    stdout, _ = capsys.readouterr()
+    assert json.loads(stdout)['total'] == 180
+    assert main.main(argv + ['--store', 'cheap']) == 1
+    stdout, _ = capsys.readouterr()
+    assert stdout == ''
+
+
+def test_main_explain(tmpdir, capsys):
+    main.main(['soup', 'soup', 'bread', '--explain'])
+    stdout, stderr = capsys.readouterr()
+    assert stdout.endswith('Total: £1.70\n')
+    assert stderr == ('Promotion 2 on bread x1: 2 qualifying counted, '
+                      '1 earned, 1 applied\n')
+    assert explain.tracer is None
+
+    explain_file = tmpdir.join('explain.jsonl')
+    main.main(['soup', 'bread', '--explain-file', str(explain_file)])
+    assert json.loads(explain_file.read()) == {
+        'basket': None, 'promotions': [
+            {'promotion': 2, 'product': 'bread', 'quantity': 1,
+             'qualifying_count': 1, 'earned': 0, 'applied': 0}]}
+    with pytest.raises(SystemExit):
+        main.main(['soup', '--explain', '--explain-file', str(explain_file)])
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_main_bulk_explain(tmpdir, capsys, workers):
+    baskets = tmpdir.join('baskets.txt')
+    baskets.write('soup soup bread\nbread\nmilk\n')
+    explain_file = tmpdir.join('explain.jsonl')
+    assert main.main(['--bulk', str(baskets), '--workers', workers,
+                      '--explain-file', str(explain_file)]) == 0
+    records = [json.loads(line) for line in explain_file.readlines()]
+    assert [record['basket'] for record in records] == [1, 2, 3]
+    assert [[(entry['qualifying_count'], entry['applied'])
+             for entry in record['promotions']]
+            for record in records] == [[(2, 1)], [(0, 0)], []]
+
+    assert main.main(['--bulk', str(baskets), '--workers', workers,
+                      '--explain']) == 0
+    _, stderr = capsys.readouterr()
+    assert stderr.splitlines() == [
+        'Basket 1:',
+        'Promotion 2 on bread x1: 2 qualifying counted, 1 earned, 1 applied',
+        'Basket 2:',
+        'Promotion 2 on bread x1: 0 qualifying counted, 0 earned, 0 applied',
+        'Basket 3:',
+        'No promotions evaluated']
+    assert explain.tracer is None
@@ -0,0 +1,55 @@
+import pytest
+
+import basket.money as money
+
+
+@pytest.mark.parametrize('percent, bp', [
+    (10, 1000), ('10', 1000), (12.5, 1250), ('12.5', 1250), (2.3, 230),
+    (0.29, 29), (100, 10000), (0, 0),
+])
+def test_basis_points(percent, bp):
+    assert money.basis_points(percent) == bp
+
+
+@pytest.mark.parametrize('percent', ['ten', 'nan', float('inf')])
+def test_basis_points_invalid(percent):
+    with pytest.raises(ValueError):
+        money.basis_points(percent)
+
+
+@pytest.mark.parametrize('amount, rate, floor, half_even', [
+    (3000, 230, 69, 69),
+    (5, 5000, 2, 2),
+    (7, 5000, 3, 4),
+    (15, 5000, 7, 8),
+    (11, 1000, 1, 1),
+    (17, 1000, 1, 2),
+    (0, 1000, 0, 0),
+    (65, -700, -4, -5),
+    (50, -1000, -5, -5),
+    (45, -1000, -4, -4),
+    (55, -1000, -5, -6),
+    (3, -2550, 0, -1),
+])
+def test_apply_rate(amount, rate, floor, half_even):
+    assert money.apply_rate(amount, rate) == floor
+    assert money.apply_rate(amount, rate, half_even=True) == half_even
+    assert type(money.apply_rate(amount, rate, half_even=True)) is int
+
+
+def test_apply_rate_arrays():
+    numpy = pytest.importorskip('numpy')
+    amounts = numpy.array([3000, 5, 7, 15, 11, 17, 0])
+    for half_even in (False, True):
+        for rate in (2500, -2500, -700):
+            assert money.apply_rate(amounts * 2, rate, half_even).tolist() == [
+                money.apply_rate(int(amount) * 2, rate, half_even)
+                for amount in amounts]
+
+
+@pytest.mark.parametrize('amount, text', [
+    (0, '-0p'), (40, '-40p'), (99, '-99p'), (100, '-£1.00'),
+    (1234, '-£12.34'),
+])
+def test_format_discount(amount, text):
+    assert money.format_discount(amount) == text
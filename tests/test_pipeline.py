@@ -0,0 +1,92 @@
+import io
+import json
+
+import pytest
+
+import basket.catalogue as catalogue
+import basket.pipeline as pipeline
+import basket.product as product
+import basket.promotion as promotion
+
+
+@pytest.fixture
+def cat():
+    return catalogue.Catalogue(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf'),
+         'apples': product.Product('apples', 100, 'bag')},
+        [promotion.Promotion({'id': 1, 'title': 'Apples 10% off',
+                              'qualifying_product': 'apples',
+                              'qualifying_qty': 1,
+                              'discounted_product': 'apples',
+                              'discount_percent': 10}),
+         promotion.Promotion({'id': 2, 'title': 'Half price loaf',
+                              'qualifying_product': 'soup',
+                              'qualifying_qty': 2,
+                              'discounted_product': 'bread',
+                              'discount_percent': 50})])
+
+
+def test_read_events():
+    stream = io.StringIO('{"basket": "a", "item": "soup"}\n\n'
+                         '{"basket": "a", "item": "bread", "quantity": 2}\n')
+    assert list(pipeline.read_events(stream)) == [('a', 'soup', 1),
+                                                  ('a', 'bread', 2)]
+
+
+@pytest.mark.parametrize('line', ['soup', '{"item": "soup"}', '[1]',
+                                  '{"basket": 1, "item": "a", '
+                                  '"quantity": "x"}',
+                                  '{"basket": 1, "item": "a", '
+                                  '"quantity": 0}',
+                                  '{"basket": 1, "item": "a", '
+                                  '"quantity": -3}'])
+def test_read_events_invalid(line):
+    stream = io.StringIO('{"basket": "a", "item": "soup"}\n' + line)
+    with pytest.raises(ValueError) as e:
+        list(pipeline.read_events(stream))
+    assert 'Invalid event on line 2' in str(e)
+
+
+def test_price_events(cat):
+    events = [(1, 'soup', 2), (1, 'bread', 1), (1, 'Apples', 1),
+              (2, 'pie', 3), (2, 'bread', 1), (1, 'apples', 1)]
+    records = list(pipeline.price_events(iter(events), cat))
+    assert records == [
+        {'basket': 1, 'subtotal': 310,
+         'discounts': [{'id': 2, 'title': 'Half price loaf', 'amount': 40},
+                       {'id': 1, 'title': 'Apples 10% off', 'amount': 10}],
+         'total': 260, 'out_of_stock': 0},
+        {'basket': 2, 'subtotal': 80, 'discounts': [], 'total': 80,
+         'out_of_stock': 3},
+        {'basket': 1, 'subtotal': 100,
+         'discounts': [{'id': 1, 'title': 'Apples 10% off', 'amount': 10}],
+         'total': 90, 'out_of_stock': 0}]
+
+
+def test_price_events_lazy(cat):
+    def events():
+        yield 'a', 'soup', 1
+        yield 'b', 'soup', 1
+        raise AssertionError('read too far')
+    records = pipeline.price_events(events(), cat)
+    assert next(records)['basket'] == 'a'
+
+
+def test_price_events_empty(cat):
+    assert list(pipeline.price_events(iter([]), cat)) == []
+
+
+def test_discount_records(cat):
+    apples = cat.promotions[0]
+    assert pipeline.discount_records([(apples, 20)]) == [
+        {'id': apples.promo_id, 'title': apples.title, 'amount': 20}]
+    assert pipeline.discount_records([]) == []
+
+
+def test_write_records():
+    stream = io.StringIO()
+    assert pipeline.write_records([{'total': 1}, {'total': 2}], stream) == 2
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == [{'total': 1},
+                                                    {'total': 2}]
@@ -1,3 +1,5 @@
+import copy
+
 import pytest
 
 import basket.product as product
@@ -53,3 +55,28 @@ def test_clear_promo(prod_promo):
     assert prod.discounted_price == 100
     assert prod.discount_amount == 0
     assert prod.discount_message is None
+
+
+def test_slots(prod_promo):
+    prod = product.Product('Apples', 100, 'Bag')
+    assert not hasattr(prod, '__dict__')
+    assert not hasattr(prod_promo, '__dict__')
+    with pytest.raises(AttributeError):
+        prod.colour = 'red'
+
+
+def test_interned_names(prod_promo):
+    prod = product.Product(''.join(['App', 'les']), 100, 'Bag')
+    assert prod.name is prod_promo.qualifying_product
+    assert prod.name is prod_promo.discounted_product
+
+
+def test_copy(prod_promo):
+    prod = product.Product('apples', 100, 'bag')
+    prod.apply_promotion(prod_promo)
+    clone = copy.copy(prod)
+    assert clone is not prod
+    assert (clone.name, clone.price, clone.unit) == ('apples', 100, 'bag')
+    assert clone._promotion is prod_promo
+    clone.clear_promotion()
+    assert prod.has_promotion
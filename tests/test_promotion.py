@@ -34,3 +34,92 @@ def test_bad_offer():
     with pytest.raises(ValueError) as e:
         promotion.Promotion(promo_def)
     assert 'Unacceptable value for qualifying_qty' in str(e)
+
+
+@pytest.mark.parametrize('percent, price, amount, message', [
+    (10, 100, 10, 'Offer: -10p'),
+    (12.5, 99, 12, 'Offer: -12p'),
+    (50, 250, 125, 'Offer: -£1.25'),
+    (100, 100, 100, 'Offer: -£1.00'),
+])
+def test_discount_for(percent, price, amount, message):
+    p = promotion.Promotion({'id': 1,
+                             'title': 'Offer',
+                             'qualifying_product': 'apples',
+                             'qualifying_qty': 1,
+                             'discounted_product': 'apples',
+                             'discount_percent': percent})
+    assert p.discount_for(price) == amount
+    assert p.discount_message(price) == message
+
+
+@pytest.fixture
+def promo():
+    return promotion.Promotion({'id': 1,
+                                'title': 'Apples 10% off',
+                                'qualifying_product': 'apples',
+                                'qualifying_qty': 1,
+                                'discounted_product': 'apples',
+                                'discount_percent': 10})
+
+
+def test_prime(promo):
+    assert promo.prime(250) == (25, 'Apples 10% off: -25p')
+    assert promo._discounts == {250: (25, 'Apples 10% off: -25p')}
+    assert promo.discount_for(250) == 25
+    assert promo.discount_for(1000) == 100
+    assert promo.discount_message(1000) == 'Apples 10% off: -£1.00'
+    assert set(promo._discounts) == {250, 1000}
+
+
+def test_prime_invalidated(promo):
+    promo.prime(250)
+    promo.discount_percent = 20
+    assert promo.discount_for(250) == 50
+    promo.title = 'Apples 20% off'
+    assert promo.discount_message(250) == 'Apples 20% off: -50p'
+
+
+def make_promotion(percent):
+    return promotion.Promotion({'id': 1, 'title': 'Offer',
+                                'qualifying_product': 'soup',
+                                'qualifying_qty': 1,
+                                'discounted_product': 'soup',
+                                'discount_percent': percent})
+
+
+def test_discount_exact():
+    p = make_promotion(2.3)
+    assert p.discount_bp == 230
+    assert p.discount_percent == 2.3
+    # int(3000 * 2.3 / 100.0) would give 68.
+    assert p.discount_for(3000) == 69
+
+
+@pytest.mark.parametrize('rounding, one, three', [
+    ('unit-floor', 7, 21),
+    ('unit-half-even', 8, 24),
+    ('line-floor', 7, 22),
+    ('line-half-even', 8, 22),
+])
+def test_discount_rounding(rounding, one, three):
+    p = make_promotion(50)
+    p.rounding = rounding
+    assert p.rounding == rounding
+    assert p.discount(15, 1) == one
+    assert p.discount(15, 3) == three
+    assert p.discount_for(15) == one
+
+
+def test_rounding_clears_table():
+    p = make_promotion(50)
+    assert p.discount_for(15) == 7
+    p.rounding = 'unit-half-even'
+    assert p.discount_message(15) == 'Offer: -8p'
+    p.discount_bp = 1000
+    assert p.discount_for(15) == 2
+
+
+def test_bad_rounding():
+    with pytest.raises(ValueError, match='Unknown rounding policy'):
+        make_promotion(50).rounding = 'ceiling'
@@ -0,0 +1,322 @@
+import itertools
+import random
+
+import pytest
+
+import basket.basket as basket
+import basket.batch as batch
+import basket.catalogue as catalogue
+import basket.compiled as compiled
+import basket.loader as loader
+import basket.product as product
+import basket.receipt as receipt
+import basket.rules as rules
+import basket.shard as shard
+import basket.stores as stores
+
+
+PROMOTIONS = [
+    {'id': 1, 'title': 'Apples 10% off', 'qualifying_product': 'Apples',
+     'qualifying_qty': 1, 'discounted_product': 'Apples',
+     'discount_percent': 10},
+    {'id': 4, 'title': 'Soup 3 for 2', 'type': 'multibuy', 'product': 'Soup',
+     'buy': 3, 'pay': 2},
+    {'id': 5, 'title': 'Soup and bread for £1', 'type': 'bundle',
+     'products': {'Soup': 1, 'Bread': 1}, 'price': 100},
+    {'id': 6, 'title': 'Any 3 of milk, apples or soap for £3',
+     'type': 'mix_and_match', 'products': ['Milk', 'Apples', 'Soap'],
+     'quantity': 3, 'price': 300},
+    {'id': 7, 'title': '£1 off when you spend £5', 'type': 'spend',
+     'threshold': 500, 'discount': 100},
+]
+
+
+@pytest.fixture
+def products():
+    return {'soup': product.Product('soup', 65, 'tin'),
+            'bread': product.Product('bread', 80, 'loaf'),
+            'milk': product.Product('milk', 130, 'bottle'),
+            'apples': product.Product('apples', 100, 'bag'),
+            'soap': product.Product('soap', 59, 'bar')}
+
+
+@pytest.fixture
+def cat(products):
+    return catalogue.Catalogue(products, loader.build_promotions(PROMOTIONS))
+
+
+class CountingRule(rules.MultiBuy):
+    """Multibuy that counts its evaluations."""
+
+    __slots__ = ()
+    evaluations = 0
+
+    def apply(self, quantities, products, subtotal):
+        CountingRule.evaluations += 1
+        return super().apply(quantities, products, subtotal)
+
+
+def test_multibuy(products):
+    rule = rules.MultiBuy({'id': 4, 'title': '3 for 2', 'product': 'Soup',
+                           'buy': 3, 'pay': 2})
+    assert rule.products == ('soup',)
+    assert rule.evaluate({'soup': 2}, products, 130) == 0
+    assert rule.evaluate({'soup': 3}, products, 195) == 65
+    assert rule.evaluate({'soup': 7}, products, 455) == 130
+    with pytest.raises(ValueError):
+        rules.MultiBuy({'id': 4, 'title': '3 for 3', 'product': 'Soup',
+                        'buy': 3, 'pay': 3})
+
+
+def test_bundle(products):
+    rule = rules.Bundle({'id': 5, 'title': 'Meal deal',
+                         'products': {'Soup': 2, 'Bread': 1}, 'price': 150})
+    assert rule.products == ('soup', 'bread')
+    assert rule.evaluate({'soup': 3, 'bread': 1}, products, 0) == 60
+    assert rule.evaluate({'soup': 4, 'bread': 5}, products, 0) == 120
+    assert rule.evaluate({'soup': 1, 'bread': 5}, products, 0) == 0
+    # No discount when the bundle costs more than its products.
+    rule.price = 500
+    assert rule.evaluate({'soup': 2, 'bread': 1}, products, 0) == 0
+
+
+def brute_force_mix_and_match(rule, quantities, products):
+    prices = sorted((products[name].price for name in rule.products
+                     for _ in range(quantities.get(name, 0))), reverse=True)
+    sets = len(prices) // rule.quantity
+    return sum(max(sum(prices[i * rule.quantity:(i + 1) * rule.quantity])
+                   - rule.price, 0) for i in range(sets))
+
+
+def test_mix_and_match(products):
+    rule = rules.MixAndMatch({'id': 6, 'title': 'Any 3 for £3',
+                              'products': ['Milk', 'Apples', 'Soap'],
+                              'quantity': 3, 'price': 300})
+    assert rule.evaluate({'milk': 2}, products, 0) == 0
+    # 130 + 130 + 100 for 300, the soap left over.
+    assert rule.evaluate({'milk': 2, 'apples': 1, 'soap': 1, 'soup': 9},
+                         products, 0) == 60
+    rng = random.Random(0)
+    for quantity, price in itertools.product([1, 2, 3, 5], [100, 250, 350]):
+        rule.quantity, rule.price = quantity, price
+        for _ in range(20):
+            quantities = {name: rng.randint(0, 6)
+                          for name in ('milk', 'apples', 'soap')}
+            expected = brute_force_mix_and_match(rule, quantities, products)
+            assert rule.evaluate(quantities, products, 0) == expected
+
+
+def test_spend_threshold(products):
+    rule = rules.SpendThreshold({'id': 7, 'title': '£1 off £5',
+                                 'threshold': 500, 'discount': 100})
+    assert rule.products == ()
+    assert rule.evaluate({}, products, 499) == 0
+    assert rule.evaluate({}, products, 500) == 100
+    percent = rules.SpendThreshold({'id': 8, 'title': '10% off soup',
+                                    'products': ['Soup'], 'threshold': 200,
+                                    'discount_percent': 12.5})
+    assert percent.evaluate({'soup': 3, 'milk': 9}, products, 1365) == 0
+    assert percent.evaluate({'soup': 4, 'milk': 9}, products, 1430) == 32
+    with pytest.raises(ValueError):
+        rules.SpendThreshold({'id': 9, 'title': 'Both', 'threshold': 1,
+                              'discount': 1, 'discount_percent': 1})
+
+
+def test_program_only_evaluates_rules_in_basket(products):
+    CountingRule.evaluations = 0
+    program = rules.RuleProgram([
+        CountingRule({'id': i, 'title': f'Rule {i}', 'product': f'p{i}',
+                      'buy': 2, 'pay': 1}) for i in range(1000)] + [
+        rules.MultiBuy({'id': 'soup', 'title': 'Soup 2 for 1',
+                        'product': 'soup', 'buy': 2, 'pay': 1})])
+    assert program.evaluate({'soup': 4, 'bread': 1}, products) == [
+        (program.rules[-1], 130)]
+    assert CountingRule.evaluations == 0
+    assert program.affected_rules('p3') == [program.rules[3]]
+
+
+def test_catalogue(cat):
+    assert [p.promo_id for p in cat.promotions] == [1]
+    assert [rule.promo_id for rule in cat.program.rules] == [4, 5, 6, 7]
+    assert catalogue.Catalogue({}, []).program is None
+
+
+ITEMS = ['soup', 'soup', 'soup', 'bread', 'milk', 'milk', 'apples', 'soap']
+
+
+@pytest.mark.parametrize('cls', [basket.Basket, basket.IncrementalBasket,
+                                 basket.CompactBasket])
+def test_basket(cat, cls):
+    shopping_basket = cls(cat.products, cat.promotions, cat.index,
+                          cat.program)
+    for item in ITEMS:
+        shopping_basket.add(item)
+    shopping_basket.calculate_discounts()
+    assert shopping_basket.subtotal == 694
+    assert [(rule.promo_id, amount)
+            for rule, amount in shopping_basket.rule_discounts] == [
+        (4, 65), (6, 60), (7, 100)]
+    assert shopping_basket.total == 694 - 10 - 225
+
+
+def test_incremental_basket(cat):
+    shopping_basket = basket.IncrementalBasket(cat.products, cat.promotions,
+                                               cat.index, cat.program)
+    compact = cat.basket(compact=True)
+    rng = random.Random(0)
+    for _ in range(200):
+        item = rng.choice(ITEMS)
+        if rng.random() < 0.3:
+            assert shopping_basket.remove(item) == compact.remove(item)
+        else:
+            shopping_basket.add(item)
+            compact.add(item)
+        compact.calculate_discounts()
+        assert shopping_basket.rule_discounts == compact.rule_discounts
+        assert shopping_basket.total == compact.total
+
+
+def test_receipt(cat):
+    shopping_basket = cat.basket()
+    for item in ITEMS:
+        shopping_basket.add(item)
+    assert receipt.render(shopping_basket) == [
+        'Subtotal: £6.94',
+        'Apples 10% off: -10p',
+        'Soup 3 for 2: -65p',
+        'Any 3 of milk, apples or soap for £3: -60p',
+        '£1 off when you spend £5: -£1.00',
+        'Total: £4.59']
+    shopping_basket = cat.basket()
+    shopping_basket.add('bread')
+    assert receipt.render(shopping_basket)[1] == '(No offers available)'
+
+
+def test_promotion_discounts(cat):
+    shopping_basket = cat.basket(compact=True)
+    for item in ['soup', 'bread', 'apples']:
+        shopping_basket.add(item)
+    shopping_basket.calculate_discounts()
+    assert [(promotion.promo_id, amount) for promotion, amount
+            in shopping_basket.promotion_discounts] == [(1, 10), (5, 45)]
+
+
+@pytest.mark.parametrize('backend', [batch.PYTHON, batch.NUMPY])
+def test_price_baskets(cat, backend):
+    if backend == batch.NUMPY:
+        pytest.importorskip('numpy')
+    rng = random.Random(0)
+    baskets = [[rng.choice(ITEMS) for _ in range(rng.randint(0, 12))]
+               for _ in range(200)] + [['soup'] * 3]
+    expected = []
+    for items in baskets:
+        shopping_basket = cat.basket(compact=True)
+        for item in items:
+            shopping_basket.add(item)
+        shopping_basket.calculate_discounts()
+        expected.append(shopping_basket.total)
+    assert expected[-1] == 130
+    for promotions, program in [
+            (loader.build_promotions(PROMOTIONS), None),
+            (cat.index, cat.program)]:
+        result = batch.price_baskets(baskets, cat.products, promotions,
+                                     backend, chunk_size=64, program=program)
+        assert result.totals == expected
+
+
+def test_compile(cat, tmpdir):
+    with pytest.raises(ValueError):
+        compiled.compile_catalogue(cat, str(tmpdir.join('catalogue.bin')))
+
+
+def test_sharded(cat):
+    items = ITEMS * 50
+    expected = shard.ShardedPricer(cat, workers=1).price(items)
+    with shard.ShardedPricer(cat, workers=2, threshold=0) as pricer:
+        assert pricer.price(items) == expected
+
+
+def test_store(cat):
+    multi = stores.Stores(cat)
+    store = multi.add('s1', excluded=[4], promotions=loader.build_promotions([
+        {'id': 9, 'title': 'Bread 2 for 1', 'type': 'multibuy',
+         'product': 'Bread', 'buy': 2, 'pay': 1}]))
+    assert [rule.promo_id for rule in store.program.rules] == [5, 6, 7, 9]
+    assert [rule.promo_id for rule in cat.program.rules] == [4, 5, 6, 7]
+    assert multi.add('s2', excluded=[4, 5, 6, 7]).program is None
+    record = multi.price('s1', ['soup', 'soup', 'soup', 'bread', 'bread'])
+    # The bundles use both loaves, leaving none for the 2 for 1.
+    assert [(d['id'], d['amount']) for d in record['discounts']] == [
+        (5, 90)]
+
+
+OVERLAPPING = [
+    {'id': 1, 'title': 'Half price soup', 'qualifying_product': 'Soup',
+     'qualifying_qty': 1, 'discounted_product': 'Soup',
+     'discount_percent': 50},
+    {'id': 4, 'title': 'Soup 3 for 2', 'type': 'multibuy', 'product': 'Soup',
+     'buy': 3, 'pay': 2},
+    {'id': 8, 'title': 'Soup 2 for 1', 'type': 'multibuy', 'product': 'Soup',
+     'buy': 2, 'pay': 1},
+    {'id': 5, 'title': 'Soup and bread for £1', 'type': 'bundle',
+     'products': {'Soup': 1, 'Bread': 1}, 'price': 100},
+    {'id': 9, 'title': '£10 off when you spend £4', 'type': 'spend',
+     'threshold': 400, 'discount': 1000},
+]
+
+# Baskets, the rule discounts they get and their totals, with the
+# OVERLAPPING promotions.
+OVERLAPPING_BASKETS = [
+    (['soup'] * 6 + ['bread'], [(4, 130), (9, 148)], 0),
+    (['soup'] * 3 + ['bread'], [(4, 65)], 114),
+    (['soup'] * 2 + ['bread'], [(8, 65)], 81),
+    (['soup', 'bread'], [(5, 45)], 68),
+]
+
+
+@pytest.fixture
+def overlapping(products):
+    return catalogue.Catalogue(products,
+                               loader.build_promotions(OVERLAPPING))
+
+
+@pytest.mark.parametrize('cls', [basket.Basket, basket.IncrementalBasket,
+                                 basket.CompactBasket])
+def test_overlapping_basket(overlapping, cls):
+    for items, rule_discounts, total in OVERLAPPING_BASKETS:
+        shopping_basket = cls(overlapping.products, overlapping.promotions,
+                              overlapping.index, overlapping.program)
+        for item in items:
+            shopping_basket.add(item)
+        shopping_basket.calculate_discounts()
+        assert [(rule.promo_id, amount) for rule, amount
+                in shopping_basket.rule_discounts] == rule_discounts
+        assert shopping_basket.total == total
+
+
+@pytest.mark.parametrize('backend', [batch.PYTHON, batch.NUMPY])
+def test_overlapping_price_baskets(overlapping, backend):
+    if backend == batch.NUMPY:
+        pytest.importorskip('numpy')
+    result = batch.price_baskets(
+        [items for items, _, _ in OVERLAPPING_BASKETS], overlapping.products,
+        overlapping.index, backend, program=overlapping.program)
+    assert result.totals == [total for _, _, total in OVERLAPPING_BASKETS]
+
+
+def test_overlapping_sharded(overlapping):
+    items, _, total = OVERLAPPING_BASKETS[0]
+    with shard.ShardedPricer(overlapping, workers=2, threshold=0) as pricer:
+        assert pricer.price(items)['total'] == total
+
+
+def test_never_below_zero(overlapping):
+    rng = random.Random(0)
+    for _ in range(200):
+        items = [rng.choice(['soup', 'bread', 'milk'])
+                 for _ in range(rng.randint(1, 12))]
+        shopping_basket = overlapping.basket(compact=True)
+        for item in items:
+            shopping_basket.add(item)
+        shopping_basket.calculate_discounts()
+        assert 0 <= shopping_basket.total <= shopping_basket.subtotal
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+
+import basket.cache as cache
+import basket.catalogue as catalogue
+import basket.loadgen as loadgen
+import basket.product as product
+import basket.promotion as promotion
+import basket.server as server
+import basket.stores as stores
+
+
+@pytest.fixture
+def cat():
+    return catalogue.Catalogue(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf')},
+        [promotion.Promotion({'id': 2, 'title': 'Half price loaf',
+                              'qualifying_product': 'soup',
+                              'qualifying_qty': 2,
+                              'discounted_product': 'bread',
+                              'discount_percent': 50})])
+
+
+def run_with_server(cat, client, **kwargs):
+    async def run():
+        pricing_server = server.PricingServer(cat)
+        srv = await pricing_server.start(port=0, **kwargs)
+        async with srv:
+            if 'path' not in kwargs:
+                kwargs['port'] = srv.sockets[0].getsockname()[1]
+            return await client(kwargs)
+    return asyncio.run(run())
+
+
+def test_price(cat):
+    pricing_server = server.PricingServer(cat)
+    record = pricing_server.price(['soup', 'Soup', 'bread', 'pie'], 'b1')
+    assert record == {
+        'basket': 'b1', 'subtotal': 210,
+        'discounts': [{'id': 2, 'title': 'Half price loaf', 'amount': 40}],
+        'total': 170, 'out_of_stock': 1}
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('GET', '/price', b'', 405),
+    ('POST', '/nowhere', b'', 404),
+    ('POST', '/price', b'soup', 400),
+    ('POST', '/price', b'{"items": "soup"}', 400),
+    ('POST', '/price', b'["soup"]', 400),
+])
+def test_respond_errors(cat, method, path, body, status):
+    with pytest.raises(server.HTTPError) as e:
+        server.PricingServer(cat).respond(method, path, body)
+    assert e.value.status == status
+
+
+def test_server(cat):
+    async def client(address):
+        reader, writer = await loadgen.open_connection(**address)
+        try:
+            health = await loadgen.request(reader, writer, 'GET', '/health')
+            priced = await loadgen.request(
+                reader, writer, 'POST', '/price',
+                {'basket': 7, 'items': ['soup', 'soup', 'bread']})
+            bad = await loadgen.request(reader, writer, 'POST', '/price',
+                                        {'things': []})
+        finally:
+            writer.close()
+        return health, priced, bad
+
+    health, priced, bad = run_with_server(cat, client)
+    assert health == (200, {'status': 'ok'})
+    assert priced[0] == 200
+    assert priced[1]['basket'] == 7
+    assert priced[1]['total'] == 170
+    assert bad[0] == 400
+
+
+def test_server_unix_socket(cat, tmpdir):
+    async def client(address):
+        reader, writer = await loadgen.open_connection(**address)
+        try:
+            return await loadgen.request(reader, writer, 'POST', '/price',
+                                         {'items': ['bread']})
+        finally:
+            writer.close()
+
+    status, record = run_with_server(cat, client,
+                                     path=str(tmpdir.join('basket.sock')))
+    assert (status, record['total']) == (200, 80)
+
+
+def test_loadgen(cat):
+    async def client(address):
+        return await loadgen.run([['soup', 'soup', 'bread'], ['soup']],
+                                 concurrency=4, requests=50, **address)
+
+    stats = run_with_server(cat, client)
+    assert stats['requests'] == 50
+    assert stats['errors'] == 0
+    assert stats['rps'] > 0
+    assert 0 < stats['p50_ms'] <= stats['p99_ms']
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert loadgen.percentile(values, 50) == 50
+    assert loadgen.percentile(values, 99) == 99
+    assert loadgen.percentile([], 50) is None
+
+
+def test_reload(cat):
+    pricing_server = server.PricingServer(cat)
+    pricing_server.reload(catalogue.Catalogue(cat.products, []))
+    assert pricing_server.price(['soup', 'soup', 'bread'])['total'] == 210
+
+
+def test_price_cached(cat):
+    pricing_server = server.PricingServer(cat, cache.PricingCache())
+    items = ['soup', 'Soup', 'bread', 'pie']
+    assert pricing_server.price(items, 'b1') == \
+        server.PricingServer(cat).price(items, 'b1')
+    assert pricing_server.price(items[::-1], 'b2')['total'] == 170
+    assert pricing_server.cache.hits == 1
+    status, stats = pricing_server.respond('GET', '/stats', b'')
+    assert status == 200
+    assert stats['cache']['hits'] == 1
+    assert stats['cache']['misses'] == 1
+
+
+def test_price_store(cat):
+    multi = stores.Stores(cat)
+    multi.add('dear', prices={'bread': 100})
+    pricing_server = server.PricingServer(cat, stores=multi)
+    status, record = pricing_server.respond(
+        'POST', '/price', b'{"items": ["soup", "soup", "bread"], '
+                          b'"store": "dear"}')
+    assert (status, record['total']) == (200, 180)
+    assert pricing_server.price(['soup', 'soup', 'bread'])['total'] == 170
+    with pytest.raises(server.HTTPError) as e:
+        pricing_server.price(['soup'], store_id='nowhere')
+    assert e.value.status == 404
+    with pytest.raises(server.HTTPError) as e:
+        server.PricingServer(cat).price(['soup'], store_id='dear')
+    assert e.value.status == 400
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import basket.catalogue as catalogue
+import basket.loader as loader
+import basket.shard as shard
+from benchmarks import generate
+
+
+def make_catalogue(optimal=False):
+    rng = random.Random(0)
+    products_def = generate.generate_products(200, rng)
+    names = [p['name'] for p in products_def]
+    promotions_def = generate.generate_promotions(150, names, rng)
+    return catalogue.Catalogue(loader.build_products(products_def),
+                               loader.build_promotions(promotions_def),
+                               optimal)
+
+
+@pytest.fixture(scope='module')
+def cat():
+    return make_catalogue()
+
+
+@pytest.fixture(scope='module')
+def items(cat):
+    rng = random.Random(1)
+    names = [prod.name for prod in cat.products.values()]
+    return (generate.generate_baskets(names, 1, 5000, 1.0, rng)[0]
+            + ['pie', 'pie'])
+
+
+def test_partition():
+    groups = [['a'], ['b', 'c', 'd'], ['e', 'f'], ['g']]
+    assert shard.partition(groups, 2) == [['b', 'c', 'd', 'g'],
+                                          ['e', 'f', 'a']]
+    assert shard.partition(groups, 1) == [['b', 'c', 'd', 'e', 'f', 'a', 'g']]
+    assert shard.partition(groups[:1], 3) == [['a']]
+
+
+def test_price_shard(cat):
+    shard.init_worker(cat)
+    subtotal, total, discounts = shard.price_shard({})
+    assert (subtotal, total, discounts) == (0, 0, {})
+
+
+def test_price_small(cat, items):
+    with shard.ShardedPricer(cat, workers=2) as pricer:
+        record = pricer.price(items, 'b1')
+        assert pricer._pool is None
+    shopping_basket = cat.basket(compact=True)
+    for item in items:
+        shopping_basket.add(item)
+    shopping_basket.calculate_discounts()
+    assert record['basket'] == 'b1'
+    assert record['subtotal'] == shopping_basket.subtotal
+    assert record['total'] == shopping_basket.total
+    assert record['out_of_stock'] == 2
+
+
+@pytest.mark.parametrize('optimal', [False, True])
+def test_price_sharded(items, optimal):
+    cat = make_catalogue(optimal)
+    expected = shard.ShardedPricer(cat, workers=1, threshold=0).price(items)
+    assert expected['discounts']
+    with shard.ShardedPricer(cat, workers=3, threshold=0) as pricer:
+        assert pricer.price(items) == expected
+        assert pricer._pool is not None
+        assert pricer.price(reversed(items))['total'] == expected['total']
+    assert pricer._pool is None
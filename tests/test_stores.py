@@ -0,0 +1,176 @@
+import json
+import random
+import tracemalloc
+
+import pytest
+
+import basket.catalogue as catalogue
+import basket.product as product
+import basket.promotion as promotion
+import basket.stores as stores
+from benchmarks import generate
+
+
+def make_promotion(promo_id, qualifying, qty, discounted, percent):
+    return promotion.Promotion({'id': promo_id, 'title': f'Offer {promo_id}',
+                                'qualifying_product': qualifying,
+                                'qualifying_qty': qty,
+                                'discounted_product': discounted,
+                                'discount_percent': percent})
+
+
+def make_catalogue(optimal=False):
+    return catalogue.Catalogue(
+        {'soup': product.Product('soup', 65, 'tin'),
+         'bread': product.Product('bread', 80, 'loaf'),
+         'apples': product.Product('apples', 100, 'bag')},
+        [make_promotion(1, 'apples', 1, 'apples', 10),
+         make_promotion(2, 'soup', 2, 'bread', 50)],
+        optimal)
+
+
+@pytest.fixture
+def base():
+    return make_catalogue()
+
+
+@pytest.fixture
+def multi(base):
+    multi = stores.Stores(base)
+    multi.add('plain')
+    multi.add('dear', prices={'Bread': 100})
+    multi.add('pie', products={'pie': product.Product('pie', 250, 'each')},
+              promotions=[make_promotion(9, 'pie', 1, 'bread', 25)],
+              excluded=[2])
+    return multi
+
+
+def test_overlay():
+    overlay = stores.Overlay({'a': 1, 'c': 3}, {'a': 0, 'b': 2})
+    assert overlay['a'] == 1 and overlay['b'] == 2
+    assert overlay.get('z') is None
+    assert 'c' in overlay and 'z' not in overlay
+    assert sorted(overlay) == ['a', 'b', 'c']
+    assert len(overlay) == 3
+    with pytest.raises(KeyError):
+        overlay['z']
+
+
+def test_plain_store(base, multi):
+    assert multi.catalogue('plain') is base
+    record = multi.price('plain', ['soup', 'soup', 'bread', 'apples'], 'b1')
+    assert record['total'] == 65 * 2 + 40 + 90
+
+
+def test_store_prices(base, multi):
+    cat = multi.catalogue('dear')
+    assert cat.products['bread'].price == 100
+    assert cat.products['soup'] is base.products['soup']
+    assert base.products['bread'].price == 80
+    assert cat.promotions[1] is base.promotions[1]
+    assert cat.index.by_discounted is not base.index.by_discounted
+    record = multi.price('dear', ['soup', 'soup', 'bread'])
+    assert record['subtotal'] == 230
+    assert record['total'] == 180
+    assert multi.price('plain', ['soup', 'soup', 'bread'])['total'] == 170
+
+
+def test_store_promotions(base, multi):
+    cat = multi.catalogue('pie')
+    assert [p.promo_id for p in cat.promotions] == [1, 9]
+    assert len(cat.promotions) == 2
+    assert cat.promotions[-1].promo_id == 9
+    assert [p.promo_id for p in cat.index.by_discounted['bread']] == [9]
+    assert cat.index.by_qualifying['soup'] == []
+    assert cat.index.by_discounted['apples'] is \
+        base.index.by_discounted['apples']
+    record = multi.price('pie', ['soup', 'soup', 'bread', 'pie', 'pie'])
+    assert record['discounts'] == [{'id': 9, 'title': 'Offer 9',
+                                    'amount': 20}]
+    assert record['total'] == 130 + 60 + 500
+    assert multi.price('plain', ['pie'])['out_of_stock'] == 1
+
+
+def test_store_optimal():
+    base = make_catalogue(optimal=True)
+    multi = stores.Stores(base)
+    multi.add('s', prices={'bread': 200},
+              promotions=[make_promotion(9, 'soup', 1, 'bread', 30)])
+    record = multi.price('s', ['soup', 'soup', 'bread'])
+    assert record['discounts'][0]['id'] == 2
+    assert record['total'] == 130 + 100
+    assert base.index.ranking('bread')[0][1] == 40
+
+
+def test_store_versions(base, multi):
+    versions = {multi.catalogue(store).version
+                for store in ('plain', 'dear', 'pie')}
+    assert len(versions) == 3
+
+
+def test_unknown_store(multi):
+    with pytest.raises(KeyError, match='No such store'):
+        multi.price('nowhere', ['soup'])
+    with pytest.raises(KeyError):
+        multi.add('bad', prices={'caviar': 1000})
+
+
+def test_load(base, tmpdir):
+    path = tmpdir.join('stores.json')
+    path.write(json.dumps([
+        {'store': 'a', 'prices': {'soup': 70}},
+        {'store': 'b', 'exclude_promotions': [1],
+         'products': [{'name': 'Pie', 'price': 250, 'unit': 'Each'}],
+         'promotions': [{'id': 9, 'title': 'Pie 10% off',
+                         'qualifying_product': 'pie', 'qualifying_qty': 1,
+                         'discounted_product': 'pie',
+                         'discount_percent': 10}]},
+        {'store': 'c'},
+    ]))
+    multi = stores.Stores(base)
+    assert multi.load(str(path)) == 3
+    assert multi.price('a', ['soup'])['total'] == 70
+    assert multi.price('b', ['pie', 'apples'])['total'] == 225 + 100
+    assert multi.catalogue('c') is base
+
+
+@pytest.mark.parametrize('data', [
+    [{'prices': {'soup': 70}}],
+    [{'store': 'a', 'prices': {'caviar': 70}}],
+    [{'store': 'a', 'prices': ['soup']}],
+    {'store': 'a'},
+])
+def test_load_invalid(base, tmpdir, data):
+    path = tmpdir.join('stores.json')
+    path.write(json.dumps(data))
+    with pytest.raises(ValueError):
+        stores.Stores(base).load(str(path))
+    with pytest.raises(ValueError, match='Failed to load stores'):
+        stores.Stores(base).load(str(tmpdir.join('missing.json')))
+
+
+def test_memory_grows_with_overlays():
+    rng = random.Random(0)
+    products_def = generate.generate_products(2000, rng)
+    names = [p['name'] for p in products_def]
+    promotions_def = generate.generate_promotions(1000, names, rng)
+
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        base = catalogue.Catalogue(
+            {p['name'].lower(): product.Product(p['name'], p['price'],
+                                                p['unit'])
+             for p in products_def},
+            [promotion.Promotion(p) for p in promotions_def])
+        base_size = tracemalloc.get_traced_memory()[0] - start
+        multi = stores.Stores(base)
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(100):
+            multi.add(i, prices={rng.choice(names): 99 for _ in range(5)},
+                      excluded=[rng.randint(1, 1000)])
+        stores_size = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    # A hundred stores take a fraction of the memory of one catalogue.
+    assert stores_size < base_size / 4
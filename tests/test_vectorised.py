@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+import basket.batch as batch
+import basket.engine as engine
+import basket.product as product
+import basket.promotion as promotion
+import basket.vectorised as vectorised
+
+numpy = pytest.importorskip('numpy')
+
+
+NAMES = ['soup', 'bread', 'milk', 'apples', 'soap', 'eggs']
+
+
+@pytest.fixture
+def products():
+    return {
+      'soup': product.Product('soup', 65, 'tin'),
+      'bread': product.Product('bread', 80, 'loaf'),
+      'milk': product.Product('milk', 130, 'bottle'),
+      'apples': product.Product('apples', 100, 'bag'), }
+
+
+@pytest.fixture
+def promotions():
+    return [
+        promotion.Promotion({'id': 1, 'title': 'Apples 10% off',
+                             'qualifying_product': 'apples',
+                             'qualifying_qty': 1,
+                             'discounted_product': 'apples',
+                             'discount_percent': 10}),
+        promotion.Promotion({'id': 2,
+                             'title': '2 tins soup get you a half price loaf',
+                             'qualifying_product': 'soup',
+                             'qualifying_qty': 2,
+                             'discounted_product': 'bread',
+                             'discount_percent': 50})]
+
+
+def test_available():
+    assert vectorised.available()
+
+
+def test_pricer(products, promotions):
+    pricer = vectorised.VectorisedPricer(
+        products, engine.PromotionIndex(promotions))
+    assert set(pricer.promoted_columns) == {'apples', 'soup', 'bread'}
+    subtotals, discounts = pricer.price([
+        {'apples': 1, 'milk': 1},
+        {'soup': 5, 'bread': 1},
+        {}])
+    assert subtotals.tolist() == [230, 405, 0]
+    assert discounts.tolist() == [10, 40, 0]
+
+
+@pytest.mark.parametrize('percent', [12.5, 33.3, 99.99, 0.1, 7])
+def test_pricer_truncation(percent):
+    products = {'soap': product.Product('soap', 59, 'bar')}
+    promo = promotion.Promotion({'id': 1, 'title': 'Soap',
+                                 'qualifying_product': 'soap',
+                                 'qualifying_qty': 1,
+                                 'discounted_product': 'soap',
+                                 'discount_percent': percent})
+    pricer = vectorised.VectorisedPricer(
+        products, engine.PromotionIndex([promo]))
+    _, discounts = pricer.price([{'soap': 3}])
+    prod = product.Product('soap', 59, 'bar')
+    prod.apply_promotion(promo)
+    assert discounts.tolist() == [3 * prod.discount_amount]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_python(seed):
+    rng = random.Random(seed)
+    products = {name: product.Product(name, rng.randint(1, 500), 'unit')
+                for name in NAMES[:-1]}
+    promotions = [promotion.Promotion({
+        'id': i,
+        'title': f'Promotion {i}',
+        'qualifying_product': rng.choice(NAMES),
+        'qualifying_qty': rng.randint(1, 4),
+        'discounted_product': rng.choice(NAMES),
+        'discount_percent': rng.uniform(0, 100)})
+        for i in range(rng.randint(0, 12))]
+    baskets = [[rng.choice(NAMES) for _ in range(rng.randint(0, 30))]
+               for _ in range(300)]
+
+    expected = batch.price_baskets(baskets, products, promotions)
+    result = batch.price_baskets(baskets, products, promotions,
+                                 backend=batch.NUMPY, chunk_size=64)
+    assert result.subtotals == expected.subtotals
+    assert result.discounts == expected.discounts
+    assert result.totals == expected.totals
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_optimal_matches_python(seed):
+    rng = random.Random(seed)
+    products = {name: product.Product(name, rng.randint(1, 500), 'unit')
+                for name in NAMES[:-1]}
+    promotions = [promotion.Promotion({
+        'id': i,
+        'title': f'Promotion {i}',
+        'qualifying_product': rng.choice(NAMES),
+        'qualifying_qty': rng.randint(1, 4),
+        'discounted_product': rng.choice(NAMES),
+        'discount_percent': rng.uniform(0, 100)})
+        for i in range(rng.randint(0, 12))]
+    index = engine.OptimalPromotionIndex(promotions, products)
+    baskets = [[rng.choice(NAMES) for _ in range(rng.randint(0, 30))]
+               for _ in range(300)]
+
+    expected = batch.price_baskets(baskets, products, index)
+    result = batch.price_baskets(baskets, products, index,
+                                 backend=batch.NUMPY, chunk_size=64)
+    assert result.discounts == expected.discounts
+    assert result.totals == expected.totals
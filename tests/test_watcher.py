@@ -0,0 +1,126 @@
+import json
+import os
+import time
+
+import pytest
+
+import basket.watcher as watcher
+
+
+PRODUCTS = [{'name': 'Soup', 'price': 65, 'unit': 'Tin'},
+            {'name': 'Bread', 'price': 80, 'unit': 'Loaf'}]
+
+PROMOTIONS = [{'id': 2, 'title': 'Half price loaf',
+               'qualifying_product': 'Soup', 'qualifying_qty': 2,
+               'discounted_product': 'Bread', 'discount_percent': 50}]
+
+
+def write(path, data):
+    path.write(data if isinstance(data, str) else json.dumps(data))
+    # Make sure the change is seen even on coarse grained file systems
+    st = os.stat(str(path))
+    os.utime(str(path), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def files(tmpdir):
+    products = tmpdir.join('products.json')
+    promotions = tmpdir.join('promotions.json')
+    write(products, PRODUCTS)
+    write(promotions, PROMOTIONS)
+    return products, promotions
+
+
+def test_initial_load(files):
+    w = watcher.CatalogueWatcher(str(files[0]), str(files[1]))
+    assert set(w.catalogue.products) == {'soup', 'bread'}
+    assert len(w.catalogue.promotions) == 1
+    assert w.reloads == 1
+    assert w.check() is False
+
+
+def test_missing_files(tmpdir):
+    w = watcher.CatalogueWatcher(str(tmpdir.join('a.json')),
+                                 str(tmpdir.join('b.json')))
+    assert w.catalogue.products == {}
+    assert w.reloads == 0
+
+
+def test_reload(files):
+    reloaded = []
+    w = watcher.CatalogueWatcher(str(files[0]), str(files[1]),
+                                 on_reload=reloaded.append)
+    old = w.catalogue
+    shopping_basket = old.basket()
+
+    write(files[1], [])
+    assert w.check() is True
+    assert reloaded == [old, w.catalogue]
+    assert w.catalogue is not old
+    assert w.catalogue.promotions == []
+
+    # The basket keeps pricing against the catalogue it was made from
+    for item in ['soup', 'soup', 'bread']:
+        shopping_basket.add(item)
+    shopping_basket.calculate_discounts()
+    assert shopping_basket.total == 170
+
+
+def test_touch_without_change(files):
+    w = watcher.CatalogueWatcher(str(files[0]), str(files[1]))
+    old = w.catalogue
+    write(files[0], PRODUCTS)
+    assert w.check() is False
+    assert w.catalogue is old
+
+
+def test_half_written_file(files):
+    w = watcher.CatalogueWatcher(str(files[0]), str(files[1]))
+    old = w.catalogue
+    write(files[0], '[{"name": "Soup", "pri')
+    assert w.check() is False
+    assert w.catalogue is old
+    write(files[0], PRODUCTS[:1])
+    assert w.check() is True
+    assert set(w.catalogue.products) == {'soup'}
+
+
+@pytest.mark.parametrize('data', ['5', '{}', '"soup"', 'null'])
+def test_not_an_array(files, data):
+    w = watcher.CatalogueWatcher(str(files[0]), str(files[1]))
+    old = w.catalogue
+    write(files[0], data)
+    assert w.check() is False
+    assert w.catalogue is old
+    write(files[0], PRODUCTS[:1])
+    assert w.check() is True
+    assert set(w.catalogue.products) == {'soup'}
+
+
+def test_background_thread_survives_errors(files, monkeypatch):
+    checks = []
+
+    def check():
+        checks.append(None)
+        if len(checks) == 1:
+            raise RuntimeError('reload failed')
+
+    w = watcher.CatalogueWatcher(str(files[0]), str(files[1]),
+                                 interval=0.01)
+    monkeypatch.setattr(w, 'check', check)
+    with w:
+        deadline = time.monotonic() + 5
+        while len(checks) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert len(checks) >= 3
+
+
+def test_background_thread(files):
+    with watcher.CatalogueWatcher(str(files[0]), str(files[1]),
+                                  interval=0.01) as w:
+        write(files[1], [])
+        deadline = time.monotonic() + 5
+        while w.reloads < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert w.reloads == 2
+    assert w.catalogue.promotions == []